@@ -0,0 +1,180 @@
+r"""
+This module measures speed of hot paths of flightscraper on synthetic data.
+
+Benchmarks:
+- row_decoder: rows per second of 'prepare_finishing_flight_info' against the old decoder;
+- parse: rows per second of 'check_site_info' on quote-pages of different size;
+- pairing: time of 'get_round_trip_flights' for all round trips and for top-10;
+- search: latency of full 'search()' over replayed fixtures of all four endpoints.
+
+Run it as a script, results are printed as json:
+python benchmarks.py [--sizes 10 1000 100000] [--output results.json]
+"""
+import argparse
+from datetime import datetime, timedelta
+import json
+import platform
+import re
+import tempfile
+import timeit
+
+import requests
+
+from flightscraper.replay import ReplaySession, make_quote_page, write_synthetic_fixtures
+from flightscraper.search import FlightSearch
+
+
+# сколько строк в синтетической странице
+ROWS = 10000
+SIZES = (10, 1000, 100000)
+REPEAT = 5
+
+
+def make_raw_flights(rows=ROWS):
+    """Return list of raw flights like 'iter_quote_rows()' yields: three weeks of flights,
+    several dozens of flights a day.
+    """
+    start = datetime(2018, 10, 1)
+    raw_flights = []
+    for i in range(rows):
+        date = start + timedelta(days=i % 21)
+        raw_flights.append([date.strftime('%a, %d %b %y'),
+                            '{:02d}:{:02d}'.format(i % 24, i % 60),
+                            '{:02d}:{:02d}'.format((i + 3) % 24, (i + 30) % 60),
+                            'Copenhagen (CPH)', 'Burgas (BOJ)',
+                            'Price:  {}.00 EUR'.format(100 + i % 300)])
+    return raw_flights
+
+
+def legacy_decode(flight):
+    """Row decoder as it was before: strptime on every row, regex compiled on every call."""
+    regex = re.compile(r'[A-Z]{3}')
+    info = {'from': regex.search(flight[3]).group(),
+            'to': regex.search(flight[4]).group(),
+            'price': float(flight[5].split()[1]),
+            'currency': flight[5].split()[2]}
+    datetime.strptime(flight[0], '%a, %d %b %y')
+    info['dep_time'] = datetime.strptime(flight[0] + ' ' + flight[1], '%a, %d %b %y %H:%M')
+    info['arr_time'] = datetime.strptime(flight[0] + ' ' + flight[2], '%a, %d %b %y %H:%M')
+    if info['dep_time'] > info['arr_time']:
+        info['arr_time'] += timedelta(days=1)
+    info['duration'] = info['arr_time'] - info['dep_time']
+    return info
+
+
+def best_time(function, repeat=REPEAT):
+    """Return the best of repeat runs of function, in seconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def get_repeat(rows):
+    """Return fewer repeats for big inputs, so the whole suite runs in reasonable time."""
+    return REPEAT if rows <= ROWS else 1
+
+
+def make_response(text):
+    """Wrap html into 'Response' object as if it came from site."""
+    response = requests.Response()
+    response.status_code = 200
+    response.encoding = 'utf-8'
+    response._content = text.encode('utf-8')  # pylint: disable=protected-access
+    return response
+
+
+def bench_row_decoder(rows=ROWS, repeat=REPEAT):
+    """Compare rows per second of legacy and current row decoders.
+
+    Returns dict with throughputs.
+    """
+    raw_flights = make_raw_flights(rows)
+    searcher = FlightSearch(session=object())
+    legacy = best_time(lambda: [legacy_decode(flight) for flight in raw_flights], repeat)
+    current = best_time(
+        lambda: [searcher.prepare_finishing_flight_info(flight) for flight in raw_flights],
+        repeat)
+    return {'rows': rows,
+            'legacy_rows_per_sec': rows / legacy,
+            'rows_per_sec': rows / current,
+            'speedup': legacy / current}
+
+
+def bench_parse(rows):
+    """Measure 'check_site_info' on round trip quote-page with rows flights each way.
+
+    Returns dict with seconds and rows per second.
+    """
+    dep_date = datetime(2018, 10, 20)
+    arr_date = datetime(2018, 10, 27)
+    response = make_response(make_quote_page(rows, 'CPH', 'BOJ', dep_date, arr_date))
+    searcher = FlightSearch(session=object())
+    seconds = best_time(
+        lambda: searcher.check_site_info(response, 'CPH', 'BOJ', dep_date, arr_date),
+        get_repeat(rows))
+    return {'rows': 2 * rows, 'bytes': len(response.content), 'seconds': seconds,
+            'rows_per_sec': 2 * rows / seconds}
+
+
+def bench_pairing(rows):
+    """Measure 'get_round_trip_flights' for rows flights each way.
+
+    Returns dict with seconds for all round trips and for top-10 cheapest.
+    """
+    dep_date = datetime(2018, 10, 20)
+    arr_date = datetime(2018, 10, 27)
+    response = make_response(make_quote_page(rows, 'CPH', 'BOJ', dep_date, arr_date))
+    searcher = FlightSearch(session=object())
+    found = searcher.check_site_info(response, 'CPH', 'BOJ', dep_date, arr_date)
+    departures = found['departure'] + found['departure_other']
+    arrivals = found['return'] + found['return_other']
+    repeat = get_repeat(rows)
+    result = {'rows': rows,
+              'top10_seconds': best_time(
+                  lambda: searcher.get_round_trip_flights(departures, arrivals, 10), repeat)}
+    # все пары для 100k строк - это миллиарды объектов, меряем только top-K
+    if rows <= ROWS:
+        result['all_seconds'] = best_time(
+            lambda: searcher.get_round_trip_flights(departures, arrivals), repeat)
+    return result
+
+
+def bench_search(rows):
+    """Measure latency of full round trip 'search()' over replayed fixtures.
+
+    Every run uses a fresh FlightSearch, so all four endpoints are requested.
+    Returns dict with seconds.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        query = write_synthetic_fixtures(directory, rows)
+        session = ReplaySession(directory)
+        seconds = best_time(
+            lambda: FlightSearch(session=session, rate_limits=None).search(*query),
+            get_repeat(rows))
+    return {'rows': 2 * rows, 'seconds': seconds}
+
+
+def run_benchmarks(sizes=SIZES):
+    """Run all benchmarks for every page size.
+
+    Returns json-compatible dict.
+    """
+    return {'started_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'row_decoder': bench_row_decoder(),
+            'parse': [bench_parse(rows) for rows in sizes],
+            'pairing': [bench_pairing(rows) for rows in sizes],
+            'search': [bench_search(rows) for rows in sizes]}
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    PARSER.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='number of flights on synthetic quote-page')
+    PARSER.add_argument('--output', help='write json into file instead of stdout')
+    ARGS = PARSER.parse_args()
+    RESULTS = json.dumps(run_benchmarks(ARGS.sizes), indent=2)
+    if ARGS.output:
+        with open(ARGS.output, 'w') as OUTPUT:
+            OUTPUT.write(RESULTS + '\n')
+    else:
+        print(RESULTS)
@@ -0,0 +1,11 @@
+"""
+Runs the command line interface from the root folder of the repository without installing:
+the same as console script of flightscraper.cli, see flightscraper/cli.py.
+"""
+import sys
+
+from flightscraper.cli import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+Runs the search daemon from the root folder of the repository without installing:
+the same as console script of flightscraper.daemon, see flightscraper/daemon.py.
+"""
+import sys
+
+from flightscraper.daemon import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
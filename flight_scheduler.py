@@ -0,0 +1,11 @@
+"""
+Runs the multi-process sweep from the root folder of the repository without installing:
+the same as console script of flightscraper.scheduler, see flightscraper/scheduler.py.
+"""
+import sys
+
+from flightscraper.scheduler import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+r"""
+Importable facade of the flight scraper.
+
+Everything is imported on the first access to the name, so 'import flightscraper'
+makes no requests and loads neither requests nor lxml:
+>>> import flightscraper
+>>> searcher = flightscraper.FlightSearch()
+>>> result = searcher.search('CPH', 'BOJ', '20.10.2018')
+
+Modules of the package:
+- search: FlightSearch, its records, errors, sessions and rate limits;
+- cache, routes, history, changes: stores of cities, dates, routes and seen prices;
+- sweep, scheduler: concurrent searches in threads and in processes;
+- output, metrics, profiling: writers of results, timings and profiles;
+- cli, daemon: command line interface and http service;
+  cli, scheduler and daemon are installed as console scripts flightsearch,
+  flightsearch-sweep and flightsearch-daemon (see pyproject.toml);
+- replay, stub_server: offline answers and local stand-in server for tests and benchmarks.
+"""
+import importlib
+
+
+# имя -> модуль, из которого оно берётся
+_EXPORTS = {
+    'FlightSearch': '.search',
+    'Flight': '.search',
+    'RoundTrip': '.search',
+    'Currency': '.search',
+    'FlightSearchError': '.search',
+    'SiteConnectionError': '.search',
+    'SiteTimeoutError': '.search',
+    'CircuitOpenError': '.search',
+    'SiteAnswerError': '.search',
+    'RouteUnavailableError': '.search',
+    'HostRateLimits': '.search',
+    'make_session': '.search',
+    'TTLCache': '.cache',
+    'RouteIndex': '.routes',
+    'QuoteSweep': '.sweep',
+    'SweepScheduler': '.scheduler',
+    'QuoteHistory': '.history',
+    'ChangeTracker': '.changes',
+    'open_writer': '.output',
+    'write_results': '.output',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,177 @@
+r"""
+This module caches answers of http://www.flybulgarien.dk/ which change rarely:
+departure cities, arrival cities and available dates.
+
+It contains class TTLCache: in-memory LRU store with time-to-live for every key
+and optional on-disk copy, so cached values survive the end of the process.
+The folder of on-disk copies may be shared by several processes.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+
+# сколько значений держать в памяти
+MAX_SIZE = 1024
+# время жизни значения по умолчанию, в секундах
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class TTLCache:
+    """Class for storing values with time-to-live in memory and optionally on disk.
+
+    Keys are tuples like (method, url, body), values are anything pickle can save.
+
+    Instance variables:
+    directory: folder for on-disk copies, None if cache lives only in memory;
+    max_size: how many values keep in memory, least recently used ones are dropped first;
+    disk_errors: number of on-disk copies which couldn't be written.
+    """
+
+    def __init__(self, directory=None, max_size=MAX_SIZE):
+        """Create 'TTLCache'.
+
+        Arguments:
+        optional directory=None: folder for on-disk copies, created if missing;
+        optional max_size=MAX_SIZE: how many values keep in memory.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.disk_errors = 0
+        # ключ -> (момент устаревания, значение)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, key):
+        """Return file path for on-disk copy of key."""
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.pickle')
+
+    def _read_disk(self, key):
+        """Return (expires, value) saved on disk for key or None."""
+        if self.directory is None:
+            return None
+        try:
+            with open(self.get_path(key), 'rb') as file:
+                saved_key, expires, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        # на случай совпадения хэшей
+        if saved_key != key:
+            return None
+        return expires, value
+
+    def _write_disk(self, key, entry):
+        """Save on-disk copy of entry for key, lock must be held.
+
+        The copy is written to a temp file with unique name and renamed, so processes
+        sharing the folder never read half of a file or replace each other's temp files.
+        Returns False if the copy couldn't be written.
+        """
+        try:
+            descriptor, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        except OSError:
+            return False
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                pickle.dump((key, entry[0], entry[1]), file)
+            os.replace(temp_path, self.get_path(key))
+        except (OSError, pickle.PicklingError):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def _remember(self, key, entry):
+        """Put entry in memory and drop least recently used values over max_size."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Return fresh value for key, or default if it is missing or expired.
+
+        Arguments:
+        key: tuple identifying value;
+        optional default=None: returned value for missing key.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = self._read_disk(key)
+                if entry is None:
+                    return default
+            if entry[0] < time.time():
+                self._invalidate(key)
+                return default
+            self._remember(key, entry)
+            return entry[1]
+
+    def set(self, key, value, ttl=DEFAULT_TTL):
+        """Save value for key for ttl seconds.
+
+        Arguments:
+        key: tuple identifying value;
+        value: literally value;
+        optional ttl=DEFAULT_TTL: time-to-live in seconds.
+
+        If on-disk copy can't be written, the value is kept only in memory
+        and the failure is counted in self.disk_errors.
+        """
+        entry = (time.time() + ttl, value)
+        with self._lock:
+            self._remember(key, entry)
+            # диск только ускоряет следующие запуски, поиск из-за него не должен падать
+            if self.directory is not None and not self._write_disk(key, entry):
+                self.disk_errors += 1
+
+    def get_or_load(self, key, load, ttl=DEFAULT_TTL):
+        """Return fresh value for key, call load() and save its result if there is none.
+
+        Arguments:
+        key: tuple identifying value;
+        load: function without arguments returning value;
+        optional ttl=DEFAULT_TTL: time-to-live in seconds for loaded value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = load()
+            self.set(key, value, ttl)
+        return value
+
+    def _invalidate(self, key):
+        """Drop key from memory and disk, lock must be held."""
+        self._memory.pop(key, None)
+        if self.directory is not None:
+            try:
+                os.remove(self.get_path(key))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, key):
+        """Drop value for key."""
+        with self._lock:
+            self._invalidate(key)
+
+    def clear(self):
+        """Drop all values from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            if self.directory is not None:
+                for name in os.listdir(self.directory):
+                    if name.endswith('.pickle'):
+                        # файл мог удалить другой процесс с той же папкой
+                        try:
+                            os.remove(os.path.join(self.directory, name))
+                        except FileNotFoundError:
+                            pass
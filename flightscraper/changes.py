@@ -0,0 +1,104 @@
+r"""
+This module finds what changed on quote-pages since the previous poll.
+
+It contains class ChangeTracker which keeps the last snapshot for every search:
+hash of quote-page body and flights found on it. Pass it to
+FlightSearch(change_tracker=...) and call 'search_changes()': identical page
+is recognized by its hash before parsing, otherwise only new, removed
+and repriced flights are returned.
+Snapshots may be saved to a file, so polls made by different processes
+are compared too.
+"""
+import hashlib
+import os
+import pickle
+import threading
+
+
+class ChangeTracker:
+    """Class for comparing search results with their previous snapshots.
+
+    Instance variables:
+    path: file for snapshots, None if they live only in memory.
+    """
+
+    def __init__(self, path=None):
+        """Create 'ChangeTracker', load snapshots from path if it exists."""
+        self.path = path
+        # ключ поиска -> (хэш страницы, {опознавательные данные рейса: Flight})
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as file:
+                self._snapshots = pickle.load(file)
+
+    @staticmethod
+    def get_body_hash(content):
+        """Return hash of quote-page body, bytes."""
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    @staticmethod
+    def get_flight_key(flight):
+        """Return data identifying flight regardless of its price."""
+        return flight.dep_city, flight.arr_city, flight.dep_time, flight.arr_time
+
+    @staticmethod
+    def get_price(flight):
+        """Return price of flight together with its currency."""
+        return flight.price, flight.currency
+
+    def is_unchanged(self, key, body_hash):
+        """Check if quote-page for search key is the same as in the last snapshot."""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        return snapshot is not None and snapshot[0] == body_hash
+
+    @staticmethod
+    def get_no_changes(key):
+        """Return result of 'update()' for unchanged quote-page."""
+        return {'key': key, 'unchanged': True, 'new': [], 'removed': [], 'repriced': []}
+
+    def update(self, key, body_hash, found):
+        """Compare found flights with the last snapshot and replace it.
+
+        Arguments:
+        key: tuple identifying search;
+        body_hash: hash of quote-page from 'get_body_hash()';
+        found: dict from 'FlightSearch.check_site_info()'.
+
+        Returns dict with 'key', 'unchanged' flag, lists of 'new' and 'removed' flights
+        and list of 'repriced' tuples (old flight, new flight).
+        """
+        flights = {}
+        for flights_list in found.values():
+            for flight in flights_list:
+                flights[self.get_flight_key(flight)] = flight
+        with self._lock:
+            _, old_flights = self._snapshots.get(key, (None, {}))
+            self._snapshots[key] = (body_hash, flights)
+        changes = {'key': key,
+                   'new': [flight for flight_key, flight in flights.items()
+                           if flight_key not in old_flights],
+                   'removed': [flight for flight_key, flight in old_flights.items()
+                               if flight_key not in flights],
+                   'repriced': [(old_flights[flight_key], flight)
+                                for flight_key, flight in flights.items()
+                                if flight_key in old_flights
+                                and self.get_price(old_flights[flight_key])
+                                != self.get_price(flight)]}
+        changes['unchanged'] = not (changes['new'] or changes['removed'] or changes['repriced'])
+        return changes
+
+    def forget(self, key):
+        """Drop snapshot for search key, next poll will report all flights as new."""
+        with self._lock:
+            self._snapshots.pop(key, None)
+
+    def save(self):
+        """Write snapshots to self.path."""
+        with self._lock:
+            data = pickle.dumps(self._snapshots)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,218 @@
+r"""
+This module is command line interface of flight search without any dialogue.
+
+Everything is taken from arguments, so it never waits for input and suits cron jobs:
+flightsearch --from CPH --to BOJ --date 20.10.2018 --return 27.10.2018
+flightsearch --from CPH --to BOJ --date-range 20.10.2018 31.10.2018 --format csv
+flightsearch --routes-file routes.json --format jsonl --output flights.jsonl
+flightsearch --from CPH --to BOJ --date 20.10.2018 --metrics-prom flights.prom
+flightsearch --from CPH --to BOJ --date 20.10.2018 --profile search
+flightsearch --routes-file routes.json --changes snapshots.pickle --format jsonl
+With --changes only new, removed and repriced flights since the previous run
+with the same file are written, e.g. for polls from cron.
+Without installing, the same arguments may be passed to flight_cli.py
+or parsing_machine_4v3_classes.py in the root folder of the repository.
+
+Exit codes:
+0 - flights are found, or with --changes all queries are checked;
+1 - site is unreachable or its answer is broken, or some of many queries failed;
+2 - wrong arguments;
+3 - there are no flights for the route or the dates.
+"""
+import argparse
+from datetime import datetime
+import sys
+
+from .cache import TTLCache
+from .changes import ChangeTracker
+from .metrics import NO_METRICS, Metrics
+from .output import FORMATS, open_writer
+from .routes import RouteIndex
+from .search import FlightSearch, FlightSearchError, LazyModule, RouteUnavailableError
+
+# asyncio нужен только для многих запросов, не тратим на него время при запуске
+sweep = LazyModule('flightscraper.sweep')
+
+
+EXIT_OK = 0
+EXIT_SITE_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+
+
+def parse_date(text):
+    """Convert argument in dd.mm.yyyy format into datetime."""
+    try:
+        return datetime.strptime(text, '%d.%m.%Y')
+    except ValueError:
+        raise argparse.ArgumentTypeError('дата должна быть в формате ДД.ММ.ГГГГ: {}'.format(text))
+
+
+def get_parser():
+    """Return 'ArgumentParser' of the interface."""
+    parser = argparse.ArgumentParser(
+        description='Search flights on flybulgarien.dk without dialogue',
+        epilog='exit codes: 0 - found, 1 - site error, 2 - wrong arguments, 3 - no flights')
+    parser.add_argument('--from', dest='dep_city', help='departure city-code, e.g. CPH')
+    parser.add_argument('--to', dest='arr_city', help='arrival city-code, e.g. BOJ')
+    dates = parser.add_mutually_exclusive_group()
+    dates.add_argument('--date', type=parse_date, help='departure date, dd.mm.yyyy')
+    dates.add_argument('--date-range', type=parse_date, nargs=2, metavar=('FIRST', 'LAST'),
+                       help='search every available departure date between FIRST and LAST')
+    parser.add_argument('--return', dest='arr_date', type=parse_date,
+                        help='return date for round trip, dd.mm.yyyy, only with --date')
+    parser.add_argument('--routes-file',
+                        help='json file saved by RouteIndex: cities and dates are taken from it, '
+                             'without --from and --to all its routes are searched')
+    parser.add_argument('--format', choices=('table',) + FORMATS, default='table')
+    parser.add_argument('--output', help='file to write, stdout by default, not for table')
+    parser.add_argument('--concurrency', type=int,
+                        help='simultaneous searches when there are many queries, 10 by default')
+    parser.add_argument('--cache-dir', help='folder of on-disk cache for cities and dates')
+    parser.add_argument('--changes', metavar='PATH',
+                        help='write only flights changed since the previous run with the same '
+                             'PATH, where snapshots of quote-pages are kept')
+    parser.add_argument('--metrics-json', help='write timings and counters to json file')
+    parser.add_argument('--metrics-prom', help='write timings and counters to Prometheus '
+                                               'text file')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='run under cProfile and tracemalloc, write PREFIX.pstats, '
+                             'PREFIX.collapsed for flamegraphs and PREFIX.txt report')
+    parser.add_argument('--profile-top', type=int, default=25,
+                        help='number of lines in --profile report')
+    return parser
+
+
+class TableWriter:
+    """Writer printing results in tables like the dialogue, for --format table."""
+
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.rows = 0
+
+    def write_result(self, result):
+        """Print tables for search result, return number of flights in it."""
+        if 'unchanged' in result:
+            self.searcher.show_changes(result)
+            keys = ('new', 'removed', 'repriced')
+        else:
+            self.searcher.show_search_result(result)
+            keys = ('departure', 'departure_other', 'return', 'return_other')
+        rows = sum(len(result[key]) for key in keys)
+        self.rows += rows
+        return rows
+
+    def close(self):
+        """Nothing to finish: tables are printed at once."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def get_queries(args, searcher, route_index):
+    """Make list of queries (dep_city, arr_city, dep_date[, arr_date]) from arguments.
+
+    Raises ValueError if arguments don't describe any search.
+    """
+    if args.dep_city is None and args.arr_city is None:
+        if route_index is None:
+            raise ValueError('Укажите --from и --to или --routes-file')
+        queries = list(route_index.iter_queries())
+        if args.date is not None:
+            queries = [query for query in queries if query[2] == args.date]
+        if args.date_range is not None:
+            first, last = args.date_range
+            queries = [query for query in queries if first <= query[2] <= last]
+        return queries
+    if args.dep_city is None or args.arr_city is None:
+        raise ValueError('Укажите и --from, и --to')
+    if args.date is not None:
+        return [(args.dep_city, args.arr_city, args.date, args.arr_date)]
+    if args.date_range is None:
+        raise ValueError('Укажите --date или --date-range')
+    first, last = args.date_range
+    dep_city = args.dep_city.upper()
+    arr_city = args.arr_city.upper()
+    return [(dep_city, arr_city, date) for date in searcher.fetch_dates(dep_city, arr_city)
+            if first <= date <= last]
+
+
+def run(args):
+    """Run search described by parsed arguments, return exit code."""
+    if args.arr_date is not None and args.date is None:
+        raise ValueError('--return можно указать только вместе с --date')
+    if args.output is not None and args.format == 'table':
+        raise ValueError('--output нужен только для --format jsonl, csv или parquet')
+    route_index = RouteIndex.load(args.routes_file) if args.routes_file else None
+    cache = TTLCache(args.cache_dir) if args.cache_dir else None
+    metrics = Metrics() if args.metrics_json or args.metrics_prom else NO_METRICS
+    change_tracker = ChangeTracker(args.changes) if args.changes else None
+    searcher = FlightSearch(cache=cache, route_index=route_index, metrics=metrics,
+                            change_tracker=change_tracker)
+    try:
+        return run_search(args, searcher, route_index)
+    finally:
+        if change_tracker is not None:
+            change_tracker.save()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+
+
+def run_search(args, searcher, route_index):
+    """Search queries described by arguments and write results, return exit code."""
+    queries = get_queries(args, searcher, route_index)
+    if not queries:
+        print('Нет доступных дат для поиска', file=sys.stderr)
+        return EXIT_NOT_FOUND
+    writer = TableWriter(searcher) if args.format == 'table' \
+        else open_writer(args.format, args.output)
+    only_changes = searcher.change_tracker is not None
+    with writer:
+        if len(queries) == 1 and only_changes:
+            writer.write_result(searcher.search_changes(*queries[0]))
+            found = True
+            errors = 0
+        elif len(queries) == 1:
+            result = searcher.search(*queries[0])
+            writer.write_result(result)
+            # на другие даты вылеты могут быть, но на указанную - нет
+            found = bool(result['departure'])
+            errors = 0
+        else:
+            concurrency = args.concurrency or sweep.CONCURRENCY
+            errors = sweep.QuoteSweep(searcher, concurrency).export(writer, queries, only_changes)
+            # отсутствие изменений - нормальный итог опроса
+            found = writer.rows > 0 or only_changes
+    if errors:
+        print('Не удалось выполнить {} из {} запросов'.format(errors, len(queries)),
+              file=sys.stderr)
+        return EXIT_SITE_ERROR
+    return EXIT_OK if found else EXIT_NOT_FOUND
+
+
+def main(argv=None):
+    """Parse command line, run search and return exit code."""
+    args = get_parser().parse_args(argv)
+    try:
+        if args.profile:
+            from .profiling import profile_call  # pylint: disable=import-outside-toplevel
+            return profile_call(args.profile, run, args, top=args.profile_top)
+        return run(args)
+    except RouteUnavailableError as error:
+        print(error, file=sys.stderr)
+        return EXIT_NOT_FOUND
+    except FlightSearchError as error:
+        print(error, file=sys.stderr)
+        return EXIT_SITE_ERROR
+    except (ValueError, ImportError, OSError) as error:
+        print(error, file=sys.stderr)
+        return EXIT_USAGE
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+r"""
+This module runs flight search as a resident service with local HTTP API.
+
+It contains class SearchDaemon: asyncio http-server answering
+GET /search?from=CPH&to=BOJ&date=20.10.2018[&return=27.10.2018][&top=10]
+with json. Between requests the process keeps warm everything a cold start
+has to build again: keep-alive connection pool, 'TTLCache' with cities and dates,
+optional 'RouteIndex' and found results, which are served from memory while fresh.
+Identical queries arriving together wait for one search instead of starting their own.
+One event loop accepts hundreds of clients, blocking searches run in a pool of threads.
+
+Other endpoints: GET /health, GET /metrics (Prometheus text).
+
+Run it with the console script installed by pip:
+flightsearch-daemon --port 8000 [--routes-file routes.json] [--cache-dir cache]
+curl 'http://127.0.0.1:8000/search?from=CPH&to=BOJ&date=20.10.2018'
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+import json
+import traceback
+from urllib.parse import parse_qsl, urlsplit
+
+from .cache import TTLCache
+from .metrics import Metrics
+from .output import get_flight_row
+from .routes import RouteIndex
+from .search import (BASE_URL, QUOTE_URL, CircuitOpenError, FlightSearch, FlightSearchError,
+                     RouteUnavailableError)
+
+
+PORT = 8000
+# сколько поисков одновременно ходят на сайт
+WORKERS = 20
+# сколько секунд отдавать найденное из памяти, не спрашивая сайт
+RESULT_TTL = 5 * 60
+RESULTS_SIZE = 4096
+TOP_K = 10
+# через столько секунд молчания соединение с клиентом закрывается
+IDLE_TIMEOUT = 60
+
+
+def get_round_trip_row(round_trip):
+    """Convert 'RoundTrip' into json-compatible dict."""
+    return {'departure': get_flight_row(round_trip.departure, 'departure'),
+            'arrival': get_flight_row(round_trip.arrival, 'return'),
+            'price': round_trip.price,
+            'currency': str(round_trip.currency),
+            'duration_minutes': int(round_trip.duration.total_seconds()) // 60}
+
+
+def get_result_json(result):
+    """Convert result of 'FlightSearch.search()' into json bytes."""
+    body = {'dep_city': result['dep_city'],
+            'arr_city': result['arr_city'],
+            'dep_date': result['dep_date'].strftime('%d.%m.%Y'),
+            'arr_date': result['arr_date'].strftime('%d.%m.%Y') if result['arr_date'] else None,
+            'round_trips': [get_round_trip_row(round_trip)
+                            for round_trip in result['round_trips']]}
+    for direction in ('departure', 'departure_other', 'return', 'return_other'):
+        body[direction] = [get_flight_row(flight, direction) for flight in result[direction]]
+    return json.dumps(body, ensure_ascii=False, default=datetime.isoformat).encode('utf-8')
+
+
+def get_error_json(message):
+    """Return json bytes with error message."""
+    return json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+
+class SearchDaemon:
+    """Http-server answering search queries, with warm caches and connection pool.
+
+    Instance variables:
+    host, port: address to listen;
+    cache: 'TTLCache' for cities and dates shared by all searches;
+    results: 'TTLCache' for json answers of /search;
+    route_index: 'RouteIndex' or None;
+    metrics: 'Metrics' of all searches, shown at /metrics.
+    """
+
+    def __init__(self, host='127.0.0.1', port=PORT, cache=None, route_index=None,
+                 workers=WORKERS, result_ttl=RESULT_TTL, base_url=BASE_URL, quote_url=QUOTE_URL):
+        """Create 'SearchDaemon'.
+
+        Arguments:
+        optional host='127.0.0.1', port=PORT: address to listen;
+        optional cache=None: 'TTLCache' for cities and dates, in-memory one by default;
+        optional route_index=None: 'RouteIndex' answering questions about cities and dates;
+        optional workers=WORKERS: number of searches made at the same time;
+        optional result_ttl=RESULT_TTL: seconds found result is served from memory;
+        optional base_url=BASE_URL, quote_url=QUOTE_URL: addresses of sites.
+        """
+        self.host = host
+        self.port = port
+        self.cache = cache if cache is not None else TTLCache()
+        self.results = TTLCache(max_size=RESULTS_SIZE)
+        self.route_index = route_index
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.base_url = base_url
+        self.quote_url = quote_url
+        self.metrics = Metrics()
+        self._executor = None
+        # ключ запроса -> Future поиска, который сейчас выполняется
+        self._searches = {}
+
+    def make_searcher(self):
+        """Create 'FlightSearch' for one query.
+
+        Instances are cheap: session, caches and limits are shared, and a fresh
+        instance never keeps cities and dates longer than their time-to-live.
+        """
+        return FlightSearch(cache=self.cache, route_index=self.route_index,
+                            base_url=self.base_url, quote_url=self.quote_url,
+                            metrics=self.metrics)
+
+    def search(self, key):
+        """Run blocking search for key (dep_city, arr_city, dep_date, arr_date, top_k)
+        and save json answer into self.results.
+        """
+        body = get_result_json(self.make_searcher().search(*key[:4], top_k=key[4]))
+        self.results.set(key, body, self.result_ttl)
+        return body
+
+    async def answer_search(self, params):
+        """Answer /search query.
+
+        Returns tuple (status, json bytes, True if taken from memory).
+        """
+        try:
+            key = (params['from'].upper(), params['to'].upper(),
+                   FlightSearch.get_date_for_search(params['date']),
+                   FlightSearch.get_date_for_search(params['return'])
+                   if params.get('return') else None,
+                   int(params.get('top', TOP_K)))
+        except KeyError as error:
+            return HTTPStatus.BAD_REQUEST, get_error_json('missing parameter {}'.format(error)), \
+                False
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, \
+                get_error_json('dates must be dd.mm.yyyy, top must be integer'), False
+        body = self.results.get(key)
+        if body is not None:
+            self.metrics.count('daemon_cache_hits')
+            return HTTPStatus.OK, body, True
+        search = self._searches.get(key)
+        if search is None:
+            loop = asyncio.get_running_loop()
+            search = loop.run_in_executor(self._executor, self.search, key)
+            self._searches[key] = search
+            search.add_done_callback(lambda _: self._searches.pop(key, None))
+        else:
+            self.metrics.count('daemon_coalesced')
+        try:
+            # shield: клиент, закрывший соединение, не отменяет поиск для остальных
+            body = await asyncio.shield(search)
+        except RouteUnavailableError as error:
+            return HTTPStatus.NOT_FOUND, get_error_json(str(error)), False
+        except CircuitOpenError as error:
+            return HTTPStatus.SERVICE_UNAVAILABLE, get_error_json(str(error)), False
+        except FlightSearchError as error:
+            return HTTPStatus.BAD_GATEWAY, get_error_json(str(error)), False
+        return HTTPStatus.OK, body, False
+
+    async def route(self, method, target):
+        """Answer one request, return tuple (status, content type, body, extra headers)."""
+        if method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, 'application/json', \
+                get_error_json('only GET is supported'), {'Allow': 'GET'}
+        url = urlsplit(target)
+        if url.path == '/search':
+            status, body, cached = await self.answer_search(dict(parse_qsl(url.query)))
+            return status, 'application/json; charset=utf-8', body, \
+                {'X-Cache': 'HIT' if cached else 'MISS'}
+        if url.path == '/health':
+            return HTTPStatus.OK, 'application/json', b'{"status": "ok"}', {}
+        if url.path == '/metrics':
+            return HTTPStatus.OK, 'text/plain; version=0.0.4', \
+                self.metrics.to_prometheus().encode('utf-8'), {}
+        return HTTPStatus.NOT_FOUND, 'application/json', get_error_json('not found'), {}
+
+    @staticmethod
+    async def write_response(writer, status, content_type, body, extra_headers, keep_alive):
+        """Send one answer to client."""
+        head = ['HTTP/1.1 {} {}'.format(status.value, status.phrase),
+                'Content-Type: ' + content_type,
+                'Content-Length: {}'.format(len(body)),
+                'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        head += ['{}: {}'.format(name, value) for name, value in extra_headers.items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """Serve keep-alive connection of one client.
+
+        Malformed requests are answered with 400 and the connection is closed,
+        unexpected errors of search are answered with 500.
+        """
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    await reader.readexactly(int(headers.get('content-length') or 0))
+                except ValueError:
+                    await self.write_response(writer, HTTPStatus.BAD_REQUEST, 'application/json',
+                                              get_error_json('malformed request'), {}, False)
+                    break
+                try:
+                    status, content_type, body, extra_headers = await self.route(method, target)
+                except Exception:  # pylint: disable=broad-except
+                    # клиент получает ответ, а причина остаётся в журнале демона
+                    traceback.print_exc()
+                    status, content_type, body, extra_headers = \
+                        HTTPStatus.INTERNAL_SERVER_ERROR, 'application/json', \
+                        get_error_json('internal error'), {}
+                keep_alive = version == 'HTTP/1.1' and \
+                    headers.get('connection', '').lower() != 'close'
+                await self.write_response(writer, status, content_type, body, extra_headers,
+                                          keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Listen and serve until cancelled."""
+        with ThreadPoolExecutor(max_workers=self.workers) as self._executor:
+            server = await asyncio.start_server(self.handle, self.host, self.port, backlog=1024)
+            async with server:
+                await server.serve_forever()
+
+    def run(self):
+        """Blocking shortcut for scripts, stops on Ctrl+C."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    """Parse command line and run daemon."""
+    parser = argparse.ArgumentParser(description='Flight search service with http api')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--routes-file', help='json file saved by RouteIndex')
+    parser.add_argument('--cache-dir', help='folder of on-disk cache for cities and dates')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--result-ttl', type=int, default=RESULT_TTL, help='seconds')
+    args = parser.parse_args()
+    daemon = SearchDaemon(args.host, args.port, TTLCache(args.cache_dir),
+                          RouteIndex.load(args.routes_file) if args.routes_file else None,
+                          args.workers, args.result_ttl)
+    print('Слушаем http://{}:{}/search'.format(args.host, args.port))
+    daemon.run()
+
+
+if __name__ == '__main__':
+    main()
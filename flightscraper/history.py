@@ -0,0 +1,135 @@
+r"""
+This module keeps history of all flights and prices seen on quote-pages.
+
+It contains class QuoteHistory: SQLite-file where every parsed 'Flight' is appended
+together with the moment it was observed. Pass it to FlightSearch(history=...)
+and every page parsed by 'check_site_info' is saved with one bulk insert.
+Then price questions are answered from the file without scraping site again.
+"""
+from datetime import datetime
+import sqlite3
+import threading
+
+
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+OBSERVED_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS quotes (
+    dep_city TEXT NOT NULL,
+    arr_city TEXT NOT NULL,
+    dep_date TEXT NOT NULL,
+    dep_time TEXT NOT NULL,
+    arr_time TEXT NOT NULL,
+    price REAL NOT NULL,
+    currency TEXT NOT NULL,
+    observed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_route_date
+    ON quotes (dep_city, arr_city, dep_date, observed_at);
+CREATE INDEX IF NOT EXISTS quotes_flight
+    ON quotes (dep_city, arr_city, dep_time, observed_at);
+'''
+
+
+class QuoteHistory:
+    """Class for storing observed flights in SQLite-file and querying them.
+
+    Instance variables:
+    path: literally path to SQLite-file, ':memory:' for temporary store.
+    """
+
+    def __init__(self, path):
+        """Open or create store at path."""
+        self.path = path
+        # одно соединение на все потоки, запросы к нему идут по очереди
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def add_flights(self, flights, observed_at=None):
+        """Append flights observed at one moment with one bulk insert.
+
+        Arguments:
+        flights: iterable of 'Flight';
+        optional observed_at=None: datetime of observation, now by default.
+
+        Returns number of saved flights.
+        """
+        observed_at = (observed_at or datetime.now()).strftime(OBSERVED_FORMAT)
+        rows = [(flight.dep_city, flight.arr_city, flight.dep_time.strftime('%Y-%m-%d'),
+                 flight.dep_time.strftime(TIME_FORMAT), flight.arr_time.strftime(TIME_FORMAT),
+                 flight.price, str(flight.currency), observed_at) for flight in flights]
+        if rows:
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    'INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def add_search_result(self, result, observed_at=None):
+        """Append all flights of 'FlightSearch.search()' or 'check_site_info' result.
+
+        Returns number of saved flights.
+        """
+        flights = []
+        for key in ('departure', 'departure_other', 'return', 'return_other'):
+            flights.extend(result.get(key, ()))
+        return self.add_flights(flights, observed_at)
+
+    def _select(self, query, params):
+        with self._lock:
+            return self._connection.execute(query, params).fetchall()
+
+    def get_cheapest_per_day(self, dep_city, arr_city, since=None, until=None, currency=None):
+        """Find the cheapest price ever seen for every departure date of the route.
+
+        Prices in different currencies aren't compared: a date with flights
+        in several currencies gets the cheapest price in each of them.
+
+        Arguments:
+        dep_city, arr_city: city-codes of the route;
+        optional since=None, until=None: datetimes limiting departure dates;
+        optional currency=None: 'Currency' or its code to look only at, all by default.
+
+        Returns list of tuples (dep_date, price, currency, dep_time, observed_at)
+        sorted by dep_date and currency, dates are datetimes.
+        """
+        since = since.strftime('%Y-%m-%d') if since else '0000-00-00'
+        until = until.strftime('%Y-%m-%d') if until else '9999-99-99'
+        params = (dep_city, arr_city, since, until)
+        currency_filter = ''
+        if currency is not None:
+            currency_filter = 'AND currency = ? '
+            params += (str(currency),)
+        # SQLite отдаёт остальные столбцы из той же строки, где нашёлся MIN(price)
+        rows = self._select(
+            'SELECT dep_date, MIN(price), currency, dep_time, observed_at FROM quotes '
+            'WHERE dep_city = ? AND arr_city = ? AND dep_date BETWEEN ? AND ? '
+            + currency_filter + 'GROUP BY dep_date, currency ORDER BY dep_date, currency',
+            params)
+        return [(datetime.strptime(dep_date, '%Y-%m-%d'), price, code,
+                 datetime.strptime(dep_time, TIME_FORMAT),
+                 datetime.strptime(observed_at, OBSERVED_FORMAT))
+                for dep_date, price, code, dep_time, observed_at in rows]
+
+    def get_price_history(self, dep_city, arr_city, dep_time):
+        """Show how the price of one flight changed.
+
+        Arguments:
+        dep_city, arr_city: city-codes of the route;
+        dep_time: datetime of take off identifying the flight.
+
+        Returns list of tuples (observed_at, price, currency) sorted by observed_at.
+        """
+        rows = self._select(
+            'SELECT observed_at, price, currency FROM quotes '
+            'WHERE dep_city = ? AND arr_city = ? AND dep_time = ? ORDER BY observed_at',
+            (dep_city, arr_city, dep_time.strftime(TIME_FORMAT)))
+        return [(datetime.strptime(observed_at, OBSERVED_FORMAT), price, currency)
+                for observed_at, price, currency in rows]
+
+    def close(self):
+        """Close SQLite-file."""
+        with self._lock:
+            self._connection.close()
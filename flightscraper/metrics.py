@@ -0,0 +1,141 @@
+r"""
+This module measures where time of flight search goes.
+
+It contains class Metrics with three kinds of measurements:
+- spans: 'with metrics.span("request"):' times a phase into histogram 'request_seconds';
+- counters: 'metrics.count("rows_parsed", 25)';
+- histograms: 'metrics.observe("response_bytes", 4096)' for any other values.
+At the end of a run they are exported to a Prometheus text file
+(for node_exporter textfile collector) or to a json summary.
+
+Pass Metrics() to FlightSearch(metrics=...). By default FlightSearch gets NO_METRICS:
+its methods do nothing, so disabled instrumentation costs one empty call per phase.
+"""
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+
+
+PREFIX = 'flightsearch_'
+# границы корзин гистограмм в секундах, как у клиентов Prometheus
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Counts of observed values falling into buckets, with their sum and number."""
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        """Create empty 'Histogram' with upper bounds of buckets."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+        self.max = None
+
+    def observe(self, value):
+        """Add value to the histogram."""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+        self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self):
+        """Return json-compatible summary with cumulative buckets."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets['+Inf'] = self.count
+        return {'count': self.count, 'sum': self.sum, 'max': self.max,
+                'mean': self.sum / self.count if self.count else None, 'buckets': buckets}
+
+
+class Metrics:
+    """Collector of spans, counters and histograms, safe to share between threads."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1):
+        """Increase counter name by value."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS):
+        """Add value to histogram name, buckets are used when histogram is created."""
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(buckets)
+            self.histograms[name].observe(value)
+
+    @contextmanager
+    def span(self, name):
+        """Time the block into histogram '<name>_seconds', failed blocks are timed too."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name + '_seconds', time.perf_counter() - start)
+
+    def to_dict(self):
+        """Return json-compatible summary of everything measured."""
+        with self._lock:
+            return {'counters': dict(self.counters),
+                    'histograms': {name: histogram.to_dict()
+                                   for name, histogram in self.histograms.items()}}
+
+    def to_prometheus(self):
+        """Return measurements in Prometheus text exposition format."""
+        summary = self.to_dict()
+        lines = []
+        for name, value in sorted(summary['counters'].items()):
+            metric = '{}{}_total'.format(PREFIX, name)
+            lines.append('# TYPE {} counter'.format(metric))
+            lines.append('{} {}'.format(metric, value))
+        for name, histogram in sorted(summary['histograms'].items()):
+            metric = PREFIX + name
+            lines.append('# TYPE {} histogram'.format(metric))
+            for bound, count in histogram['buckets'].items():
+                lines.append('{}_bucket{{le="{}"}} {}'.format(metric, bound, count))
+            lines.append('{}_sum {}'.format(metric, histogram['sum']))
+            lines.append('{}_count {}'.format(metric, histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write Prometheus text file atomically, so collector never reads half of it."""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+    def write_json(self, path):
+        """Write json summary to path."""
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+class NoMetrics:
+    """Stand-in for 'Metrics' which measures nothing."""
+
+    _NULL_SPAN = nullcontext()
+
+    def count(self, name, value=1):
+        """Do nothing."""
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS):
+        """Do nothing."""
+
+    def span(self, name):  # pylint: disable=unused-argument
+        """Return context manager which does nothing."""
+        return self._NULL_SPAN
+
+
+NO_METRICS = NoMetrics()
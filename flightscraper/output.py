@@ -0,0 +1,196 @@
+r"""
+This module writes found flights in machine-readable formats.
+
+It contains writers with the same small interface: 'write_result()' takes one result
+of 'FlightSearch.search()' (or of a sweep) and appends its flights at once,
+'close()' finishes the file. So results may be written as they arrive,
+without keeping the whole sweep in memory.
+- JsonLinesWriter: one json object per flight;
+- CsvWriter: one csv row per flight;
+- ParquetWriter: columnar Parquet file for big sweeps, needs pyarrow>=7 installed.
+
+Every flight becomes a row with FIELDS columns, 'direction' tells which list
+of search result it came from: departure, departure_other, return or return_other.
+Results of 'FlightSearch.search_changes()' give rows with direction new, removed
+or repriced, repriced flights are written with their new price.
+"""
+import abc
+import csv
+from datetime import datetime
+import json
+import sys
+
+
+FORMATS = ('jsonl', 'csv', 'parquet')
+FIELDS = ('direction', 'dep_city', 'arr_city', 'dep_time', 'arr_time', 'duration_minutes',
+          'price', 'currency')
+DIRECTIONS = ('departure', 'departure_other', 'return', 'return_other')
+CHANGE_DIRECTIONS = ('new', 'removed', 'repriced')
+# столько строк копится в памяти перед записью очередного куска Parquet-файла
+PARQUET_BATCH_SIZE = 10000
+
+
+def get_flight_row(flight, direction):
+    """Convert 'Flight' into dict with FIELDS keys, times stay datetimes."""
+    return {'direction': direction,
+            'dep_city': flight.dep_city,
+            'arr_city': flight.arr_city,
+            'dep_time': flight.dep_time,
+            'arr_time': flight.arr_time,
+            'duration_minutes': int(flight.duration.total_seconds()) // 60,
+            'price': flight.price,
+            'currency': str(flight.currency)}
+
+
+def iter_result_rows(result):
+    """Yield rows for all flights of search result, nothing for results with 'error'."""
+    for direction in DIRECTIONS + CHANGE_DIRECTIONS:
+        for flight in result.get(direction, ()):
+            if direction == 'repriced':
+                # пара (старый рейс, новый рейс)
+                flight = flight[1]
+            yield get_flight_row(flight, direction)
+
+
+class FlightWriter(abc.ABC):
+    """Base class of writers, subclasses define 'write_rows()'.
+
+    Instance variables:
+    file: text file-object to write, None for writers working with path;
+    close_file: close file together with writer;
+    rows: number of rows written so far.
+    """
+
+    def __init__(self, file=None, close_file=False):
+        self.file = file
+        self.close_file = close_file
+        self.rows = 0
+
+    @abc.abstractmethod
+    def write_rows(self, rows):
+        """Append list of rows to the output."""
+
+    def write_result(self, result):
+        """Append all flights of search result, return number of written rows."""
+        rows = list(iter_result_rows(result))
+        if rows:
+            self.write_rows(rows)
+            self.rows += len(rows)
+        return len(rows)
+
+    def close(self):
+        """Flush everything to the output."""
+        if self.file is not None:
+            self.file.flush()
+            if self.close_file:
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class JsonLinesWriter(FlightWriter):
+    """Write every flight as json object on its own line, times in iso format."""
+
+    def write_rows(self, rows):
+        self.file.write(''.join(json.dumps(row, ensure_ascii=False, default=datetime.isoformat)
+                                + '\n' for row in rows))
+        self.file.flush()
+
+
+class CsvWriter(FlightWriter):
+    """Write every flight as csv row, header goes first."""
+
+    def __init__(self, file, close_file=False):
+        """Create writer to text file-object opened with newline=''."""
+        super().__init__(file, close_file)
+        self.writer = csv.DictWriter(file, FIELDS)
+        self.writer.writeheader()
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+
+class ParquetWriter(FlightWriter):
+    """Write flights into Parquet file by batches of PARQUET_BATCH_SIZE rows."""
+
+    def __init__(self, path, batch_size=PARQUET_BATCH_SIZE):
+        """Create writer to file at path.
+
+        Raises ImportError with explanation if pyarrow isn't installed.
+        """
+        super().__init__()
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise ImportError(
+                'Для записи в Parquet установите pyarrow>=7: pip install "pyarrow>=7"')
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([('direction', pyarrow.string()),
+                                      ('dep_city', pyarrow.string()),
+                                      ('arr_city', pyarrow.string()),
+                                      ('dep_time', pyarrow.timestamp('s')),
+                                      ('arr_time', pyarrow.timestamp('s')),
+                                      ('duration_minutes', pyarrow.int32()),
+                                      ('price', pyarrow.float64()),
+                                      ('currency', pyarrow.string())])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.batch_size = batch_size
+        self._batch = []
+
+    def write_rows(self, rows):
+        self._batch.extend(rows)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write collected rows as the next row group."""
+        if self._batch:
+            self.writer.write_table(
+                self.pyarrow.Table.from_pylist(self._batch, schema=self.schema))
+            self._batch = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_writer(output_format, path=None):
+    """Create writer for output_format from FORMATS.
+
+    Arguments:
+    output_format: 'jsonl', 'csv' or 'parquet';
+    optional path=None: file to write, stdout by default (not for Parquet).
+
+    Returns writer, closing it also closes the file at path.
+    """
+    if output_format == 'parquet':
+        if path is None:
+            raise ValueError('Для Parquet нужно указать файл')
+        return ParquetWriter(path)
+    writer_class = {'jsonl': JsonLinesWriter, 'csv': CsvWriter}.get(output_format)
+    if writer_class is None:
+        raise ValueError('Неизвестный формат {}, есть только: {}'.format(
+            output_format, ', '.join(FORMATS)))
+    if path is None:
+        return writer_class(sys.stdout)
+    return writer_class(open(path, 'w', newline='', encoding='utf-8'), close_file=True)
+
+
+def write_results(results, writer):
+    """Write every result of iterable as soon as it arrives.
+
+    Returns number of results which had errors and were skipped.
+    """
+    errors = 0
+    for result in results:
+        if 'error' in result:
+            errors += 1
+        else:
+            writer.write_result(result)
+    return errors
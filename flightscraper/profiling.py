@@ -0,0 +1,188 @@
+r"""
+This module profiles flight search: where CPU time goes and what allocates memory.
+
+It contains class Profiler, a context manager which runs the block under cProfile
+and tracemalloc and samples stacks of its threads every SAMPLE_INTERVAL seconds.
+Threads started inside the block (e.g. by QuoteSweep) are profiled too: before Python 3.12
+each of them gets its own cProfile, since 3.12 the profiler of the block sees all threads.
+After the block three files are written next to the given prefix:
+- <prefix>.pstats: raw cProfile data for pstats or snakeviz;
+- <prefix>.collapsed: sampled stacks for flamegraph.pl or speedscope, in number of samples;
+- <prefix>.txt: methods of FlightSearch and other flightscraper modules sorted by cumulative
+  time and top-N lines allocating memory.
+
+>>> with Profiler('search'):
+...     FlightSearch().search('CPH', 'BOJ', '20.10.2018')
+The same is done by 'flightsearch ... --profile search'.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+
+TOP = 25
+# сколько кадров стека помнить для каждого выделения памяти
+FRAMES = 10
+# стеки глубже обрезаются, остаются вызовы, ближайшие к текущему
+MAX_DEPTH = 100
+# как часто снимать стеки потоков, в секундах
+SAMPLE_INTERVAL = 0.005
+# с Python 3.12 cProfile работает через sys.monitoring: один профилировщик видит все потоки,
+# а включить второй в новом потоке нельзя
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+# функции модулей из этой папки попадают в отчёт по методам
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_frame_name(function):
+    """Return name of pstats function key (filename, line, name) for collapsed stacks."""
+    filename, line, name = function
+    if filename == '~':
+        return name.replace(';', ',')
+    return '{}:{}:{}'.format(os.path.basename(filename), name, line).replace(';', ',')
+
+
+def get_stack(frame):
+    """Return collapsed stack of frame: names of calls from the outermost one, joined by ';'."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(get_frame_name((code.co_filename, code.co_firstlineno, code.co_name)))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def write_collapsed(samples, path):
+    """Write dict collapsed stack -> number of samples to path."""
+    with open(path, 'w') as file:
+        for stack, count in sorted(samples.items()):
+            file.write('{} {}\n'.format(stack, count))
+
+
+def get_methods_report(stats, top=TOP):
+    """Return lines of report about functions of flightscraper modules, slowest first."""
+    rows = [(entry[3], entry[2], entry[1], function)
+            for function, entry in stats.stats.items()
+            if os.path.dirname(os.path.abspath(function[0])) == PACKAGE_DIR]
+    rows.sort(reverse=True)
+    lines = ['{:>10} {:>10} {:>10}  {}'.format('calls', 'own, s', 'total, s', 'function')]
+    for total_time, own_time, calls, function in rows[:top]:
+        lines.append('{:>10} {:>10.4f} {:>10.4f}  {}'.format(calls, own_time, total_time,
+                                                              get_frame_name(function)))
+    return lines
+
+
+def get_allocations_report(snapshot, top=TOP):
+    """Return lines of report about lines of code holding the most memory."""
+    lines = ['{:>12} {:>10}  {}'.format('size, KiB', 'blocks', 'line')]
+    for statistic in snapshot.statistics('lineno')[:top]:
+        frame = statistic.traceback[0]
+        lines.append('{:>12.1f} {:>10}  {}:{}'.format(statistic.size / 1024, statistic.count,
+                                                     frame.filename, frame.lineno))
+    return lines
+
+
+class Profiler:
+    """Context manager running its block under cProfile and tracemalloc.
+
+    Instance variables:
+    prefix: path prefix of written files;
+    top: number of lines in reports;
+    interval: seconds between samples of stacks;
+    samples: dict collapsed stack -> number of samples;
+    stats: 'pstats.Stats' after the block, None before.
+    """
+
+    def __init__(self, prefix, top=TOP, interval=SAMPLE_INTERVAL):
+        """Create 'Profiler' writing files <prefix>.pstats, .collapsed and .txt."""
+        self.prefix = prefix
+        self.top = top
+        self.interval = interval
+        self.samples = {}
+        self.stats = None
+        # пары (поток, его cProfile или None), первый - поток, открывший блок
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def _profile_thread(self, *_):
+        """Start profiling new thread, installed by threading.setprofile.
+
+        The thread is remembered for sampling of stacks even if it can't get its own
+        cProfile: since Python 3.12 it is profiled by cProfile of the block,
+        and only one profiler may be active in a thread.
+        """
+        profile = None
+        if PER_THREAD_PROFILES:
+            profile = cProfile.Profile()
+            try:
+                # enable() заменяет эту функцию профилировщиком cProfile в текущем потоке
+                profile.enable()
+            except ValueError:
+                profile = None
+        if profile is None:
+            sys.setprofile(None)
+        with self._lock:
+            self._profiles.append((threading.current_thread(), profile))
+
+    def _sample(self):
+        """Count stacks of profiled threads until the block ends, runs in its own thread."""
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                thread_ids = {thread.ident for thread, _ in self._profiles}
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=W0212
+                if thread_id in thread_ids:
+                    stack = get_stack(frame)
+                    self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def __enter__(self):
+        tracemalloc.start(FRAMES)
+        profile = cProfile.Profile()
+        self._profiles.append((threading.current_thread(), profile))
+        # сэмплер запускается раньше setprofile, чтобы не профилировать его самого
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        threading.setprofile(self._profile_thread)
+        profile.enable()
+        return self
+
+    def __exit__(self, *_):
+        self._profiles[0][1].disable()
+        threading.setprofile(None)
+        self._stopped.set()
+        self._sampler.join()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with self._lock:
+            threads = list(self._profiles)
+        # cProfile выключается только из своего потока, поэтому данные берём у завершившихся:
+        # профилировщик живого потока ещё пишет в свою статистику
+        running = [profile for thread, profile in threads if profile is not None
+                   and thread is not threading.current_thread() and thread.is_alive()]
+        profiles = [profile for _, profile in threads
+                    if profile is not None and profile not in running]
+        self.stats = pstats.Stats(*profiles)
+        self.stats.dump_stats(self.prefix + '.pstats')
+        write_collapsed(self.samples, self.prefix + '.collapsed')
+        lines = ['Time: {:.4f} s in {} threads'.format(self.stats.total_tt,
+                                                       len(threads) - len(running))]
+        if running:
+            lines.append('{} threads still running after the block are left out'.format(
+                len(running)))
+        lines += get_methods_report(self.stats, self.top)
+        lines += ['', 'Memory: {:.1f} KiB now, {:.1f} KiB peak'.format(current / 1024,
+                                                                      peak / 1024)]
+        lines += get_allocations_report(snapshot, self.top)
+        with open(self.prefix + '.txt', 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+
+
+def profile_call(prefix, function, *args, top=TOP, **kwargs):
+    """Run function(*args, **kwargs) under 'Profiler' and return its result."""
+    with Profiler(prefix, top):
+        return function(*args, **kwargs)
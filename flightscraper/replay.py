@@ -0,0 +1,199 @@
+r"""
+This module lets FlightSearch work without http://www.flybulgarien.dk/ and apps.penguin.bg.
+
+It contains two session classes which can be passed to FlightSearch(session=...):
+- RecordingSession makes real requests and saves every answer to a folder;
+- ReplaySession answers requests with saved responses, the same request always
+  gets the same answer.
+Also there are functions building synthetic pages of any size for benchmarks and tests.
+"""
+import base64
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .search import BASE_URL, QUOTE_URL, get_session
+
+
+# с ними сайт может ответить 304 без тела, а такой ответ нельзя воспроизвести
+CONDITIONAL_HEADERS = ('if-none-match', 'if-modified-since')
+
+CITY_NAMES = {'CPH': 'Copenhagen', 'BLL': 'Billund', 'BOJ': 'Burgas', 'SOF': 'Sofia',
+              'VAR': 'Varna', 'AAL': 'Aalborg', 'AAR': 'Aarhus', 'PDV': 'Plovdiv'}
+
+
+def get_request_key(method, url, params=None, data=None):
+    """Return name of fixture file for request.
+
+    Parameters with None value are skipped, as requests lib doesn't send them.
+    """
+    params = sorted((key, str(value)) for key, value in (params or {}).items()
+                    if value is not None)
+    raw_key = json.dumps([method.upper(), url, params, data], ensure_ascii=False)
+    return hashlib.sha1(raw_key.encode('utf-8')).hexdigest() + '.json'
+
+
+def store_response(directory, method, url, content, params=None, data=None, status=200,
+                   headers=None, encoding='utf-8'):
+    """Save answer for request into fixture folder.
+
+    Arguments:
+    directory: fixture folder;
+    method, url, params, data: request the same as for 'FlightSearch.get_html_from_url';
+    content: body of answer, bytes;
+    optional status=200, headers=None, encoding='utf-8': the rest of answer.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fixture = {'method': method.upper(), 'url': url, 'params': params, 'data': data,
+               'status': status, 'headers': dict(headers or {}), 'encoding': encoding,
+               'content': base64.b64encode(content).decode('ascii')}
+    with open(os.path.join(directory, get_request_key(method, url, params, data)), 'w') as file:
+        json.dump(fixture, file, ensure_ascii=False, indent=1)
+
+
+class RecordingSession:
+    """Session which makes real requests and saves their answers into fixture folder."""
+
+    def __init__(self, directory, session=None):
+        """Create 'RecordingSession'.
+
+        Arguments:
+        directory: fixture folder;
+        optional session=None: session for real requests, shared one by default.
+        """
+        self.directory = directory
+        self.session = session if session is not None else get_session()
+
+    def request(self, method, url, params=None, data=None, headers=None, **kwargs):
+        """Make request like requests.Session.request and save its answer.
+
+        Conditional headers are dropped, so a repeated request is saved with full body
+        instead of '304 Not Modified', which replay with fresh 'ValidatorStore' couldn't use.
+        """
+        if headers:
+            headers = {name: value for name, value in headers.items()
+                       if name.lower() not in CONDITIONAL_HEADERS}
+        response = self.session.request(method, url, params=params, data=data, headers=headers,
+                                        **kwargs)
+        store_response(self.directory, method, url, response.content, params=params, data=data,
+                       status=response.status_code, headers=response.headers,
+                       encoding=response.encoding)
+        return response
+
+
+class ReplaySession:
+    """Session which answers requests with responses saved by 'RecordingSession'."""
+
+    def __init__(self, directory):
+        """Create 'ReplaySession'.
+
+        Arguments:
+        directory: fixture folder.
+        """
+        self.directory = directory
+
+    def request(self, method, url, params=None, data=None, headers=None, **kwargs):
+        """Return saved answer like requests.Session.request.
+
+        Raises requests.ConnectionError if there is no saved answer for the request.
+        """
+        path = os.path.join(self.directory, get_request_key(method, url, params, data))
+        try:
+            with open(path) as file:
+                fixture = json.load(file)
+        except FileNotFoundError:
+            raise requests.ConnectionError('no recorded response for {} {} {} {}'.format(
+                method, url, params, data))
+        response = requests.Response()
+        response.status_code = fixture['status']
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        response.encoding = fixture['encoding']
+        response.url = url
+        response._content = base64.b64decode(fixture['content'])  # pylint: disable=protected-access
+        return response
+
+
+def make_dep_page(cities):
+    """Return main page of site with <select id="departure-city"> for city-codes."""
+    options = ''.join('<option value="{0}">{1} ({0})</option>'.format(
+        city, CITY_NAMES.get(city, city)) for city in cities)
+    return ('<html><body><form><select id="departure-city">{}</select></form></body></html>'.
+            format(options))
+
+
+def make_dates_text(dates):
+    """Return answer of getdates script for list of datetimes."""
+    return '[{}]'.format(','.join('[{0.year},{0.month},{0.day}]'.format(date) for date in dates))
+
+
+def make_quote_rows(rows, dep_city, arr_city, date, return_flight=False, start=0):
+    """Return html-rows of quote-page: pairs of 'flywiz_rinf' and 'flywiz_rprc' rows.
+
+    Arguments:
+    rows: number of flights;
+    dep_city, arr_city: city-codes;
+    date: datetime of flights, every next 24 flights go a day later;
+    optional return_flight=False: make 'flywiz_irinf' and 'flywiz_irprc' rows instead;
+    optional start=0: number of the first row, makes prices and times differ.
+    """
+    prefix = 'flywiz_ir' if return_flight else 'flywiz_r'
+    dep_name = '{} ({})'.format(CITY_NAMES.get(dep_city, dep_city), dep_city)
+    arr_name = '{} ({})'.format(CITY_NAMES.get(arr_city, arr_city), arr_city)
+    html_rows = []
+    for number in range(start, start + rows):
+        flight_date = date + timedelta(days=(number - start) // 24)
+        html_rows.append(
+            '<tr id="{0}inf{1}"><td>{2}</td><td>{3:02d}:{4:02d}</td><td>{5:02d}:{4:02d}</td>'
+            '<td>{6}</td><td>{7}</td></tr>'
+            '<tr id="{0}prc{1}"><td>Price:  {8}.00 EUR</td></tr>'.format(
+                prefix, number, flight_date.strftime('%a, %d %b %y'), number % 24,
+                number * 7 % 60, (number + 3) % 24, dep_name, arr_name,
+                50 + number * 37 % 250))
+    return ''.join(html_rows)
+
+
+def make_quote_page(rows, dep_city='CPH', arr_city='BOJ', dep_date=None, arr_date=None):
+    """Return quote-page with rows departure flights and as many return flights
+    if arr_date is given.
+    """
+    dep_date = dep_date if dep_date is not None else datetime(2018, 10, 20)
+    html_rows = make_quote_rows(rows, dep_city, arr_city, dep_date)
+    if arr_date is not None:
+        html_rows += make_quote_rows(rows, arr_city, dep_city, arr_date, return_flight=True)
+    return ('<html><body><table id="flywiz_tblQuotes"><tr><th>Date</th><th>Dep</th>'
+            '<th>Arr</th><th>From</th><th>To</th></tr>{}</table></body></html>'.format(html_rows))
+
+
+def write_synthetic_fixtures(directory, rows, dep_city='CPH', arr_city='BOJ',
+                             dep_date=None, arr_date=None):
+    """Save synthetic answers of all four endpoints for one round trip search.
+
+    Arguments:
+    directory: fixture folder;
+    rows: number of flights on quote-page for each direction;
+    optional dep_city='CPH', arr_city='BOJ': city-codes of the route;
+    optional dep_date=None, arr_date=None: datetimes, 20 and 27 October 2018 by default.
+
+    Returns tuple (dep_city, arr_city, dep_date, arr_date) for 'FlightSearch.search()'.
+    """
+    dep_date = dep_date if dep_date is not None else datetime(2018, 10, 20)
+    arr_date = arr_date if arr_date is not None else dep_date + timedelta(days=7)
+    store_response(directory, 'GET', BASE_URL + 'en/',
+                   make_dep_page([dep_city, arr_city]).encode('utf-8'))
+    for city, other_city in ((dep_city, arr_city), (arr_city, dep_city)):
+        store_response(directory, 'GET', '{}script/getcity/2-{}'.format(BASE_URL, city),
+                       json.dumps([other_city]).encode('utf-8'))
+        store_response(directory, 'POST', BASE_URL + 'script/getdates/2-departure',
+                       make_dates_text([dep_date, arr_date]).encode('utf-8'),
+                       data='code1={}&code2={}'.format(city, other_city))
+    payload = {'rt': '', 'lang': 'en', 'depdate': dep_date.strftime('%d.%m.%Y'),
+               'aptcode1': dep_city, 'rtdate': arr_date.strftime('%d.%m.%Y'),
+               'aptcode2': arr_city, 'paxcount': 1, 'infcount': ''}
+    store_response(directory, 'GET', QUOTE_URL,
+                   make_quote_page(rows, dep_city, arr_city, dep_date, arr_date).encode('utf-8'),
+                   params=payload)
+    return dep_city, arr_city, dep_date, arr_date
@@ -0,0 +1,114 @@
+r"""
+This module builds full index of routes offered by http://www.flybulgarien.dk/en/.
+
+It contains class RouteIndex: adjacency map departure city -> arrival city -> dates.
+The index is crawled once with 'RouteIndex.crawl()', saved to compact json-file
+and then answers all questions about cities and dates without network calls.
+To use it pass it to FlightSearch: FlightSearch(route_index=RouteIndex.load(path)).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+
+from .search import FlightSearch
+
+
+# сколько запросов к сайту делать одновременно при обходе
+CONCURRENCY = 10
+
+
+class RouteIndex:
+    """Class for storing all routes and their available dates.
+
+    Instance variables:
+    routes: dict departure city-code -> dict arrival city-code -> sorted list of dates;
+    crawled_at: datetime when index was built.
+    """
+
+    def __init__(self, routes, crawled_at=None):
+        """Create 'RouteIndex'.
+
+        Arguments:
+        routes: dict departure city-code -> dict arrival city-code -> list of dates;
+        optional crawled_at=None: datetime when index was built, now by default.
+        """
+        self.routes = routes
+        self.crawled_at = crawled_at if crawled_at is not None else datetime.now()
+
+    @classmethod
+    def crawl(cls, searcher=None, concurrency=CONCURRENCY):
+        """Walk every departure city and every its route concurrently.
+
+        Arguments:
+        optional searcher=None: FlightSearch used for requests, a new one by default;
+        optional concurrency=CONCURRENCY: number of simultaneous requests.
+
+        Returns 'RouteIndex'.
+        """
+        if searcher is None:
+            searcher = FlightSearch()
+        searcher.get_dep_cities()
+        dep_cities = searcher.data['cities_for_dep']
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            arr_cities = executor.map(searcher.fetch_arr_cities, dep_cities)
+            edges = [(dep_city, arr_city)
+                     for dep_city, cities in zip(dep_cities, arr_cities) for arr_city in cities]
+            dates = executor.map(lambda edge: searcher.fetch_dates(*edge), edges)
+            routes = {dep_city: {} for dep_city in dep_cities}
+            for (dep_city, arr_city), edge_dates in zip(edges, dates):
+                routes[dep_city][arr_city] = list(edge_dates)
+        return cls(routes)
+
+    def get_dep_cities(self):
+        """Return list of departure city-codes."""
+        return list(self.routes)
+
+    def get_arr_cities(self, dep_city):
+        """Return list of city-codes reachable from dep_city, empty for unknown city."""
+        return list(self.routes.get(dep_city, {}))
+
+    def get_dates(self, dep_city, arr_city):
+        """Return sorted list of dates for the route, empty for unknown route."""
+        return self.routes.get(dep_city, {}).get(arr_city, [])
+
+    def has_route(self, dep_city, arr_city):
+        """Check if there are flights from dep_city to arr_city."""
+        return arr_city in self.routes.get(dep_city, {})
+
+    def iter_queries(self):
+        """Yield tuples (dep_city, arr_city, dep_date) for all routes and dates,
+        suitable for 'FlightSearch.batch_search()' and 'QuoteSweep'.
+        """
+        for dep_city, arr_cities in self.routes.items():
+            for arr_city, dates in arr_cities.items():
+                for dep_date in dates:
+                    yield dep_city, arr_city, dep_date
+
+    def to_dict(self):
+        """Return index as json-compatible dict with dates in yyyymmdd format."""
+        return {'crawled_at': self.crawled_at.strftime('%Y%m%d%H%M%S'),
+                'routes': {dep_city: {arr_city: [date.strftime('%Y%m%d') for date in dates]
+                                      for arr_city, dates in arr_cities.items()}
+                           for dep_city, arr_cities in self.routes.items()}}
+
+    @classmethod
+    def from_dict(cls, raw):
+        """Create 'RouteIndex' from dict made by 'to_dict()'."""
+        routes = {dep_city: {arr_city: [datetime.strptime(date, '%Y%m%d') for date in dates]
+                             for arr_city, dates in arr_cities.items()}
+                  for dep_city, arr_cities in raw['routes'].items()}
+        return cls(routes, datetime.strptime(raw['crawled_at'], '%Y%m%d%H%M%S'))
+
+    def save(self, path):
+        """Write index to json-file at path."""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.to_dict(), file, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read index from json-file at path."""
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
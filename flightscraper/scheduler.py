@@ -0,0 +1,266 @@
+r"""
+This module spreads big sweeps of flight searches over several processes.
+
+It contains class SweepScheduler. Queries are cut into small chunks, biggest
+expected pages first, and given to a pool of worker processes. Sizes are known from
+the checkpoint of previous runs, before them they are guessed by number of dates
+of every route: a worker which
+finished its chunk takes the next one, so fast and slow routes balance themselves.
+Every worker runs its own asyncio 'QuoteSweep' with its own connection pool,
+so both network waits and parsing CPU are spread over all cores.
+
+Finished queries are written to a checkpoint file, after Ctrl+C or SIGTERM
+running chunks are completed and the next run with the same checkpoint
+skips everything done before.
+
+Run the console script installed by pip to sweep all routes into a file:
+flightsearch-sweep --format parquet --output flights.parquet --checkpoint sweep.json
+"""
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+import json
+import os
+import signal
+import sys
+
+from .cache import TTLCache
+from .cli import EXIT_OK, EXIT_SITE_ERROR
+from .output import FORMATS, open_writer, write_results
+from .routes import RouteIndex
+from .search import (BASE_URL, HOST_RATE_LIMITS, QUOTE_URL, RATE_LIMIT, FlightSearch,
+                     HostRateLimits, make_session)
+from .sweep import QuoteSweep
+
+
+CHUNK_SIZE = 20
+# сколько запросов одновременно делает каждый процесс
+WORKER_CONCURRENCY = 5
+
+_WORKER_SWEEP = None
+
+
+def init_worker(options):
+    """Create 'QuoteSweep' of worker process.
+
+    Arguments:
+    options: dict with 'concurrency', 'rate_limit', 'host_rates', 'cache_dir', 'base_url',
+    'quote_url'; rates are this worker's share of the total.
+    """
+    global _WORKER_SWEEP  # pylint: disable=global-statement
+    # когда остановиться, решает главный процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cache = TTLCache(options['cache_dir']) if options['cache_dir'] else None
+    searcher = FlightSearch(session=make_session(pool_size=options['concurrency']), cache=cache,
+                            base_url=options['base_url'], quote_url=options['quote_url'],
+                            rate_limits=HostRateLimits(options['rate_limit'],
+                                                       options['host_rates']))
+    _WORKER_SWEEP = QuoteSweep(searcher, options['concurrency'])
+
+
+def run_chunk(queries):
+    """Search chunk of queries in worker process, return list of results."""
+    return _WORKER_SWEEP.run(queries)
+
+
+def get_query_key(query):
+    """Return string identifying query in checkpoint file."""
+    return '|'.join(value.strftime('%d.%m.%Y') if isinstance(value, datetime) else str(value)
+                    for value in query if value is not None).upper()
+
+
+def get_result_key(result):
+    """Return the same string as 'get_query_key()' for search result."""
+    return get_query_key((result['dep_city'], result['arr_city'],
+                          result['dep_date'], result['arr_date']))
+
+
+class SweepScheduler:
+    """Class for running searches for many queries on several processes.
+
+    Instance variables:
+    workers: number of worker processes;
+    chunk_size: number of queries given to a worker at once;
+    checkpoint_path: file with finished queries, None to start from scratch every time;
+    route_index: 'RouteIndex' for guessing sizes of routes without finished queries or None;
+    done: dict query key -> number of flights found, loaded from checkpoint;
+    stopping: True after shutdown was requested.
+    """
+
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE, concurrency=WORKER_CONCURRENCY,
+                 rate_limit=RATE_LIMIT, checkpoint_path=None, cache_dir=None,
+                 base_url=BASE_URL, quote_url=QUOTE_URL, route_index=None):
+        """Create 'SweepScheduler'.
+
+        Arguments:
+        optional workers=None: number of processes, number of CPU cores by default;
+        optional chunk_size=CHUNK_SIZE: number of queries given to a worker at once;
+        optional concurrency=WORKER_CONCURRENCY: requests in flight in every worker;
+        optional rate_limit=RATE_LIMIT: requests per second of all workers together to hosts
+        not mentioned in HOST_RATE_LIMITS, every worker keeps its equal share of every limit;
+        optional checkpoint_path=None: file with finished queries;
+        optional cache_dir=None: folder of on-disk 'TTLCache' shared by workers;
+        optional base_url=BASE_URL, quote_url=QUOTE_URL: addresses of sites;
+        optional route_index=None: 'RouteIndex' of swept routes, by default number of dates
+        of a route is counted among queries given to 'def get_chunks'.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+        self.route_index = route_index
+        # у каждого процесса свои TokenBucket, поэтому делим пределы между ними
+        self.options = {'concurrency': concurrency, 'rate_limit': rate_limit / self.workers,
+                        'host_rates': {host: rate / self.workers
+                                       for host, rate in HOST_RATE_LIMITS.items()},
+                        'cache_dir': cache_dir, 'base_url': base_url, 'quote_url': quote_url}
+        self.done = {}
+        self.stopping = False
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as file:
+                self.done = json.load(file)
+
+    def save_checkpoint(self):
+        """Write finished queries to checkpoint file."""
+        if self.checkpoint_path is None:
+            return
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.done, file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def get_route_dates(self, queries):
+        """Return dict route key 'DEP|ARR' -> number of its dates in self.route_index,
+        or among queries if there is no index.
+        """
+        if self.route_index is not None:
+            return {get_query_key((dep_city, arr_city)): len(dates)
+                    for dep_city, arr_cities in self.route_index.routes.items()
+                    for arr_city, dates in arr_cities.items()}
+        route_dates = {}
+        for query in queries:
+            route = get_query_key(query[:2])
+            route_dates[route] = route_dates.get(route, 0) + 1
+        return route_dates
+
+    def get_route_sizes(self, queries=()):
+        """Return dict route key 'DEP|ARR' -> expected number of flights on its quote-page.
+
+        Average of finished queries is taken for routes which have them. Other routes
+        are guessed by number of dates from 'def get_route_dates': the more often a route
+        flies, the more flights its pages show. Dates are turned into flights
+        with the ratio of routes having both, one flight per date if there are none.
+        """
+        totals = {}
+        for key, rows in self.done.items():
+            route = '|'.join(key.split('|')[:2])
+            total, count = totals.get(route, (0, 0))
+            totals[route] = total + rows, count + 1
+        route_sizes = {route: total / count for route, (total, count) in totals.items()}
+        route_dates = self.get_route_dates(queries)
+        known = [route for route in route_sizes if route_dates.get(route)]
+        flights_per_date = sum(route_sizes[route] for route in known) / \
+            sum(route_dates[route] for route in known) if known else 1
+        for route, dates in route_dates.items():
+            route_sizes.setdefault(route, dates * flights_per_date)
+        return route_sizes
+
+    @staticmethod
+    def estimate_size(query, route_sizes):
+        """Guess how many flights the quote-page of query has.
+
+        Arguments:
+        query: tuple (dep_city, arr_city, dep_date[, arr_date]);
+        route_sizes: dict returned by 'def get_route_sizes'.
+
+        Expected size of the route is used, round trips are considered twice as big
+        as one-way tickets.
+        """
+        one_way_size = route_sizes.get(get_query_key(query[:2]), 1)
+        return one_way_size * (2 if len(query) > 3 and query[3] is not None else 1)
+
+    def get_chunks(self, queries):
+        """Drop finished queries and cut the rest into chunks, biggest pages first."""
+        queries = [tuple(query) for query in queries]
+        route_sizes = self.get_route_sizes(queries)
+        queries = [query for query in queries if get_query_key(query) not in self.done]
+        queries.sort(key=lambda query: self.estimate_size(query, route_sizes), reverse=True)
+        return [queries[start:start + self.chunk_size]
+                for start in range(0, len(queries), self.chunk_size)]
+
+    def stop(self, *_):
+        """Ask to finish running chunks and not start new ones, suitable as signal handler."""
+        self.stopping = True
+
+    def iter_results(self, queries):
+        """Search all queries on worker processes and yield results as chunks finish.
+
+        Results with errors are yielded too, but are not written to checkpoint,
+        so they are repeated on resume.
+        """
+        chunks = iter(self.get_chunks(queries))
+        previous_handlers = {number: signal.signal(number, self.stop)
+                             for number in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                     initargs=(self.options,)) as executor:
+                running = set()
+                while True:
+                    # держим каждому процессу по два куска: один в работе, один в очереди
+                    while not self.stopping and len(running) < 2 * self.workers:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        running.add(executor.submit(run_chunk, chunk))
+                    if not running:
+                        break
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        for result in future.result():
+                            if 'error' not in result:
+                                self.done[get_result_key(result)] = sum(
+                                    len(result[key]) for key in
+                                    ('departure', 'departure_other', 'return', 'return_other'))
+                            yield result
+                    self.save_checkpoint()
+        finally:
+            self.save_checkpoint()
+            for number, handler in previous_handlers.items():
+                signal.signal(number, handler)
+
+    def run(self, queries):
+        """Search all queries and return list of results."""
+        return list(self.iter_results(queries))
+
+    def export(self, queries, writer):
+        """Search all queries and write flights of every result as soon as its chunk finishes.
+
+        Returns number of queries which failed.
+        """
+        return write_results(self.iter_results(queries), writer)
+
+
+def main():
+    """Parse command line, sweep all routes into file and return exit code."""
+    parser = argparse.ArgumentParser(description='Sweep all routes of flybulgarien.dk')
+    parser.add_argument('--routes', help='json file saved by RouteIndex, crawled if omitted')
+    parser.add_argument('--format', choices=FORMATS, default='jsonl')
+    parser.add_argument('--output', help='file to write, stdout by default')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--cache-dir')
+    args = parser.parse_args()
+    route_index = RouteIndex.load(args.routes) if args.routes else RouteIndex.crawl()
+    scheduler = SweepScheduler(args.workers, checkpoint_path=args.checkpoint,
+                               cache_dir=args.cache_dir, route_index=route_index)
+    with open_writer(args.format, args.output) as writer:
+        errors = scheduler.export(route_index.iter_queries(), writer)
+    if errors:
+        # stdout может быть занят самими данными
+        print('Не удалось проверить {} запросов, они повторятся при следующем запуске '
+              'с тем же --checkpoint'.format(errors), file=sys.stderr)
+        return EXIT_SITE_ERROR
+    return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
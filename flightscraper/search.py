@@ -0,0 +1,1608 @@
+r"""
+This module parses information about flight tickets from http://www.flybulgarien.dk/en/
+with parameters taken from user.
+
+It contains class FlightSearch inside which whole work is perform.
+After creating an instance of this class you should run its work by calling 'start()' method.
+For scripts there are non-interactive 'search()' and 'batch_search()' methods
+which return found flights instead of printing them.
+
+Importing the module makes no requests and doesn't import requests, lxml and texttable:
+they are loaded by 'LazyModule' on first use, so short scripts start quickly.
+The dialogue is started by 'python parsing_machine_4v3_classes.py' in the root folder
+of the repository.
+"""
+from bisect import bisect_left
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from enum import Enum
+from functools import lru_cache
+import heapq
+import importlib
+from io import BytesIO
+from operator import attrgetter
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+from json.decoder import JSONDecodeError
+
+from .metrics import NO_METRICS
+
+
+class LazyModule:
+    """Module which is imported on the first access to its attribute."""
+
+    def __init__(self, name):
+        """Create 'LazyModule' for module with full name like 'lxml.etree'."""
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+
+requests = LazyModule('requests')
+urllib3_retry = LazyModule('urllib3.util.retry')
+etree = LazyModule('lxml.etree')
+html = LazyModule('lxml.html')
+texttable = LazyModule('texttable')
+
+
+BASE_URL = 'http://www.flybulgarien.dk/'
+QUOTE_URL = 'https://apps.penguin.bg/fly/quote3.aspx'
+CITY_REGEX = re.compile(r'[A-Z]{3}')
+# id строк таблицы с вылетами: (i)r - ТУДА или ОБРАТНО, inf/prc - информация или цена
+QUOTE_ROW_REGEX = re.compile(r'flywiz_(i?)r(inf|prc)')
+# таймауты (на соединение, на чтение ответа) в секундах
+TIMEOUT = (5, 30)
+# сколько соединений держать открытыми для каждого хоста
+POOL_SIZE = 10
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+# сколько секунд считать свежими списки городов и дат (сайт меняет их не чаще раза в день)
+CITIES_TTL = 24 * 60 * 60
+DATES_TTL = 6 * 60 * 60
+# для скольких запросов помнить ETag/Last-Modified и последний ответ
+VALIDATORS_SIZE = 256
+# таблицы длиннее печатаются без рамок: Texttable слишком медленный для десятков тысяч строк
+TABLE_ROWS_LIMIT = 1000
+# после стольких неудач подряд перестаём ходить на хост...
+FAILURE_THRESHOLD = 5
+# ...на столько секунд
+COOLDOWN = 30
+# не больше стольких запросов в секунду к одному хосту, у каждого сайта свой запас терпения
+RATE_LIMIT = 5
+HOST_RATE_LIMITS = {'www.flybulgarien.dk': 5, 'apps.penguin.bg': 2}
+# сколько запросов можно сделать подряд без пауз
+BURST = 3
+# ответ дольше стольких секунд - знак, что сайт перегружен
+SLOW_RESPONSE = 5
+# при перегрузке темп уменьшается в BACKOFF_MULTIPLIER раз, потом растёт по RATE_STEP
+# от предельного за каждый удачный запрос
+BACKOFF_MULTIPLIER = 0.5
+RATE_STEP = 0.05
+# ответы 'сайт перегружен': их повторяет get_html_from_url через TokenBucket, а не сессия
+THROTTLE_STATUSES = (429, 503)
+# дольше стольких секунд по 'Retry-After' не ждём
+MAX_RETRY_AFTER = 60
+
+_SESSION = None
+_CIRCUIT_BREAKERS = {}
+_CIRCUIT_BREAKERS_LOCK = threading.Lock()
+
+
+class FlightSearchError(Exception):
+    """Base class for errors of flight search, message is ready to be shown to user."""
+
+
+class SiteConnectionError(FlightSearchError):
+    """Site is unreachable or answers with server error even after retries."""
+
+
+class SiteTimeoutError(SiteConnectionError):
+    """Site didn't answer in time."""
+
+
+class CircuitOpenError(SiteConnectionError):
+    """Requests to host are paused after too many failures in a row."""
+
+
+class SiteAnswerError(FlightSearchError):
+    """Site answered with something that can't be parsed."""
+
+
+class RouteUnavailableError(FlightSearchError, ValueError):
+    """There are no flights for the route or the dates."""
+
+
+class CircuitBreaker:
+    """Stop requests to a host after several failures in a row and let them again
+    after a pause.
+
+    After the pause one request is let through: if it succeeds host is considered
+    healthy, if it fails the pause starts again.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        """Create 'CircuitBreaker'.
+
+        Arguments:
+        optional threshold=FAILURE_THRESHOLD: number of failures in a row opening the circuit;
+        optional cooldown=COOLDOWN: pause in seconds.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def check(self, host):
+        """Raise CircuitOpenError if requests to host are paused now."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError('Сайт {} временно недоступен, попробуйте позже...'.
+                                       format(host))
+            # пробный запрос: остальные ждут его результата ещё одну паузу
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        """Close circuit after successful request."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """Count failed request, open circuit if there are too many of them in a row."""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class ValidatorStore:
+    """Remember ETag/Last-Modified and the last answer for requests, so that next time
+    site may answer '304 Not Modified' without body.
+
+    Instance variables:
+    stats: dict with counters: 'requests', 'not_modified', 'bytes_saved' (bodies
+    not transferred thanks to 304), 'wire_bytes' and 'body_bytes' (received
+    before and after decompression).
+    """
+
+    def __init__(self, max_size=VALIDATORS_SIZE):
+        """Create 'ValidatorStore' remembering not more than max_size answers."""
+        self.max_size = max_size
+        # ключ запроса -> последний ответ с ETag или Last-Modified
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes_saved': 0,
+                      'wire_bytes': 0, 'body_bytes': 0}
+
+    @staticmethod
+    def get_key(method, url, params=None, data=None):
+        """Return tuple identifying request."""
+        params = tuple(sorted((key, str(value)) for key, value in (params or {}).items()
+                              if value is not None))
+        return method.upper(), url, params, data
+
+    def get_conditional_headers(self, key):
+        """Return dict with If-None-Match/If-Modified-Since for request, empty if unknown."""
+        with self._lock:
+            response = self._responses.get(key)
+        if response is None:
+            return {}
+        headers = {}
+        if 'ETag' in response.headers:
+            headers['If-None-Match'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            headers['If-Modified-Since'] = response.headers['Last-Modified']
+        return headers
+
+    def process(self, key, response):
+        """Count response and return the answer to use instead of it.
+
+        For '304 Not Modified' the remembered answer is returned, or None if it was
+        already dropped: the request must be repeated without conditional headers.
+        New answers with validators are remembered.
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            if response.status_code == 304:
+                cached = self._responses.get(key)
+                if cached is None:
+                    return None
+                self._responses.move_to_end(key)
+                self.stats['not_modified'] += 1
+                self.stats['bytes_saved'] += len(cached.content)
+                return cached
+            body_bytes = len(response.content)
+            raw = getattr(response, 'raw', None)
+            self.stats['body_bytes'] += body_bytes
+            # urllib3 считает байты, пришедшие по сети, т.е. ещё сжатые
+            self.stats['wire_bytes'] += raw.tell() if hasattr(raw, 'tell') else body_bytes
+            if response.status_code == 200 and \
+                    ('ETag' in response.headers or 'Last-Modified' in response.headers):
+                self._responses[key] = response
+                self._responses.move_to_end(key)
+                while len(self._responses) > self.max_size:
+                    self._responses.popitem(last=False)
+            return response
+
+
+VALIDATORS = ValidatorStore()
+
+
+class TokenBucket:
+    """Let requests to one host pass at adaptive rate, not faster than max_rate per second.
+
+    Every request takes a token, tokens are added at current rate up to 'burst'.
+    Answers 429/503 and slow answers halve the rate (not lower than min_rate),
+    every normal answer raises it back by a small step.
+
+    Instance variables:
+    rate: current requests per second;
+    waiting: number of requests sleeping for their token now;
+    backoffs: how many times the rate was lowered.
+    """
+
+    def __init__(self, max_rate=RATE_LIMIT, min_rate=None, burst=BURST):
+        """Create 'TokenBucket'.
+
+        Arguments:
+        optional max_rate=RATE_LIMIT: max requests per second;
+        optional min_rate=None: the rate is never lowered below it, max_rate / 10 by default;
+        optional burst=BURST: number of requests which may be made without pauses.
+        """
+        self.max_rate = max_rate
+        self.min_rate = min_rate or max_rate / 10
+        self.burst = burst
+        self.rate = max_rate
+        self.waiting = 0
+        self.backoffs = 0
+        # отрицательное число жетонов - долг тех, кто уже ждёт своей очереди
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, return number of seconds to wait until it is ready."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def acquire(self):
+        """Block until the next request to host is allowed."""
+        delay = self.reserve()
+        if delay <= 0:
+            return
+        with self._lock:
+            self.waiting += 1
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def record(self, status_code, elapsed, retry_after=None):
+        """Adapt rate to the answer of host.
+
+        Arguments:
+        status_code: status of answer, None if there was no answer in time;
+        elapsed: seconds the request took;
+        optional retry_after=None: seconds from 'Retry-After' header, no tokens are given
+        until they pass.
+        """
+        with self._lock:
+            if status_code in (None, 429, 503) or elapsed > SLOW_RESPONSE:
+                self.rate = max(self.min_rate, self.rate * BACKOFF_MULTIPLIER)
+                self.backoffs += 1
+                if retry_after:
+                    self._tokens = min(self._tokens, -retry_after * self.rate)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_STEP)
+
+    def get_metrics(self):
+        """Return dict with 'rate', 'max_rate', 'queue_depth' and 'backoffs'."""
+        with self._lock:
+            return {'rate': self.rate, 'max_rate': self.max_rate,
+                    'queue_depth': self.waiting, 'backoffs': self.backoffs}
+
+
+class HostRateLimits:
+    """Keep one 'TokenBucket' for every host.
+
+    Instance variables:
+    max_rate: max requests per second for hosts not mentioned in host_rates;
+    host_rates: dict host -> its own max requests per second.
+    """
+
+    def __init__(self, max_rate=RATE_LIMIT, host_rates=None):
+        """Create 'HostRateLimits', buckets are created on the first request to host."""
+        self.max_rate = max_rate
+        self.host_rates = dict(host_rates or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """Return 'TokenBucket' for host of url."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.host_rates.get(host, self.max_rate))
+            return self._buckets[host]
+
+    def get_metrics(self):
+        """Return dict host -> metrics of its 'TokenBucket'."""
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {host: bucket.get_metrics() for host, bucket in buckets.items()}
+
+
+RATE_LIMITS = HostRateLimits(RATE_LIMIT, HOST_RATE_LIMITS)
+
+
+class SingleFlight:
+    """Let only one request per key be in flight: threads asking for the same key
+    while it is being loaded wait for that call and share its result or exception.
+
+    Unlike cache, nothing is kept after the call finishes.
+    """
+
+    def __init__(self):
+        # ключ -> Future вызова, который сейчас выполняется
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, load):
+        """Return load() for key, or result of the same call already made by other thread.
+
+        Returns tuple (result, shared): shared is True if result was loaded by other thread.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return call.result(), True
+        try:
+            result = load()
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        else:
+            call.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, False
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+
+def get_retry_after(response):
+    """Return seconds from 'Retry-After' header of response not longer than MAX_RETRY_AFTER,
+    None if there are none.
+    """
+    retry_after = response.headers.get('Retry-After', '')
+    return min(int(retry_after), MAX_RETRY_AFTER) if retry_after.isdigit() else None
+
+
+def get_circuit_breaker(url):
+    """Return 'CircuitBreaker' shared by all requests to host of url."""
+    host = urlsplit(url).netloc
+    with _CIRCUIT_BREAKERS_LOCK:
+        if host not in _CIRCUIT_BREAKERS:
+            _CIRCUIT_BREAKERS[host] = CircuitBreaker()
+        return _CIRCUIT_BREAKERS[host]
+
+
+def make_session(pool_size=POOL_SIZE, retries=RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """Create 'Session' with keep-alive connection pool and retries.
+
+    Arguments:
+    optional pool_size=POOL_SIZE: number of connections kept open per host;
+    optional retries=RETRIES: how many times to repeat request after connection reset
+    or 5xx answer, except THROTTLE_STATUSES which are repeated by 'FlightSearch';
+    optional backoff_factor=BACKOFF_FACTOR: pause between retries grows
+    as backoff_factor * 2 ** retry_number seconds.
+
+    Returns 'Session' object mentioned in requests lib.
+    """
+    retry = urllib3_retry.Retry(total=retries, connect=retries, read=retries, status=retries,
+                                backoff_factor=backoff_factor,
+                                status_forcelist=(500, 502, 504),
+                                # паузы по 'Retry-After' выдерживает TokenBucket хоста
+                                respect_retry_after_header=False,
+                                # запрос дат - POST, но он ничего не меняет на сайте,
+                                # его можно повторять
+                                allowed_methods=frozenset(['GET', 'POST']),
+                                raise_on_status=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                            max_retries=retry)
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Return 'Session' shared by all FlightSearch instances, create it on first call."""
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None:
+        _SESSION = make_session()
+    return _SESSION
+
+
+@lru_cache(maxsize=None)
+def get_td_text():
+    """Return compiled XPath for texts of row cells, it is compiled on the first call."""
+    # smart_strings=False - строки не держат ссылку на элемент, и его можно удалить из памяти
+    return etree.XPath('./td/text()', smart_strings=False)
+
+
+@lru_cache(maxsize=4096)
+def parse_flight_date(text):
+    """Convert date from quote-page like 'Sat, 20 Oct 18' into datetime.
+
+    Pages repeat the same few dates in every row, so each distinct string is parsed once.
+    """
+    return datetime.strptime(text, '%a, %d %b %y')
+
+
+def parse_hhmm(date, text):
+    """Return date with time taken from 'HH:MM' string.
+
+    Works several times faster than datetime.strptime, raises ValueError for bad time too.
+    """
+    hours, minutes = text.split(':')
+    return date.replace(hour=int(hours), minute=int(minutes))
+
+
+@lru_cache(maxsize=4096)
+def parse_city_code(text):
+    """Pull city-code from string like 'Copenhagen (CPH)'.
+
+    Code is interned: it repeats in millions of records, so only one copy is stored.
+    """
+    return sys.intern(CITY_REGEX.search(text).group())
+
+
+class Currency(Enum):
+    """Currency of ticket price.
+
+    Currencies missing from the list are added on the fly on first meeting,
+    so each of them is still stored as one shared object.
+    """
+    EUR = 'EUR'
+    BGN = 'BGN'
+    DKK = 'DKK'
+    SEK = 'SEK'
+    NOK = 'NOK'
+    GBP = 'GBP'
+    USD = 'USD'
+
+    @classmethod
+    def _missing_(cls, value):
+        if not isinstance(value, str):
+            return None
+        member = object.__new__(cls)
+        member._name_ = value
+        member._value_ = value
+        return cls._value2member_map_.setdefault(value, member)
+
+    def __str__(self):
+        return self.value
+
+
+class Flight(namedtuple('Flight', 'dep_city arr_city price currency dep_time arr_time')):
+    """Immutable record about one flight.
+
+    Fields:
+    dep_city, arr_city: city-codes;
+    price: float;
+    currency: 'Currency';
+    dep_time, arr_time: datetimes of take off and landing.
+    """
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        """Return timedelta between take off and landing."""
+        return self.arr_time - self.dep_time
+
+
+class RoundTrip(namedtuple('RoundTrip', 'departure arrival')):
+    """Immutable pair of 'Flight': there and back."""
+    __slots__ = ()
+
+    @property
+    def price(self):
+        """Return total price of both flights."""
+        return self.departure.price + self.arrival.price
+
+    @property
+    def currency(self):
+        """Return 'Currency' of total price."""
+        return self.departure.currency
+
+    @property
+    def duration(self):
+        """Return total time in air."""
+        return self.departure.duration + self.arrival.duration
+
+
+class RangeMinimum:
+    """Find position of the smallest value in any slice of a list in O(log n).
+
+    Used by 'FlightSearch.get_top_round_trips' to walk return flights possible
+    after a departure flight from the best one without looking at impossible ones.
+    """
+
+    def __init__(self, values):
+        """Prepare 'RangeMinimum' for list values in O(n)."""
+        self.values = values
+        self.size = 1
+        while self.size < len(values):
+            self.size *= 2
+        # дерево отрезков: в узле - позиция наименьшего значения его отрезка, -1 - пусто
+        self._tree = [-1] * self.size + list(range(len(values))) + \
+            [-1] * (self.size - len(values))
+        for node in range(self.size - 1, 0, -1):
+            self._tree[node] = self._better(self._tree[2 * node], self._tree[2 * node + 1])
+        # отрезки до конца списка спрашивают чаще всего, для них ответы готовы заранее
+        self._suffix = [-1] * (len(values) + 1)
+        for position in range(len(values) - 1, -1, -1):
+            self._suffix[position] = self._better(position, self._suffix[position + 1])
+
+    def _better(self, first, second):
+        """Return position with smaller value, the first one if they are equal."""
+        if first < 0:
+            return second
+        if second < 0 or self.values[first] <= self.values[second]:
+            return first
+        return second
+
+    def argmin(self, start, end):
+        """Return position of the smallest of values[start:end], -1 if the slice is empty."""
+        if start >= end:
+            return -1
+        if end >= len(self.values):
+            return self._suffix[start]
+        best = -1
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                best = self._better(best, self._tree[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                best = self._better(best, self._tree[end])
+            start //= 2
+            end //= 2
+        return best
+
+
+class FlightSearch:
+    """Class for taking user's flight parameters,
+    checking it and provide filtered information about flights.
+
+    To run its work you should call method 'start()'.
+
+    Instance variables:
+    data: dict which filled with flight parameters in the course of execution;
+    departure_list_relevant and arrival_list_relevant: lists with departure and return flight
+    information respectively.
+    """
+
+    def __init__(self, session=None, timeout=TIMEOUT, cache=None, route_index=None,
+                 base_url=BASE_URL, quote_url=QUOTE_URL, history=None, change_tracker=None,
+                 validators=VALIDATORS, rate_limits=RATE_LIMITS, metrics=NO_METRICS,
+                 single_flight=SINGLE_FLIGHT):
+        """Create 'FlightSearch' class with:
+        - starter 'data' dict with 'url';
+        - empty lists 'departure_list_relevant' and 'arrival_list_relevant'.
+
+        Arguments:
+        optional session=None: 'Session' for requests, shared one from 'get_session()'
+        is used by default;
+        optional timeout=TIMEOUT: tuple (connect, read) timeouts in seconds;
+        optional cache=None: 'TTLCache' from cache module for lists of cities and dates,
+        without it they are requested once per instance;
+        optional route_index=None: 'RouteIndex' from routes module, if it is set
+        cities and dates are taken from it without any requests;
+        optional base_url=BASE_URL, quote_url=QUOTE_URL: addresses of site and quote-page,
+        may point to a local stand-in server;
+        optional history=None: 'QuoteHistory' from history module, if it is set
+        every flight parsed from quote-page is saved there;
+        optional change_tracker=None: 'ChangeTracker' from changes module
+        for 'search_changes()';
+        optional validators=VALIDATORS: 'ValidatorStore' for conditional requests,
+        shared one by default, None turns them off;
+        optional rate_limits=RATE_LIMITS: 'HostRateLimits' throttling requests to every host,
+        shared one by default, None turns throttling off;
+        optional metrics=NO_METRICS: 'metrics.Metrics' timing phases of search
+        and counting requests, bytes and rows, by default nothing is measured;
+        optional single_flight=SINGLE_FLIGHT: 'SingleFlight' merging identical requests made
+        at the same time by different threads, shared one by default, None turns it off.
+        """
+        self.session = session if session is not None else get_session()
+        self.timeout = timeout
+        self.cache = cache
+        self.route_index = route_index
+        self.quote_url = quote_url
+        self.history = history
+        self.change_tracker = change_tracker
+        self.validators = validators
+        self.rate_limits = rate_limits
+        self.metrics = metrics
+        self.single_flight = single_flight
+        # словарь с основными данными
+        self.data = {'URL': base_url}
+        # список (Flight) релевантных вылетов ТУДА
+        self.departure_list_relevant = []
+        # список (Flight) релевантных вылетов ОБРАТНО
+        self.arrival_list_relevant = []
+
+    @staticmethod
+    def get_city_with_regex(city, search=True):
+        """Pull city-code or codes with regex.
+
+        Arguments:
+        city: city-contained string which we will clean from unnecessary parts;
+        optional search=True: method's work type.
+
+        Returns set of citie-codes.
+        """
+        if search:
+            return CITY_REGEX.search(city).group()
+        return set(CITY_REGEX.findall(city))
+
+    def get_html_from_url(self, method, url, params=None, data=None, headers=None):
+        """Make get or post request to url through pooled keep-alive session.
+
+        Arguments:
+        method: get or post request we want to run;
+        url: literally URL;
+        optional params: dict with parameters which will be passed to some GET-requests;
+        optional data and headers: special parameters which will be passed to some POST-requests.
+
+        If the same request was answered before with ETag or Last-Modified,
+        it is made conditional and '304 Not Modified' is replaced with the previous answer;
+        if that answer is already forgotten, the request is repeated without conditions.
+        Raises SiteConnectionError or its subclasses.
+        Returns 'Response' object mentioned in requests lib.
+        """
+        circuit_breaker = get_circuit_breaker(url)
+        circuit_breaker.check(urlsplit(url).netloc)
+        rate_limiter = self.rate_limits.get(url) if self.rate_limits is not None else None
+        if self.validators is None:
+            return self.request_with_retries(rate_limiter, circuit_breaker, method, url,
+                                             params=params, data=data, headers=headers)
+        key = self.validators.get_key(method, url, params, data)
+        conditional_headers = self.validators.get_conditional_headers(key)
+        response = self.request_with_retries(
+            rate_limiter, circuit_breaker, method, url, params=params, data=data,
+            headers=dict(headers or {}, **conditional_headers) if conditional_headers else headers)
+        answer = self.validators.process(key, response)
+        if answer is None:
+            # пока ждали 304, сохранённый ответ вытеснили другие: без тела разбирать нечего
+            self.metrics.count('not_modified_refetched')
+            response = self.request_with_retries(rate_limiter, circuit_breaker, method, url,
+                                                 params=params, data=data, headers=headers)
+            answer = self.validators.process(key, response)
+        return answer if answer is not None else response
+
+    def request_with_retries(self, rate_limiter, circuit_breaker, method, url, **kwargs):
+        """Make request of 'def get_html_from_url' and repeat it after answers 429/503.
+
+        Arguments:
+        rate_limiter: 'TokenBucket' of the host or None;
+        circuit_breaker: 'CircuitBreaker' of the host;
+        method, url and kwargs: arguments of 'Session.request'.
+
+        Retries of failed requests are made by session, except answers 429/503:
+        they are repeated here up to RETRIES times, every attempt takes a token
+        from rate_limiter, which slows down and waits 'Retry-After' after such answers
+        or after slow ones. If retries didn't help, failure is counted by circuit_breaker.
+        Raises SiteConnectionError or its subclasses.
+        Returns 'Response' object mentioned in requests lib.
+        """
+        for attempt in range(RETRIES + 1):
+            if attempt:
+                self.metrics.count('throttled_retries')
+            response = self.request_once(rate_limiter, circuit_breaker, method, url, **kwargs)
+            if response.status_code not in THROTTLE_STATUSES:
+                break
+        if response.status_code >= 500 or response.status_code == 429:
+            self.metrics.count('failed_requests')
+            circuit_breaker.record_failure()
+            raise SiteConnectionError('Сайт отвечает ошибкой {}...'.format(response.status_code))
+        circuit_breaker.record_success()
+        return response
+
+    def request_once(self, rate_limiter, circuit_breaker, method, url, **kwargs):
+        """Make one attempt of 'def request_with_retries' after waiting for token.
+
+        Arguments:
+        rate_limiter: 'TokenBucket' of the host or None;
+        circuit_breaker: 'CircuitBreaker' of the host;
+        method, url and kwargs: arguments of 'Session.request'.
+
+        Raises SiteConnectionError or SiteTimeoutError if there is no answer.
+        Returns 'Response' object mentioned in requests lib.
+        """
+        if rate_limiter is not None:
+            with self.metrics.span('rate_limit_wait'):
+                rate_limiter.acquire()
+        self.metrics.count('requests')
+        start = time.monotonic()
+        try:
+            with self.metrics.span('request'):
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as error:
+            self.metrics.count('failed_requests')
+            circuit_breaker.record_failure()
+            if rate_limiter is not None:
+                rate_limiter.record(None, time.monotonic() - start)
+            if isinstance(error, requests.Timeout):
+                raise SiteTimeoutError('Вышло время ожидания ответа от сайта...')
+            raise SiteConnectionError('Что-то с соединением...')
+        if rate_limiter is not None:
+            rate_limiter.record(response.status_code, time.monotonic() - start,
+                                get_retry_after(response))
+        self.metrics.count('response_bytes', len(response.content))
+        return response
+
+    @staticmethod
+    def get_parsed_info(response):
+        """Parse html and return single document.
+
+        Arguments:
+        response: site reply for html-request; in other words Response-object we receive
+        after running 'def get_html_from_url'.
+
+        Raises SiteAnswerError if html can't be parsed.
+        Returns parsed html-document.
+        """
+        try:
+            return html.fromstring(response.text)
+        except (etree.ParserError, etree.ParseError, etree.LxmlError):
+            raise SiteAnswerError(
+                'Что-то с парсингом html-страницы... Обратитесь к администратору программы')
+
+    def coalesce(self, key, load, on_shared=None):
+        """Return load(), or share result of the same call made by other thread right now.
+
+        Arguments:
+        key: tuple identifying request, e.g. (method, url, body);
+        load: function without arguments which makes request and returns parsed value;
+        optional on_shared=None: function called with result loaded by other thread
+        and 'FlightSearch' which loaded it, for things load() does besides returning value,
+        e.g. saving history.
+
+        Only calls through the same session are merged: a replayed answer must not be
+        given to a live search. Shared results are the same objects for all threads,
+        so they must not be changed.
+        """
+        if self.single_flight is None:
+            return load()
+        (result, leader), shared = self.single_flight.do((self.session,) + key,
+                                                         lambda: (load(), self))
+        if shared:
+            self.metrics.count('coalesced_requests')
+            if on_shared is not None:
+                on_shared(result, leader)
+        return result
+
+    def load_with_cache(self, key, load, ttl):
+        """Return value for key from self.cache, call load() if there is no fresh one.
+        Identical loads made at the same time are merged by 'def coalesce'.
+
+        Arguments:
+        key: tuple (method, url, body) identifying request;
+        load: function without arguments which makes request and returns value;
+        ttl: time-to-live of loaded value in seconds.
+        """
+        if self.cache is None:
+            return self.coalesce(key, load)
+        return self.cache.get_or_load(key, lambda: self.coalesce(key, load), ttl)
+
+    def get_dep_cities(self):
+        """Collect from site all available departure cities.
+
+        Writes departure cities into self.data['cities_for_dep'].
+        """
+        if self.route_index is not None:
+            self.data['cities_for_dep'] = self.route_index.get_dep_cities()
+            return
+        url = '{[URL]}en/'.format(self.data)
+
+        def load():
+            response = self.get_html_from_url('GET', url)
+            with self.metrics.span('parse_html'):
+                parsed = self.get_parsed_info(response)
+            cities_from_html = parsed.xpath('//*[@id="departure-city"]/option[@value]/text()')
+            return [self.get_city_with_regex(city) for city in cities_from_html]
+
+        # копия, т.к. список потом правится, а в кэше он должен остаться целым
+        self.data['cities_for_dep'] = list(self.load_with_cache(('GET', url, None), load,
+                                                                CITIES_TTL))
+
+    def checking_user_dep_city(self, city_from_user):
+        """Check if user's dep city is in available dep-cities.
+
+        Arguments:
+        city_from_user: user's departure city-code obtained from calling function.
+
+        Writes checked user's dep city into self.data['dep_city'].
+        """
+        while city_from_user.upper() not in self.data['cities_for_dep']:
+            city_from_user = input('Введите код города из списка:'
+                                   '\n{0[cities_for_dep]}\n'.format(self.data))
+        self.data['dep_city'] = city_from_user.upper()
+
+    def fetch_arr_cities(self, dep_city):
+        """Request arrival cities available from dep_city without any dialogue with user.
+
+        Arguments:
+        dep_city: departure city-code.
+
+        Caches answers in self.data['arr_cities_by_dep'], so each departure
+        city is requested only once per instance, and in self.cache if it is set.
+        Returns list of arrival city-codes.
+        """
+        if self.route_index is not None:
+            return self.route_index.get_arr_cities(dep_city)
+        arr_cities_by_dep = self.data.setdefault('arr_cities_by_dep', {})
+        if dep_city not in arr_cities_by_dep:
+            url = '{0[URL]}script/getcity/2-{1}'.format(self.data, dep_city)
+
+            def load():
+                response = self.get_html_from_url('GET', url)
+                try:
+                    return [city for city in response.json()]
+                except (JSONDecodeError, UnicodeDecodeError):
+                    raise SiteAnswerError(
+                        'Something wrong with json-answer in available arr cities')
+
+            arr_cities_by_dep[dep_city] = \
+                list(self.load_with_cache(('GET', url, None), load, CITIES_TTL))
+        return arr_cities_by_dep[dep_city]
+
+    def get_arr_cities(self):
+        """Check where could to fly from chosen dep_city.
+
+        Writes available arrival cities into self.data['cities_for_arr'].
+        Returns string with them.
+        """
+        cities_for_arr = self.fetch_arr_cities(self.data['dep_city'])
+        if not cities_for_arr:
+            print('..самолёты из {[dep_city]}, к сожалению, никуда не летают..'.format(self.data))
+            self.data['cities_for_dep'].remove(self.data['dep_city'])
+            self.get_cities_from_user(input('введите другой город: \n'))
+        else:
+            self.data['cities_for_arr'] = cities_for_arr
+            cities_for_arr = ' или '.join(cities_for_arr)
+            print('\nПрекрасно! Самолётом из {0[dep_city]} можно добраться до {1}. '
+                  .format(self.data, cities_for_arr))
+            return cities_for_arr
+
+    def get_cities_from_user(self, city_from_user='plug'):
+        """Check for input accuracy of departure city and helps user to choose arrival city.
+
+        Arguments:
+        city_from_user='plug': user's departure city-code; the 'plug' value is set by default
+        for the first run of the function so that when to call 'checking_user_dep_city' immediately
+        prompted to select departure city from the list.
+
+        Writes chosen and checked city into self.data['arr_city'].
+        """
+        if 'cities_for_dep' not in self.data:
+            self.get_dep_cities()
+        self.checking_user_dep_city(city_from_user)
+        cities_for_arr = self.get_arr_cities()
+        if len(self.data['cities_for_arr']) == 1:
+            available_cities = self.data['cities_for_dep'][:]
+            available_cities.remove(self.data['dep_city'])
+            another_city = input('Если летим туда, нажмите Enter.\n'
+                                 '\nИначе выберите другой город из списка:\n{}\n'.
+                                 format(available_cities))
+            if not another_city:
+                self.data['arr_city'] = cities_for_arr.upper()
+                print('* город прибытия - {[arr_city]}'.format(self.data))
+            else:
+                self.get_cities_from_user(another_city)
+        else:
+            city_from_user = input('\n* город прибытия:\n')
+            while not city_from_user.upper() in self.data['cities_for_arr']:
+                print(cities_for_arr)
+                city_from_user = input('\n* город прибытия: \n')
+            self.data['arr_city'] = city_from_user.upper()
+
+    def fetch_dates(self, dep_city, arr_city):
+        """Request available flight dates for the route without any dialogue with user.
+
+        Arguments:
+        dep_city: departure city-code;
+        arr_city: arrival city-code.
+
+        Caches answers in self.data['dates_by_route'], so each route is requested
+        only once per instance, and in self.cache if it is set.
+        Returns sorted list of dates.
+        """
+        if self.route_index is not None:
+            return self.route_index.get_dates(dep_city, arr_city)
+        dates_by_route = self.data.setdefault('dates_by_route', {})
+        if (dep_city, arr_city) not in dates_by_route:
+            url = '{[URL]}script/getdates/2-departure'.format(self.data)
+            body = 'code1={0}&code2={1}'.format(dep_city, arr_city)
+
+            def load():
+                headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+                # make post_request to site with selected cities, to know available dates
+                response = self.get_html_from_url('POST', url, data=body, headers=headers)
+                raw_dates_from_html = set(re.findall(r'(\d{4},\d{1,2},\d{1,2})', response.text))
+                dates_for_dep = \
+                    [datetime.strptime(raw_date, '%Y,%m,%d') for raw_date in raw_dates_from_html]
+                return sorted(dates_for_dep)
+
+            dates_by_route[(dep_city, arr_city)] = \
+                list(self.load_with_cache(('POST', url, body), load, DATES_TTL))
+        return dates_by_route[(dep_city, arr_city)]
+
+    def available_dates(self, for_depart=True):
+        """Pull out available dates.
+
+        Arguments:
+        optional for_depart=True: switches the function to pull available dates
+        for departure or return.
+
+        Returns list of dates.
+        """
+        if for_depart:  # Runs scenario for getting dates for departure
+            if 'dates_for_dep' not in self.data.keys():
+                self.data['dates_for_dep'] = \
+                    self.fetch_dates(self.data['dep_city'], self.data['arr_city'])
+            return self.data['dates_for_dep']
+        # Runs scenario for getting dates for arrive
+        # Arrival dates coming from site are the same as departure dates
+        self.data['dates_for_arr'] = \
+            [date for date in self.data['dates_for_dep'] if date >= self.data['dep_date']]
+        return self.data['dates_for_arr']
+
+    def get_date_in_format(self, date_from_user):
+        """Check for date input accuracy, and convert date into Datetime format.
+
+        Arguments:
+        date_from_user: literally user's date which will be checked and formatted.
+
+        Returns Datetime.
+        """
+        try:
+            return datetime.strptime(date_from_user, '%d.%m.%Y')
+        except ValueError:
+            return self.get_date_in_format(input(
+                'Дата введена некорректно. Формат даты: "ДД.ММ.ГГГГ". Повторите ввод:\n'))
+
+    @staticmethod
+    def get_ddmmyyyy_from_datetime(date):
+        """Convert datetime to dd.mm.yyyy str-format.
+
+        Returns string.
+        """
+        return datetime.strftime(date, '%d.%m.%Y')
+
+    def check_dep_date(self, date_from_user):
+        """Check if user's date suitable for choice for departure date.
+
+        Arguments:
+        date_from_user: user's departure date.
+
+        Writes checked departure date into self.data['dep_date'], convert it into string format
+        and writes it into self.data['dep_date_for_url'].
+        """
+        verified_dep_date = self.get_date_in_format(date_from_user)
+        dates_for_dep = self.available_dates()
+        if verified_dep_date not in dates_for_dep:
+            self.check_dep_date(input(
+                ' - для выбора доступна любая из этих дат:\n{}\nКакую выберЕте?\n'.
+                format([self.get_ddmmyyyy_from_datetime(date) for date in dates_for_dep])))
+        else:
+            self.data['dep_date'] = verified_dep_date
+            self.data['dep_date_for_url'] = self.get_ddmmyyyy_from_datetime(self.data['dep_date'])
+            print('\nСупер! Почти всё готово. Обратный билет будем брать?'
+                  '\nЕсли да - введите дату, если нет - нажмите Enter')
+
+    def check_arr_date(self, date_from_user):
+        """Check for the presence of the input of return date.
+
+        Arguments:
+        date_from_user: user's date of return.
+
+        If return date is not specified writes 'None' into self.data['arr_date_for_url'].
+        Else writes return date into self.data['arr_date'], convert it into string format
+        and writes it into self.data['arr_date_for_url'].
+        And specifies flag - empty str into self.data['ow' or 'rt'].
+        """
+        if not date_from_user:
+            self.data['arr_date_for_url'] = None
+            self.data['ow'] = ''
+            print('Ок! One-way ticket!\nИтак, что мы имеем...')
+            print('\n===============..Минутчку, пожалст..====================')
+        else:
+            verified_arr_date = self.get_date_in_format(date_from_user)
+            dates_for_arr = self.available_dates(for_depart=False)
+            if verified_arr_date not in dates_for_arr:
+                self.check_arr_date(input(
+                    ' - выберите любую из этих дат:\n{}\n'.
+                    format([self.get_ddmmyyyy_from_datetime(date) for date in dates_for_arr])))
+            else:
+                self.data['arr_date'] = verified_arr_date
+                self.data['arr_date_for_url'] = \
+                    self.get_ddmmyyyy_from_datetime(self.data['arr_date'])
+                self.data['rt'] = ''
+                print('\n===============..Минутчку, пожалст..====================')
+
+    def prepare_finishing_flight_info(self, flight):
+        """Check if flight data getting from site is suitable for user's parameters.
+
+        Arguments:
+        flight: a list with raw full flight info including price.
+
+        Returns 'Flight'.
+        """
+        price = flight[5].split()
+        date = parse_flight_date(flight[0])
+        # время взлета в формате datetime
+        dep_time = parse_hhmm(date, flight[1])
+        # время посадки в формате datetime
+        arr_time = parse_hhmm(date, flight[2])
+        # к дате посадки +1 день, если время взлёта позднее времени посадки
+        if dep_time > arr_time:
+            arr_time += timedelta(days=1)
+        return Flight(parse_city_code(flight[3]), parse_city_code(flight[4]),
+                      float(price[1]), Currency(price[2]), dep_time, arr_time)
+
+    def iter_quote_rows(self, response):
+        """Walk quote-page once and yield raw flights as soon as their rows are read.
+
+        Rows 'flywiz_rinf'/'flywiz_irinf' with flight info are paired with rows
+        'flywiz_rprc'/'flywiz_irprc' with price in order of appearance; already read rows
+        are dropped from the document, so the whole page is never kept in memory.
+
+        Arguments:
+        response: 'Response' object with quote-page.
+
+        Yields tuples (return_flight, flight): bool flag of return direction and
+        list of raw flight info strings including price.
+        """
+        # очереди прочитанных строк с информацией и с ценой, отдельно для ТУДА и ОБРАТНО
+        queues = {False: (deque(), deque()), True: (deque(), deque())}
+        td_text = get_td_text()
+        rows = etree.iterparse(BytesIO(response.content), events=('end',), tag='tr',
+                               html=True, encoding=response.encoding)
+        try:
+            for _, row in rows:
+                kind = QUOTE_ROW_REGEX.match(row.get('id', ''))
+                if kind:
+                    info_queue, price_queue = queues[bool(kind.group(1))]
+                    (price_queue if kind.group(2) == 'prc' else info_queue).append(td_text(row))
+                    if info_queue and price_queue:
+                        yield bool(kind.group(1)), info_queue.popleft() + price_queue.popleft()
+                row.clear()
+                while row.getprevious() is not None:
+                    del row.getparent()[0]
+        except (etree.ParserError, etree.ParseError, etree.LxmlError):
+            raise SiteAnswerError(
+                'Что-то с парсингом html-страницы... Обратитесь к администратору программы')
+
+    def check_site_info(self, response, dep_city, arr_city, dep_date, arr_date=None):
+        """Sort flights offered by site into suitable for user's flight parameters and all others.
+
+        Arguments:
+        response: 'Response' object with quote-page;
+        dep_city, arr_city: city-codes of the route;
+        dep_date: datetime of departure;
+        optional arr_date=None: datetime of return, return flights are skipped without it.
+
+        If self.history is set, all found flights are saved there.
+        Returns dict with lists of 'Flight': 'departure' and 'return' with suitable flights,
+        'departure_other' and 'return_other' with all others.
+        """
+        found = {'departure': [], 'departure_other': [], 'return': [], 'return_other': []}
+        with self.metrics.span('parse_quotes'):
+            for return_flight, flight in self.iter_quote_rows(response):
+                # готовим параметры в соответствии с тем,
+                # вылет ТУДА (return_flight=False) или ОБРАТНО (return_flight=True)
+                if return_flight:
+                    if arr_date is None:
+                        continue
+                    key, route = 'return', (arr_city, dep_city, arr_date)
+                else:
+                    key, route = 'departure', (dep_city, arr_city, dep_date)
+                try:
+                    finished_flight = self.prepare_finishing_flight_info(flight)
+                except (ValueError, IndexError, AttributeError):
+                    raise SiteAnswerError('Unexpected flight row on quote-page: {}'.format(flight))
+                # если вылет подходит под запрос юзера,
+                # сохраняем его в соотв-щий список
+                if (finished_flight.dep_city == route[0])\
+                        and (finished_flight.arr_city == route[1])\
+                        and (parse_flight_date(flight[0]) == route[2]):
+                    found[key].append(finished_flight)
+                # если вылет не подходит под запрос юзера,
+                # тоже сохраняем его, но уже в список всех вылетов
+                else:
+                    found[key + '_other'].append(finished_flight)
+        self.metrics.count('rows_parsed', sum(len(flights) for flights in found.values()))
+        self.record_found(found)
+        return found
+
+    def record_found(self, found, leader=None):
+        """Count matched flights of 'def check_site_info' result and save it to self.history.
+
+        Arguments:
+        found: dict returned by 'def check_site_info';
+        optional leader=None: 'FlightSearch' which parsed found for this one, e.g. in
+        'def coalesce': its metrics and history already have the result and are skipped.
+        """
+        if leader is None or leader.metrics is not self.metrics:
+            self.metrics.count('rows_matched', len(found['departure']) + len(found['return']))
+        if self.history is not None and (leader is None or leader.history is not self.history):
+            self.history.add_search_result(found)
+
+    def render_table(self, flights_list, header):
+        """Run 'print_flights_table' and measure it."""
+        with self.metrics.span('render_table'):
+            self.print_flights_table(flights_list, header)
+
+    @staticmethod
+    def print_flights_table(flights_list, header):
+        """Print flight information in beautiful way.
+
+        Arguments:
+        flights_list: flights data;
+        header: table header.
+
+        Tables longer than TABLE_ROWS_LIMIT are printed as tab-separated lines,
+        for machine-readable output see output module.
+        """
+        if len(flights_list) > TABLE_ROWS_LIMIT:
+            print('\n'.join('\t'.join(str(cell) for cell in row)
+                            for row in [header] + list(flights_list)))
+            return
+        table_for_suitable_flights = texttable.Texttable(max_width=100)
+        table_for_suitable_flights.header(header)
+        table_for_suitable_flights.add_rows(flights_list, header=False)
+        print(table_for_suitable_flights.draw())
+
+    @staticmethod
+    def get_hhmm_ddmmyyyy_from_datetime(date):
+        """Convert datetime in HH:MM dd.mm.yyyy str-format.
+
+        Arguments:
+        date: date which will be converted.
+
+        Return str.
+        """
+        return datetime.strftime(date, '%H:%M %d.%m.%Y')
+
+    def show_suitable_flights(self, list_relevant, list_all, return_flight=False):
+        """Check if there are list with relevant flights or list with all offered flights,
+        prepare it and pass to print.
+
+        Arguments:
+        list_relevant: prepared list with relevant flights from 'def check_site_info';
+        list_all: prepared list with all flights from 'def check_site_info';
+        optional return_flight=False: switches the inner variables for departure or return.
+        """
+        # если подходящие вылеты были, выводим их на экран
+        list_filtered = list()
+        # готовим параметры в соответствии с тем,
+        # используется функция для вылета ТУДА (return_flight=False)
+        # или ОБРАТНО (return_flight=True)
+        if return_flight:
+            dep_city = self.data['arr_city']
+            arr_city = self.data['dep_city']
+        else:
+            dep_city = self.data['dep_city']
+            arr_city = self.data['arr_city']
+        if list_relevant:
+            print('\nДля маршрута из {0} в {1} нашлось следующее:'.format(dep_city, arr_city))
+            header = 'Взлёт в:\tПосадка в:\tДлительность перелёта:\tЦена билета:'.split('\t')
+            for flight in list_relevant:
+                flight_restruct = [self.get_hhmm_ddmmyyyy_from_datetime(flight.dep_time),
+                                   self.get_hhmm_ddmmyyyy_from_datetime(flight.arr_time),
+                                   flight.duration,
+                                   str(flight.price) + ' ' + str(flight.currency)]
+                list_filtered.append(flight_restruct)
+            self.render_table(list_filtered, header)
+        # иначе выводим сообщение, что подходящих вылетов нет,
+        # и на всякий выдаём инфу о всех предложенных сайтом вылетах
+        else:
+            print('\nК сожалению, вылетов из {0} в {1} на указанную дату не нашлось.'
+                  '\nНо это только пока, не отчаивайтесь ;)'.format(dep_city, arr_city))
+            if list_all:
+                print('\nЗато есть вот такие варианты:\n')
+                header = \
+                    'Откуда:\tВзлёт в:\tКуда:\tПосадка в:\tДлительность перелёта:\tЦена билета:'.\
+                    split('\t')
+                for flight in list_all:
+                    flight_restruct = [flight.dep_city,
+                                       self.get_hhmm_ddmmyyyy_from_datetime(flight.dep_time),
+                                       flight.arr_city,
+                                       self.get_hhmm_ddmmyyyy_from_datetime(flight.arr_time),
+                                       flight.duration,
+                                       str(flight.price) + ' ' + str(flight.currency)]
+                    list_filtered.append(flight_restruct)
+                self.render_table(list_filtered, header)
+
+    def show_changes(self, changes):
+        """Print result of 'def search_changes' in tables.
+
+        Arguments:
+        changes: dict returned by 'def search_changes'.
+        """
+        dep_city, arr_city, dep_date = changes['key'][:3]
+        if changes['unchanged']:
+            print('\nИз {0} в {1} на {2} ничего не изменилось'.format(
+                dep_city, arr_city, self.get_ddmmyyyy_from_datetime(dep_date)))
+            return
+        print('\nИзменения из {0} в {1} на {2}:'.format(
+            dep_city, arr_city, self.get_ddmmyyyy_from_datetime(dep_date)))
+        header = 'Что:\tОткуда:\tВзлёт в:\tКуда:\tПосадка в:\tЦена билета:'.split('\t')
+        rows = []
+        for kind, flights in (('новый', changes['new']), ('отменён', changes['removed'])):
+            for flight in flights:
+                rows.append([kind, flight.dep_city,
+                             self.get_hhmm_ddmmyyyy_from_datetime(flight.dep_time),
+                             flight.arr_city,
+                             self.get_hhmm_ddmmyyyy_from_datetime(flight.arr_time),
+                             str(flight.price) + ' ' + str(flight.currency)])
+        for old_flight, flight in changes['repriced']:
+            rows.append(['новая цена', flight.dep_city,
+                         self.get_hhmm_ddmmyyyy_from_datetime(flight.dep_time),
+                         flight.arr_city,
+                         self.get_hhmm_ddmmyyyy_from_datetime(flight.arr_time),
+                         '{} -> {} {}'.format(old_flight.price, flight.price, flight.currency)])
+        self.render_table(rows, header)
+
+    @staticmethod
+    def get_quote_payload(dep_city, arr_city, dep_date_for_url, arr_date_for_url=None):
+        """Prepare GET-parameters for request to quote-page.
+
+        Arguments:
+        dep_city, arr_city: city-codes of the route;
+        dep_date_for_url: departure date in dd.mm.yyyy str-format;
+        optional arr_date_for_url=None: return date in dd.mm.yyyy str-format,
+        None for one-way ticket.
+
+        Returns dict.
+        """
+        return {'ow': None if arr_date_for_url else '',
+                'rt': '' if arr_date_for_url else None,
+                'lang': 'en',
+                'depdate': dep_date_for_url,
+                'aptcode1': dep_city,
+                'rtdate': arr_date_for_url,
+                'aptcode2': arr_city,
+                'paxcount': 1,
+                'infcount': ''}
+
+    def find_and_show_flights(self):
+        """Run general flight information gathering and run methods for printing it."""
+        payload = self.get_quote_payload(self.data['dep_city'], self.data['arr_city'],
+                                         self.data.get('dep_date_for_url'),
+                                         self.data.get('arr_date_for_url'))
+        r_final = self.get_html_from_url('GET', self.quote_url, params=payload)
+        found = self.check_site_info(r_final, self.data['dep_city'], self.data['arr_city'],
+                                     self.data['dep_date'], self.data.get('arr_date'))
+        self.departure_list_relevant.extend(found['departure'])
+        self.show_suitable_flights(self.departure_list_relevant, found['departure_other'])
+        if 'arr_date' in self.data.keys():
+            self.arrival_list_relevant.extend(found['return'])
+            self.show_suitable_flights(self.arrival_list_relevant, found['return_other'],
+                                       return_flight=True)
+
+    @staticmethod
+    def get_round_trip_flights(departure_list, arrival_list, top_k=None, key='price'):
+        """Combine departure and return flights into possible round trips.
+
+        Return flight is possible if it takes off not earlier than departure flight lands.
+        Return flights are sorted by take off time once, so for every departure flight
+        possible ones are found with bisect instead of checking all pairs.
+
+        Arguments:
+        departure_list: prepared list with relevant departure flights;
+        arrival_list: prepared list with relevant return flights;
+        optional top_k=None: how many best round trips to return, all by default;
+        optional key='price': 'price' or 'duration', by which round trips are sorted.
+
+        Returns list of 'RoundTrip' sorted by key ascending.
+        """
+        if top_k is not None:
+            return FlightSearch.get_top_round_trips(departure_list, arrival_list, top_k, key)
+        arrivals = sorted(arrival_list, key=attrgetter('dep_time'))
+        arr_dep_times = [arr_flight.dep_time for arr_flight in arrivals]
+        round_trips = [RoundTrip(dep_flight, arr_flight)
+                       for dep_flight in departure_list
+                       for arr_flight in
+                       arrivals[bisect_left(arr_dep_times, dep_flight.arr_time):]]
+        round_trips.sort(key=attrgetter(key))
+        return round_trips
+
+    @staticmethod
+    def get_top_round_trips(departure_list, arrival_list, top_k, key='price'):
+        """Find top_k best round trips without building all of them.
+
+        Price and duration of round trip are sums of the same values of its flights.
+        Return flights sorted by take off time make possible ones for every departure
+        flight a slice found with bisect; 'RangeMinimum' gives the best flight of a slice.
+        A heap keeps for every departure flight slices not taken yet with their best
+        flights: the taken flight splits its slice into two, so only possible pairs
+        are ever looked at and the work is O((N + top_k) * log M).
+
+        Arguments:
+        departure_list: prepared list with relevant departure flights;
+        arrival_list: prepared list with relevant return flights;
+        top_k: how many round trips to return;
+        optional key='price': 'price' or 'duration', by which round trips are sorted.
+
+        Returns list of 'RoundTrip' sorted by key ascending.
+        """
+        get_value = attrgetter(key)
+        arrivals = sorted(arrival_list, key=attrgetter('dep_time'))
+        arr_dep_times = [arr_flight.dep_time for arr_flight in arrivals]
+        arr_values = [get_value(arr_flight) for arr_flight in arrivals]
+        range_minimum = RangeMinimum(arr_values)
+        # (сумма, номер вылета, начало и конец отрезка обратных рейсов, лучший рейс в нём)
+        heap = []
+        for index, dep_flight in enumerate(departure_list):
+            start = bisect_left(arr_dep_times, dep_flight.arr_time)
+            # если после посадки не улетает ни один обратный рейс, argmin вернёт -1
+            position = range_minimum.argmin(start, len(arrivals))
+            if position >= 0:
+                heap.append((get_value(dep_flight) + arr_values[position],
+                             index, start, len(arrivals), position))
+        heapq.heapify(heap)
+        round_trips = []
+        while heap and len(round_trips) < top_k:
+            _, index, start, end, position = heapq.heappop(heap)
+            dep_flight = departure_list[index]
+            round_trips.append(RoundTrip(dep_flight, arrivals[position]))
+            for part_start, part_end in ((start, position), (position + 1, end)):
+                part_position = range_minimum.argmin(part_start, part_end)
+                if part_position >= 0:
+                    heapq.heappush(heap, (get_value(dep_flight) + arr_values[part_position],
+                                          index, part_start, part_end, part_position))
+        return round_trips
+
+    @staticmethod
+    def get_unreachable_round_trips(departure_list, arrival_list):
+        """Find pairs in which return flight takes off before departure flight lands.
+
+        Arguments:
+        departure_list: prepared list with relevant departure flights;
+        arrival_list: prepared list with relevant return flights.
+
+        Returns list of 'RoundTrip'.
+        """
+        arrivals = sorted(arrival_list, key=attrgetter('dep_time'))
+        arr_dep_times = [arr_flight.dep_time for arr_flight in arrivals]
+        return [RoundTrip(dep_flight, arr_flight)
+                for dep_flight in departure_list
+                for arr_flight in arrivals[:bisect_left(arr_dep_times, dep_flight.arr_time)]]
+
+    def show_round_trip_flights(self):
+        """Calculate all available variants of back and forth flights if there are,
+        sort them by total price and print.
+        """
+        if self.departure_list_relevant and self.arrival_list_relevant:
+            print('\n' + (36 * '=') + ' ИТОГО ' + (36 * '=') + '\n')
+            for dep_flight, arr_flight in self.get_unreachable_round_trips(
+                    self.departure_list_relevant, self.arrival_list_relevant):
+                print('После посадки в {0[arr_city]} в {1} '
+                      'обратным рейсом в {2} улететь уже невозможно.'.
+                      format(self.data,
+                             self.get_hhmm_ddmmyyyy_from_datetime(dep_flight.arr_time),
+                             self.get_hhmm_ddmmyyyy_from_datetime(arr_flight.dep_time)))
+            with self.metrics.span('pair_round_trips'):
+                round_trips = self.get_round_trip_flights(self.departure_list_relevant,
+                                                          self.arrival_list_relevant)
+            self.metrics.count('pairs_evaluated', len(round_trips))
+            if round_trips:
+                sorted_flight_list_of_lists = \
+                    [[self.get_hhmm_ddmmyyyy_from_datetime(round_trip.departure.dep_time),
+                      self.get_hhmm_ddmmyyyy_from_datetime(round_trip.arrival.dep_time),
+                      round_trip.duration,
+                      str(round_trip.price) + ' ' + str(round_trip.currency)]
+                     for round_trip in round_trips]
+                header = \
+                    'Из {0[dep_city]} в {0[arr_city]}:\t' \
+                    'Назад:\t' \
+                    'Итого в полёте(ЧЧ:ММ):\t' \
+                    'Итого цена:'\
+                    .format(self.data).split('\t')
+                self.render_table(sorted_flight_list_of_lists, header)
+
+    def show_search_result(self, result):
+        """Print result of 'def search' in the same tables as the dialogue does.
+
+        Arguments:
+        result: dict returned by 'def search'.
+        """
+        self.data['dep_city'] = result['dep_city']
+        self.data['arr_city'] = result['arr_city']
+        self.departure_list_relevant = list(result['departure'])
+        self.arrival_list_relevant = list(result['return'])
+        self.show_suitable_flights(self.departure_list_relevant, result['departure_other'])
+        if result['arr_date'] is not None:
+            self.show_suitable_flights(self.arrival_list_relevant, result['return_other'],
+                                       return_flight=True)
+            self.show_round_trip_flights()
+
+    @staticmethod
+    def get_date_for_search(date):
+        """Convert date passed to 'def search' into datetime.
+
+        Arguments:
+        date: datetime or string in dd.mm.yyyy format.
+
+        Returns Datetime. Raises ValueError if string can't be converted.
+        """
+        if isinstance(date, datetime):
+            return date
+        return datetime.strptime(date, '%d.%m.%Y')
+
+    def check_search_query(self, dep_city, arr_city, dep_date, arr_date=None):
+        """Check search parameters without any dialogue with user.
+
+        Arguments: the same as for 'def search'.
+
+        Raises RouteUnavailableError if route or dates are not available,
+        ValueError if date string is malformed.
+        Returns tuple (dep_city, arr_city, dep_date, arr_date, payload): upper-cased
+        city-codes, datetimes and GET-parameters for quote-page.
+        """
+        dep_city = dep_city.upper()
+        arr_city = arr_city.upper()
+        if 'cities_for_dep' not in self.data:
+            self.get_dep_cities()
+        if dep_city not in self.data['cities_for_dep']:
+            raise RouteUnavailableError('no flights from {}'.format(dep_city))
+        if self.route_index is not None:
+            has_route = self.route_index.has_route(dep_city, arr_city)
+        else:
+            has_route = arr_city in self.fetch_arr_cities(dep_city)
+        if not has_route:
+            raise RouteUnavailableError('no flights from {} to {}'.format(dep_city, arr_city))
+        dep_date = self.get_date_for_search(dep_date)
+        dates = self.fetch_dates(dep_city, arr_city)
+        if dep_date not in dates:
+            raise RouteUnavailableError('no flights from {} to {} on {}'.format(
+                dep_city, arr_city, self.get_ddmmyyyy_from_datetime(dep_date)))
+        arr_date_for_url = None
+        if arr_date is not None:
+            arr_date = self.get_date_for_search(arr_date)
+            # даты обратных вылетов на сайте совпадают с датами вылетов ТУДА
+            if arr_date < dep_date or arr_date not in dates:
+                raise RouteUnavailableError('no flights from {} to {} on {}'.format(
+                    arr_city, dep_city, self.get_ddmmyyyy_from_datetime(arr_date)))
+            arr_date_for_url = self.get_ddmmyyyy_from_datetime(arr_date)
+        payload = self.get_quote_payload(dep_city, arr_city,
+                                         self.get_ddmmyyyy_from_datetime(dep_date),
+                                         arr_date_for_url)
+        return dep_city, arr_city, dep_date, arr_date, payload
+
+    def search(self, dep_city, arr_city, dep_date, arr_date=None, top_k=None):
+        """Search flights without any dialogue with user and print nothing.
+
+        Arguments:
+        dep_city, arr_city: city-codes of the route;
+        dep_date: departure date, datetime or string in dd.mm.yyyy format;
+        optional arr_date=None: return date in the same format, None for one-way ticket;
+        optional top_k=None: how many cheapest round trips to keep, all by default.
+
+        Lists of departure cities, arrival cities and dates are requested once
+        and reused by next calls of the same instance. The same quote-page requested
+        by several threads at once is loaded and parsed only once.
+        Raises RouteUnavailableError if route or dates are not available,
+        ValueError if date string is malformed and other FlightSearchError
+        if site is unreachable or its answer is broken.
+        Returns dict with search parameters, relevant and other flights and round trips.
+        """
+        dep_city, arr_city, dep_date, arr_date, payload = \
+            self.check_search_query(dep_city, arr_city, dep_date, arr_date)
+
+        def load():
+            r_final = self.get_html_from_url('GET', self.quote_url, params=payload)
+            return self.check_site_info(r_final, dep_city, arr_city, dep_date, arr_date)
+
+        found = self.coalesce(ValidatorStore.get_key('GET', self.quote_url, payload), load,
+                              self.record_found)
+        # списки общие для всех дождавшихся потоков, поэтому копируем
+        result = {direction: list(flights) for direction, flights in found.items()}
+        result.update({'dep_city': dep_city,
+                       'arr_city': arr_city,
+                       'dep_date': dep_date,
+                       'arr_date': arr_date,
+                       'round_trips': []})
+        if arr_date is not None:
+            with self.metrics.span('pair_round_trips'):
+                result['round_trips'] = \
+                    self.get_round_trip_flights(result['departure'], result['return'], top_k)
+            self.metrics.count('pairs_evaluated', len(result['round_trips']))
+        return result
+
+    def search_changes(self, dep_city, arr_city, dep_date, arr_date=None):
+        """Search flights like 'def search' but return only changes since the previous call
+        with the same parameters.
+
+        Requires self.change_tracker. Quote-page identical to the previous one
+        is not parsed at all. Snapshots are not saved to file here,
+        call 'ChangeTracker.save()' after the poll.
+
+        Arguments: the same as for 'def search'.
+
+        Raises ValueError if there is no self.change_tracker.
+        Returns dict from 'ChangeTracker.update()' with 'new', 'removed' and 'repriced'
+        flights and 'unchanged' flag.
+        """
+        if self.change_tracker is None:
+            raise ValueError('Для поиска изменений нужен FlightSearch(change_tracker=...)')
+        dep_city, arr_city, dep_date, arr_date, payload = \
+            self.check_search_query(dep_city, arr_city, dep_date, arr_date)
+        key = (dep_city, arr_city, dep_date, arr_date)
+        r_final = self.get_html_from_url('GET', self.quote_url, params=payload)
+        body_hash = self.change_tracker.get_body_hash(r_final.content)
+        if self.change_tracker.is_unchanged(key, body_hash):
+            return self.change_tracker.get_no_changes(key)
+        found = self.check_site_info(r_final, dep_city, arr_city, dep_date, arr_date)
+        return self.change_tracker.update(key, body_hash, found)
+
+    def batch_search(self, queries):
+        """Run 'def search' for many routes and dates in one run.
+
+        Arguments:
+        queries: iterable of tuples (dep_city, arr_city, dep_date[, arr_date]).
+
+        A query with unavailable route or dates or failed because of site errors
+        doesn't stop the whole batch: its result contains only 'query' and 'error' keys.
+        Returns list of results in the same order as queries.
+        """
+        results = []
+        for query in queries:
+            try:
+                results.append(self.search(*query))
+            except (FlightSearchError, ValueError) as error:
+                results.append({'query': tuple(query), 'error': str(error)})
+        return results
+
+    def start(self):
+        """Main method. Run others."""
+        self.get_cities_from_user()
+        self.check_dep_date(input('\n* дата вылета (ДД.ММ.ГГГГ):\n'))
+        self.check_arr_date(input('\n* дата возврата (необязательно) (ДД.ММ.ГГГГ):\n'))
+        self.find_and_show_flights()
+        self.show_round_trip_flights()
+        if self.departure_list_relevant:
+            print('\nСчастливого пути! :)')
+        else:
+            print('\nКто ищет, тот всегда найдёт! :)')
+
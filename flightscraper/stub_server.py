@@ -0,0 +1,259 @@
+r"""
+This module emulates http://www.flybulgarien.dk/ and apps.penguin.bg locally for load testing.
+
+It contains:
+- StubServer: http-server answering the four requests of FlightSearch:
+  main page with <select id="departure-city">, getcity json, getdates text
+  and quote3 table with 'flywiz_rinf'/'flywiz_rprc' rows, with configurable
+  latency, error rate and number of rows;
+- run_load(): load driver which runs non-interactive 'FlightSearch.search()'
+  against the server from many threads and reports requests per second,
+  p50/p99 latency and CPU time spent on parsing.
+
+Run it as a script:
+python -m flightscraper.stub_server serve --port 8080 --rows 100 --latency 0.05
+python -m flightscraper.stub_server load --searches 1000 --concurrency 20 --rows 500
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from .replay import make_dates_text, make_dep_page, make_quote_page
+from .search import FlightSearch, FlightSearchError, make_session
+
+
+# города Дании летают в города Болгарии и обратно
+DANISH_CITIES = ('CPH', 'BLL', 'AAL', 'AAR')
+BULGARIAN_CITIES = ('BOJ', 'SOF', 'VAR', 'PDV')
+ROUTES = {city: BULGARIAN_CITIES for city in DANISH_CITIES}
+ROUTES.update({city: DANISH_CITIES for city in BULGARIAN_CITIES})
+START_DATE = datetime(2018, 10, 20)
+DAYS = 14
+ROWS = 100
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Handler answering like flybulgarien.dk and apps.penguin.bg, settings are taken
+    from its 'StubServer'.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep quiet: thousands of requests would flood stderr."""
+
+    def send_body(self, body, content_type='text/html; charset=utf-8', status=200):
+        """Send answer with keep-alive friendly Content-Length."""
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def imitate_network(self):
+        """Sleep for configured latency and decide if request fails.
+
+        Returns True if error answer is sent.
+        """
+        if self.server.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.server.latency)
+        if random.random() < self.server.error_rate:
+            self.send_body('Service Unavailable', status=503)
+            return True
+        return False
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answer main page, getcity and quote3 requests."""
+        if self.imitate_network():
+            return
+        url = urlsplit(self.path)
+        if url.path == '/en/':
+            self.send_body(make_dep_page(list(ROUTES)))
+        elif url.path.startswith('/script/getcity/2-'):
+            city = url.path.rsplit('-', 1)[1]
+            self.send_body(json.dumps(ROUTES.get(city, [])), 'application/json')
+        elif url.path == '/fly/quote3.aspx':
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                dep_date = datetime.strptime(params['depdate'], '%d.%m.%Y')
+                arr_date = datetime.strptime(params['rtdate'], '%d.%m.%Y') \
+                    if params.get('rtdate') else None
+                page = make_quote_page(self.server.rows, params['aptcode1'], params['aptcode2'],
+                                       dep_date, arr_date)
+            except (KeyError, ValueError):
+                self.send_body('Bad Request', status=400)
+                return
+            self.send_body(page)
+        else:
+            self.send_body('Not Found', status=404)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Answer getdates request."""
+        length = int(self.headers.get('Content-Length', 0))
+        body = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if self.imitate_network():
+            return
+        if urlsplit(self.path).path != '/script/getdates/2-departure':
+            self.send_body('Not Found', status=404)
+            return
+        dep_city = body.get('code1', [''])[0]
+        arr_city = body.get('code2', [''])[0]
+        dates = [START_DATE + timedelta(days=day) for day in range(DAYS)] \
+            if arr_city in ROUTES.get(dep_city, ()) else []
+        self.send_body(make_dates_text(dates))
+
+
+class StubServer(ThreadingHTTPServer):
+    """Local stand-in for both sites.
+
+    Instance variables:
+    rows: number of flights on quote-page for each direction;
+    latency: average delay of answer in seconds;
+    error_rate: share of requests answered with 503.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, rows=ROWS, latency=0.0, error_rate=0.0):
+        """Create 'StubServer' on localhost, port=0 means any free port."""
+        super().__init__(('127.0.0.1', port), StubRequestHandler)
+        self.rows = rows
+        self.latency = latency
+        self.error_rate = error_rate
+
+    @property
+    def base_url(self):
+        """Return address to pass to FlightSearch(base_url=...)."""
+        return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+    @property
+    def quote_url(self):
+        """Return address to pass to FlightSearch(quote_url=...)."""
+        return '{}fly/quote3.aspx'.format(self.base_url)
+
+    def start(self):
+        """Run server in background thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class TimingSession:
+    """Session wrapper which remembers latency of every request."""
+
+    def __init__(self, session):
+        self.session = session
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        """Make request like requests.Session.request and time it."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.request(*args, **kwargs)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+                self.errors += failed
+
+
+def get_percentile(values, share):
+    """Return value below which lies share of sorted values."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(share * (len(values) - 1))))]
+
+
+def run_load(base_url, quote_url, searches=1000, concurrency=20, round_trip=True):
+    """Run many searches against stand-in server and measure them.
+
+    Arguments:
+    base_url, quote_url: addresses of 'StubServer';
+    optional searches=1000: total number of 'search()' calls;
+    optional concurrency=20: number of threads making searches;
+    optional round_trip=True: search round trips, one-way tickets otherwise.
+
+    Returns json-compatible dict with report.
+    """
+    session = TimingSession(make_session(pool_size=concurrency))
+    # сервер свой, сдерживать темп незачем
+    searcher = FlightSearch(session=session, base_url=base_url, quote_url=quote_url,
+                            rate_limits=None)
+    parse_cpu = []
+    check_site_info = searcher.check_site_info
+
+    def timed_check_site_info(*args, **kwargs):
+        start = time.thread_time()
+        try:
+            return check_site_info(*args, **kwargs)
+        finally:
+            parse_cpu.append(time.thread_time() - start)
+
+    searcher.check_site_info = timed_check_site_info
+    routes = [(dep_city, arr_city) for dep_city, cities in ROUTES.items() for arr_city in cities]
+    dates = [START_DATE + timedelta(days=day) for day in range(DAYS - 7)]
+    queries = itertools.islice(itertools.cycle(
+        [(dep_city, arr_city, date, date + timedelta(days=7) if round_trip else None)
+         for date in dates for dep_city, arr_city in routes]), searches)
+    failed_searches = 0
+
+    def run_search(query):
+        try:
+            searcher.search(*query)
+            return True
+        except FlightSearchError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for succeeded in executor.map(run_search, queries):
+            failed_searches += not succeeded
+    elapsed = time.perf_counter() - start
+    latencies = sorted(session.latencies)
+    return {'searches': searches,
+            'failed_searches': failed_searches,
+            'requests': len(latencies),
+            'failed_requests': session.errors,
+            'seconds': elapsed,
+            'requests_per_sec': len(latencies) / elapsed,
+            'searches_per_sec': searches / elapsed,
+            'latency_p50': get_percentile(latencies, 0.5),
+            'latency_p99': get_percentile(latencies, 0.99),
+            'parse_cpu_seconds': sum(parse_cpu),
+            'parse_cpu_per_search': sum(parse_cpu) / len(parse_cpu) if parse_cpu else None}
+
+
+def main():
+    """Parse command line and run server or load test."""
+    parser = argparse.ArgumentParser(description='Local stand-in for flybulgarien.dk')
+    parser.add_argument('mode', choices=['serve', 'load'])
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--searches', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--one-way', action='store_true')
+    args = parser.parse_args()
+    server = StubServer(args.port, args.rows, args.latency, args.error_rate)
+    if args.mode == 'serve':
+        print('Слушаем {}'.format(server.base_url))
+        server.serve_forever()
+    else:
+        server.start()
+        print(json.dumps(run_load(server.base_url, server.quote_url, args.searches,
+                                  args.concurrency, not args.one_way), indent=2))
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
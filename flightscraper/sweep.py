@@ -0,0 +1,248 @@
+r"""
+This module runs many flight searches concurrently.
+
+It contains class QuoteSweep which fans out requests to quote-page
+for all routes and dates offered by http://www.flybulgarien.dk/en/
+and yields parsed results as soon as each of them is ready.
+It also runs "flexible dates" search: the cheapest round trip for every
+departure date in a window and every stay length in a range.
+
+Requests are made by blocking 'FlightSearch.search()' in a pool of threads,
+asyncio only schedules them: a semaphore bounds the number of requests in flight
+and 'TokenBucket' of searcher keeps the pace for each host.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .search import (HOST_RATE_LIMITS, FlightSearch, FlightSearchError, HostRateLimits,
+                     make_session)
+
+
+# сколько запросов одновременно держать в работе
+CONCURRENCY = 10
+
+
+class QuoteSweep:
+    """Class for concurrent searching of flights for many routes and dates.
+
+    Instance variables:
+    searcher: FlightSearch which makes requests and parses answers;
+    concurrency: max number of requests in flight;
+    queued: number of queries waiting for their turn now;
+    in_flight: number of queries being searched now.
+    """
+
+    def __init__(self, searcher=None, concurrency=CONCURRENCY, rate_limit=None):
+        """Create 'QuoteSweep'.
+
+        Arguments:
+        optional searcher=None: FlightSearch instance, by default a new one is created
+        with connection pool big enough for 'concurrency' requests;
+        optional concurrency=CONCURRENCY: max number of requests in flight;
+        optional rate_limit=None: max number of requests per second for the new searcher
+        to hosts not mentioned in HOST_RATE_LIMITS, by default it shares limits
+        of all FlightSearch instances.
+        """
+        if searcher is None:
+            kwargs = {'rate_limits': HostRateLimits(rate_limit, HOST_RATE_LIMITS)} \
+                if rate_limit else {}
+            searcher = FlightSearch(session=make_session(pool_size=concurrency), **kwargs)
+        self.searcher = searcher
+        self.concurrency = concurrency
+        self.queued = 0
+        self.in_flight = 0
+
+    def get_metrics(self):
+        """Return dict with 'queued' and 'in_flight' queries and 'hosts': current rate
+        and queue depth of every host.
+        """
+        rate_limits = self.searcher.rate_limits
+        return {'queued': self.queued, 'in_flight': self.in_flight,
+                'hosts': rate_limits.get_metrics() if rate_limits is not None else {}}
+
+    async def get_queries(self, executor, dep_cities=None):
+        """Collect queries for all routes and all dates available for them.
+
+        Arguments:
+        executor: pool of threads for blocking requests;
+        optional dep_cities=None: departure city-codes, all cities offered by site by default.
+
+        Returns list of tuples (dep_city, arr_city, dep_date).
+        """
+        loop = asyncio.get_running_loop()
+        if dep_cities is None:
+            if 'cities_for_dep' not in self.searcher.data:
+                await loop.run_in_executor(executor, self.searcher.get_dep_cities)
+            dep_cities = self.searcher.data['cities_for_dep']
+        arr_cities = await asyncio.gather(
+            *[loop.run_in_executor(executor, self.searcher.fetch_arr_cities, dep_city)
+              for dep_city in dep_cities])
+        routes = [(dep_city, arr_city)
+                  for dep_city, cities in zip(dep_cities, arr_cities) for arr_city in cities]
+        dates = await asyncio.gather(
+            *[loop.run_in_executor(executor, self.searcher.fetch_dates, *route)
+              for route in routes])
+        return [(dep_city, arr_city, dep_date)
+                for (dep_city, arr_city), route_dates in zip(routes, dates)
+                for dep_date in route_dates]
+
+    async def fetch(self, executor, semaphore, query, search=None):
+        """Run one 'FlightSearch.search()' in thread pool.
+
+        Arguments:
+        executor: pool of threads for blocking requests;
+        semaphore: asyncio.Semaphore bounding requests in flight;
+        query: tuple (dep_city, arr_city, dep_date[, arr_date]);
+        optional search=None: method of self.searcher to run instead of 'search()'.
+
+        Returns search result or dict with 'query' and 'error' keys like 'batch_search()'.
+        """
+        loop = asyncio.get_running_loop()
+        search = search if search is not None else self.searcher.search
+        self.queued += 1
+        async with semaphore:
+            self.queued -= 1
+            self.in_flight += 1
+            try:
+                return await loop.run_in_executor(executor, search, *query)
+            except (FlightSearchError, ValueError) as error:
+                return {'query': tuple(query), 'error': str(error)}
+            finally:
+                self.in_flight -= 1
+
+    async def iter_results(self, queries=None, only_changes=False):
+        """Search flights for all queries concurrently and yield results as they complete.
+
+        Arguments:
+        optional queries=None: iterable of tuples (dep_city, arr_city, dep_date[, arr_date]),
+        by default all routes with all available dates are swept;
+        optional only_changes=False: run 'FlightSearch.search_changes()' instead of 'search()'
+        and yield only results with changes, searcher must have change_tracker;
+        when all queries are done its snapshots are saved, if it has a file.
+
+        Raises ValueError if only_changes is set, but searcher has no change_tracker.
+        Yields results of 'FlightSearch.search()' in order of completion.
+        """
+        tracker = self.searcher.change_tracker
+        if only_changes and tracker is None:
+            raise ValueError('Для поиска изменений нужен FlightSearch(change_tracker=...)')
+        semaphore = asyncio.Semaphore(self.concurrency)
+        search = self.searcher.search_changes if only_changes else self.searcher.search
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            if queries is None:
+                queries = await self.get_queries(executor)
+            tasks = [asyncio.ensure_future(self.fetch(executor, semaphore, query, search))
+                     for query in queries]
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    result = await next_result
+                    if not (only_changes and result.get('unchanged')):
+                        yield result
+            finally:
+                for task in tasks:
+                    task.cancel()
+        if only_changes and tracker.path is not None:
+            tracker.save()
+
+    async def collect(self, queries=None, only_changes=False):
+        """Run 'iter_results()' to the end and return list of results."""
+        return [result async for result in self.iter_results(queries, only_changes)]
+
+    def run(self, queries=None, only_changes=False):
+        """Blocking shortcut for scripts: sweep queries and return list of results."""
+        return asyncio.run(self.collect(queries, only_changes))
+
+    def export(self, writer, queries=None, only_changes=False):
+        """Sweep queries and write flights of every result as soon as it is ready.
+
+        Arguments:
+        writer: writer from output module;
+        optional queries=None, only_changes=False: the same as for 'iter_results()'.
+
+        Returns number of queries which failed.
+        """
+        async def export():
+            errors = 0
+            async for result in self.iter_results(queries, only_changes):
+                if 'error' in result:
+                    errors += 1
+                else:
+                    writer.write_result(result)
+            return errors
+
+        return asyncio.run(export())
+
+    def get_flexible_dates(self, dep_city, arr_city, window_start, window_end,
+                           min_stay, max_stay):
+        """Enumerate pairs of dates for flexible search.
+
+        Arguments:
+        dep_city, arr_city: city-codes of the route;
+        window_start, window_end: first and last possible departure dates,
+        datetime or string in dd.mm.yyyy format;
+        min_stay, max_stay: min and max number of days between departure and return.
+
+        Returns list of tuples (dep_date, arr_date): departure dates are taken
+        from available dates of the route, return dates from the reverse route,
+        because return legs are searched as one-way tickets on it.
+        """
+        window_start = self.searcher.get_date_for_search(window_start)
+        window_end = self.searcher.get_date_for_search(window_end)
+        dep_dates = self.searcher.fetch_dates(dep_city.upper(), arr_city.upper())
+        arr_dates = self.searcher.fetch_dates(arr_city.upper(), dep_city.upper())
+        return [(dep_date, arr_date)
+                for dep_date in dep_dates if window_start <= dep_date <= window_end
+                for arr_date in arr_dates if min_stay <= (arr_date - dep_date).days <= max_stay]
+
+    async def flexible_search_async(self, dep_city, arr_city, window_start, window_end,
+                                    min_stay, max_stay):
+        """Find the cheapest round trip for every pair of dates in departure window.
+
+        Round trip quote-pages for pairs with the same departure date contain the same
+        departure flights, so instead of a page per pair one-way pages are requested
+        for every distinct departure and return date, concurrently and only once each.
+
+        Arguments: the same as for 'get_flexible_dates()'.
+
+        Returns list of dicts with 'dep_date', 'arr_date' and 'round_trip' keys,
+        'round_trip' is the cheapest 'RoundTrip' or None if there are no suitable flights.
+        If search of a leg failed, itineraries with it get 'error' key with its message
+        and 'round_trip' None.
+        """
+        dep_city = dep_city.upper()
+        arr_city = arr_city.upper()
+        loop = asyncio.get_running_loop()
+        date_pairs = await loop.run_in_executor(
+            None, self.get_flexible_dates, dep_city, arr_city, window_start, window_end,
+            min_stay, max_stay)
+        legs = {(dep_city, arr_city, dep_date) for dep_date, _ in date_pairs}
+        legs.update((arr_city, dep_city, arr_date) for _, arr_date in date_pairs)
+        flights = {}
+        errors = {}
+        async for result in self.iter_results(sorted(legs)):
+            if 'error' in result:
+                errors[result['query']] = result['error']
+            else:
+                flights[(result['dep_city'], result['arr_city'], result['dep_date'])] = \
+                    result['departure']
+        itineraries = []
+        for dep_date, arr_date in date_pairs:
+            itinerary = {'dep_date': dep_date, 'arr_date': arr_date, 'round_trip': None}
+            leg_errors = [errors[leg] for leg in ((dep_city, arr_city, dep_date),
+                                                  (arr_city, dep_city, arr_date))
+                          if leg in errors]
+            if leg_errors:
+                # неудачный запрос не значит, что рейсов нет
+                itinerary['error'] = '; '.join(leg_errors)
+            else:
+                round_trips = self.searcher.get_top_round_trips(
+                    flights.get((dep_city, arr_city, dep_date), []),
+                    flights.get((arr_city, dep_city, arr_date), []), 1)
+                itinerary['round_trip'] = round_trips[0] if round_trips else None
+            itineraries.append(itinerary)
+        return itineraries
+
+    def flexible_search(self, dep_city, arr_city, window_start, window_end, min_stay, max_stay):
+        """Blocking shortcut for 'flexible_search_async()'."""
+        return asyncio.run(self.flexible_search_async(dep_city, arr_city, window_start,
+                                                      window_end, min_stay, max_stay))
@@ -1,12 +1,11 @@
 """
 This module parse information about flight tickets from http://www.flybulgarien.dk/en/
-with parameters taken from user
+with parameters taken from user.
+Run it as a script, import makes no requests: requests, lxml and texttable
+are imported only by functions which need them.
 """
 from datetime import datetime, timedelta
 import re
-import requests
-from lxml import html
-from texttable import Texttable
 
 
 # 1. Параметры юзера принимаем функцией, полёты обрабатываем классом
@@ -15,6 +14,8 @@ DATA = dict()
 
 def check_dep_city(city_from_user):
     """Check for input accuracy of departure city"""
+    import requests
+    from lxml import html
     response = requests.get('http://www.flybulgarien.dk/en/')
     parsed = html.fromstring(response.text)
     cities_from_html = parsed.xpath('//*[@id="departure-city"]/option[@value]/text()')
@@ -46,6 +47,7 @@ def check_dep_city(city_from_user):
 
 def check_arr_city(city_from_user):
     """Check for input accuracy of arrival city"""
+    import requests
     r_new = requests.get('http://www.flybulgarien.dk/script/getcity/2-{}'.
                          format(DATA['dep_city']))
     cities_for_arr = [code for code in r_new.json()]
@@ -59,6 +61,7 @@ def check_arr_city(city_from_user):
 def available_dates(for_depart=True):
     """Pull out available dates"""
     if for_depart:  # Runs scenario for getting dates for departure
+        import requests
         body = 'code1={0}&code2={1}'.format(DATA['dep_city'], DATA['arr_city'])
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
         # make POST-request to site with selected cities, to know available dates
@@ -134,33 +137,6 @@ def check_if_oneway_flight(one_way=True):
         DATA['flag'] = 'rt'
 
 
-# FIXME Program starts here
-print('\nСалют! Билеты на самолёт??\nПроще простого! Введите:\n')
-check_dep_city(input('1)город отправления: '))
-check_dep_date(input('\n3) дата вылета (ДД.ММ.ГГГГ): '))
-check_arr_date(input('\n4) дата возврата (необязательно) (ДД.ММ.ГГГГ): '))
-
-
-URL = 'https://apps.penguin.bg/fly/quote3.aspx?{4}=&lang=en&depdate={2}' \
-      '&aptcode1={0}{3}&aptcode2={1}&paxcount=1&infcount='.\
-    format(DATA['dep_city'], DATA['arr_city'], DATA['dep_date_for_url'],
-           DATA['arr_date_for_url'], DATA['flag'])
-R_FINAL = requests.get(URL)
-TREE = html.fromstring(R_FINAL.text)
-INFO_DEP = TREE.xpath('//tr[starts-with(@id, "flywiz_rinf")]')
-PRICE_DEP = TREE.xpath('//tr[starts-with(@id, "flywiz_rprc")]')
-INFO_ARR = TREE.xpath('//tr[starts-with(@id, "flywiz_irinf")]')
-PRICE_ARR = TREE.xpath('//tr[starts-with(@id, "flywiz_irprc")]')
-# список (словарей) релевантных вылетов ТУДА
-DEPARTURE_LIST_RELEVANT = []
-# список (словарей) всех вылетов ТУДА, выданных сайтом
-DEPARTURE_LIST_ALL = []
-# список (словарей) релевантных вылетов ОБРАТНО
-ARRIVAL_LIST_RELEVANT = []
-# список (словарей) всех вылетов ОБРАТНО, выданных сайтом
-ARRIVAL_LIST_ALL = []
-
-
 def change_data_dict():
     """Меняем главный словарь с параметрами от юзера
     для использования при поиске обратного полёта"""
@@ -226,6 +202,7 @@ def check_site_info(flight_info, price_info, relevant_list, all_list, return_fli
 
 
 def print_flights_table(flights_list, header, list_is_relevant=True):
+    from texttable import Texttable
     table_for_suitable_flights = Texttable(max_width=100)
     table_for_suitable_flights.header(header)
     for flight in flights_list:
@@ -273,26 +250,18 @@ def show_suitable_flights(list_relevant, list_all, return_flight=False):
         print_flights_table(list_filtered, header, list_is_relevant=False)
 
 
-check_site_info(INFO_DEP, PRICE_DEP, DEPARTURE_LIST_RELEVANT, DEPARTURE_LIST_ALL)
-show_suitable_flights(DEPARTURE_LIST_RELEVANT, DEPARTURE_LIST_ALL)
-if DATA['arr_date']:
-    check_site_info(INFO_ARR, PRICE_ARR, ARRIVAL_LIST_RELEVANT, ARRIVAL_LIST_ALL,
-                    return_flight=True)
-    show_suitable_flights(ARRIVAL_LIST_RELEVANT, ARRIVAL_LIST_ALL, return_flight=True)
-
-# если нашлись подходящие вылеты и ТУДА, и ОБРАТНО,
-# то считаем все возможные варианты пар ТУДА-ОБРАТНО,
-# сортируем по общей стоимости, выводим на экран
-if DEPARTURE_LIST_RELEVANT and ARRIVAL_LIST_RELEVANT:
+def show_round_trip_flights(departure_list_relevant, arrival_list_relevant):
+    """Считаем все возможные варианты пар ТУДА-ОБРАТНО,
+    сортируем по общей стоимости, выводим на экран"""
     print('\n' + (36 * '=') + ' ИТОГО ' + (36 * '=') + '\n')
-    FLIGHT_LIST_OF_DICTS = []
-    for dep_flight in DEPARTURE_LIST_RELEVANT:
-        for arr_flight in ARRIVAL_LIST_RELEVANT:
+    flight_list_of_dicts = []
+    for dep_flight in departure_list_relevant:
+        for arr_flight in arrival_list_relevant:
             if dep_flight['arr_time'] > arr_flight['dep_time']:
                 print('После посадки в {0} в {1} обратным рейсом в {2} улететь уже не успеете.'.
                       format(DATA['dep_city'],
                              pretty_time(dep_flight['arr_time']),
-                      pretty_time(arr_flight['dep_time'])))
+                             pretty_time(arr_flight['dep_time'])))
                 continue
             flight_dict = dict()
             flight_dict['dep_time_tuda'] = pretty_time(dep_flight['dep_time'])
@@ -302,13 +271,57 @@ if DEPARTURE_LIST_RELEVANT and ARRIVAL_LIST_RELEVANT:
                 + (arr_flight['arr_time'] - arr_flight['dep_time'])
             flight_dict['itog_price'] = \
                 str(dep_flight['price'] + arr_flight['price']) + ' ' + dep_flight['currency']
-            FLIGHT_LIST_OF_DICTS.append(flight_dict)
-    if FLIGHT_LIST_OF_DICTS:
-        SORTED_FLIGHT_LIST_OF_DICTS = sorted(FLIGHT_LIST_OF_DICTS, key=lambda k: k['itog_price'])
-        SORTED_FLIGHT_LIST_OF_LISTS = \
-            [[v for v in flight_d.values()] for flight_d in SORTED_FLIGHT_LIST_OF_DICTS]
+            flight_list_of_dicts.append(flight_dict)
+    if flight_list_of_dicts:
+        sorted_flight_list_of_dicts = sorted(flight_list_of_dicts, key=lambda k: k['itog_price'])
+        sorted_flight_list_of_lists = \
+            [[v for v in flight_d.values()] for flight_d in sorted_flight_list_of_dicts]
         header = 'Из {} в {}:\tНазад:\tИтого в полёте(ЧЧ:ММ):\tИтого цена:'.\
             format(DATA['arr_city'], DATA['dep_city']).split('\t')
-        print_flights_table(SORTED_FLIGHT_LIST_OF_LISTS, header)
-
-# input('\n\n\nWait a minute...\n')
+        print_flights_table(sorted_flight_list_of_lists, header)
+
+
+def main():
+    """Program starts here"""
+    import requests
+    from lxml import html
+    print('\nСалют! Билеты на самолёт??\nПроще простого! Введите:\n')
+    check_dep_city(input('1)город отправления: '))
+    check_dep_date(input('\n3) дата вылета (ДД.ММ.ГГГГ): '))
+    check_arr_date(input('\n4) дата возврата (необязательно) (ДД.ММ.ГГГГ): '))
+
+    url = 'https://apps.penguin.bg/fly/quote3.aspx?{4}=&lang=en&depdate={2}' \
+          '&aptcode1={0}{3}&aptcode2={1}&paxcount=1&infcount='.\
+        format(DATA['dep_city'], DATA['arr_city'], DATA['dep_date_for_url'],
+               DATA['arr_date_for_url'], DATA['flag'])
+    r_final = requests.get(url)
+    tree = html.fromstring(r_final.text)
+    info_dep = tree.xpath('//tr[starts-with(@id, "flywiz_rinf")]')
+    price_dep = tree.xpath('//tr[starts-with(@id, "flywiz_rprc")]')
+    info_arr = tree.xpath('//tr[starts-with(@id, "flywiz_irinf")]')
+    price_arr = tree.xpath('//tr[starts-with(@id, "flywiz_irprc")]')
+    # список (словарей) релевантных вылетов ТУДА
+    departure_list_relevant = []
+    # список (словарей) всех вылетов ТУДА, выданных сайтом
+    departure_list_all = []
+    # список (словарей) релевантных вылетов ОБРАТНО
+    arrival_list_relevant = []
+    # список (словарей) всех вылетов ОБРАТНО, выданных сайтом
+    arrival_list_all = []
+
+    check_site_info(info_dep, price_dep, departure_list_relevant, departure_list_all)
+    show_suitable_flights(departure_list_relevant, departure_list_all)
+    if DATA['arr_date']:
+        check_site_info(info_arr, price_arr, arrival_list_relevant, arrival_list_all,
+                        return_flight=True)
+        show_suitable_flights(arrival_list_relevant, arrival_list_all, return_flight=True)
+
+    # если нашлись подходящие вылеты и ТУДА, и ОБРАТНО,
+    # то считаем все возможные варианты пар ТУДА-ОБРАТНО,
+    # сортируем по общей стоимости, выводим на экран
+    if departure_list_relevant and arrival_list_relevant:
+        show_round_trip_flights(departure_list_relevant, arrival_list_relevant)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,11 @@
 """
 This module parse information about flight tickets from http://www.flybulgarien.dk/en/
-with parameters taken from user
+with parameters taken from user.
+Run it as a script, import makes no requests: requests, lxml and texttable
+are imported only by functions which need them.
 """
 from datetime import datetime, timedelta
 import re
-import requests
-from lxml import html
-from texttable import Texttable
 
 
 DATA = {'URL': 'http://www.flybulgarien.dk/'}
@@ -18,6 +17,8 @@ def get_city_with_regex(city):
 
 def get_cities_from_user(city_from_user):
     """Check for input accuracy of departure city"""
+    import requests
+    from lxml import html
     response = requests.get('{[URL]}en/'.format(DATA))
     parsed = html.fromstring(response.text)
     cities_from_html = parsed.xpath('//*[@id="departure-city"]/option[@value]/text()')
@@ -64,6 +65,7 @@ def available_dates(for_depart=True):
     """Pull out available dates"""
     if for_depart:  # Runs scenario for getting dates for departure
         if 'dates_for_dep' not in DATA.keys():
+            import requests
             body = 'code1={0[dep_city]}&code2={0[arr_city]}'.format(DATA)
             headers = {'Content-Type': 'application/x-www-form-urlencoded'}
             # make POST-request to site with selected cities, to know available dates
@@ -135,31 +137,6 @@ def check_if_oneway_flight(one_way=True):
         DATA['flag'] = 'rt'
 
 
-# FIXME Program starts here
-print('\nСалют! Билеты на самолёт??\nПроще простого! Введите:\n')
-get_cities_from_user(input('* город отправления:\n'))
-check_dep_date(input('\n* дата вылета (ДД.ММ.ГГГГ):\n'))
-check_arr_date(input('\n* дата возврата (необязательно) (ДД.ММ.ГГГГ):\n'))
-
-R_FINAL = requests.get(
-    'https://apps.penguin.bg/fly/quote3.aspx?{0[flag]}=&lang=en&depdate={0[dep_date_for_url]}'
-    '&aptcode1={0[dep_city]}{0[arr_date_for_url]}&aptcode2={0[arr_city]}&paxcount=1&infcount='.
-    format(DATA))
-TREE = html.fromstring(R_FINAL.text)
-INFO_DEP = TREE.xpath('//tr[starts-with(@id, "flywiz_rinf")]')
-PRICE_DEP = TREE.xpath('//tr[starts-with(@id, "flywiz_rprc")]')
-INFO_ARR = TREE.xpath('//tr[starts-with(@id, "flywiz_irinf")]')
-PRICE_ARR = TREE.xpath('//tr[starts-with(@id, "flywiz_irprc")]')
-# список (словарей) релевантных вылетов ТУДА
-DEPARTURE_LIST_RELEVANT = []
-# список (словарей) всех вылетов ТУДА, выданных сайтом
-DEPARTURE_LIST_ALL = []
-# список (словарей) релевантных вылетов ОБРАТНО
-ARRIVAL_LIST_RELEVANT = []
-# список (словарей) всех вылетов ОБРАТНО, выданных сайтом
-ARRIVAL_LIST_ALL = []
-
-
 def change_data_dict():
     """Меняем главный словарь с параметрами от юзера
     для использования при поиске обратного полёта"""
@@ -220,6 +197,7 @@ def check_site_info(flight_info, price_info, relevant_list, all_list, return_fli
 
 
 def print_flights_table(flights_list, header):
+    from texttable import Texttable
     table_for_suitable_flights = Texttable(max_width=100)
     table_for_suitable_flights.header(header)
     table_for_suitable_flights.add_rows(flights_list, header=False)
@@ -266,21 +244,13 @@ def show_suitable_flights(list_relevant, list_all):
             print_flights_table(list_filtered, header)
 
 
-check_site_info(INFO_DEP, PRICE_DEP, DEPARTURE_LIST_RELEVANT, DEPARTURE_LIST_ALL)
-show_suitable_flights(DEPARTURE_LIST_RELEVANT, DEPARTURE_LIST_ALL)
-if 'arr_date' in DATA.keys():
-    check_site_info(INFO_ARR, PRICE_ARR, ARRIVAL_LIST_RELEVANT, ARRIVAL_LIST_ALL,
-                    return_flight=True)
-    show_suitable_flights(ARRIVAL_LIST_RELEVANT, ARRIVAL_LIST_ALL)
-
-# если нашлись подходящие вылеты и ТУДА, и ОБРАТНО,
-# то считаем все возможные варианты пар ТУДА-ОБРАТНО,
-# сортируем по общей стоимости, выводим на экран
-if DEPARTURE_LIST_RELEVANT and ARRIVAL_LIST_RELEVANT:
+def show_round_trip_flights(departure_list_relevant, arrival_list_relevant):
+    """Считаем все возможные варианты пар ТУДА-ОБРАТНО,
+    сортируем по общей стоимости, выводим на экран"""
     print('\n' + (36 * '=') + ' ИТОГО ' + (36 * '=') + '\n')
-    FLIGHT_LIST_OF_DICTS = []
-    for dep_flight in DEPARTURE_LIST_RELEVANT:
-        for arr_flight in ARRIVAL_LIST_RELEVANT:
+    flight_list_of_dicts = []
+    for dep_flight in departure_list_relevant:
+        for arr_flight in arrival_list_relevant:
             if dep_flight['arr_time'] > arr_flight['dep_time']:
                 print('После посадки в {0[dep_city]} в {1} '
                       'обратным рейсом в {2} улететь уже невозможно.'.
@@ -296,13 +266,56 @@ if DEPARTURE_LIST_RELEVANT and ARRIVAL_LIST_RELEVANT:
                 + (arr_flight['arr_time'] - arr_flight['dep_time'])
             flight_dict['full_price'] = \
                 str(dep_flight['price'] + arr_flight['price']) + ' ' + dep_flight['currency']
-            FLIGHT_LIST_OF_DICTS.append(flight_dict)
-    if FLIGHT_LIST_OF_DICTS:
-        SORTED_FLIGHT_LIST_OF_DICTS = sorted(FLIGHT_LIST_OF_DICTS, key=lambda k: k['full_price'])
-        SORTED_FLIGHT_LIST_OF_LISTS = \
-            [[v for v in flight_d.values()] for flight_d in SORTED_FLIGHT_LIST_OF_DICTS]
+            flight_list_of_dicts.append(flight_dict)
+    if flight_list_of_dicts:
+        sorted_flight_list_of_dicts = sorted(flight_list_of_dicts, key=lambda k: k['full_price'])
+        sorted_flight_list_of_lists = \
+            [[v for v in flight_d.values()] for flight_d in sorted_flight_list_of_dicts]
         header = 'Из {0[arr_city]} в {0[dep_city]}:\tНазад:\tИтого в полёте(ЧЧ:ММ):\tИтого цена:'. \
             format(DATA).split('\t')
-        print_flights_table(SORTED_FLIGHT_LIST_OF_LISTS, header)
-
-# input('\n\n\nWait a minute...\n')
+        print_flights_table(sorted_flight_list_of_lists, header)
+
+
+def main():
+    """Program starts here"""
+    import requests
+    from lxml import html
+    print('\nСалют! Билеты на самолёт??\nПроще простого! Введите:\n')
+    get_cities_from_user(input('* город отправления:\n'))
+    check_dep_date(input('\n* дата вылета (ДД.ММ.ГГГГ):\n'))
+    check_arr_date(input('\n* дата возврата (необязательно) (ДД.ММ.ГГГГ):\n'))
+
+    r_final = requests.get(
+        'https://apps.penguin.bg/fly/quote3.aspx?{0[flag]}=&lang=en&depdate={0[dep_date_for_url]}'
+        '&aptcode1={0[dep_city]}{0[arr_date_for_url]}&aptcode2={0[arr_city]}&paxcount=1'
+        '&infcount='.format(DATA))
+    tree = html.fromstring(r_final.text)
+    info_dep = tree.xpath('//tr[starts-with(@id, "flywiz_rinf")]')
+    price_dep = tree.xpath('//tr[starts-with(@id, "flywiz_rprc")]')
+    info_arr = tree.xpath('//tr[starts-with(@id, "flywiz_irinf")]')
+    price_arr = tree.xpath('//tr[starts-with(@id, "flywiz_irprc")]')
+    # список (словарей) релевантных вылетов ТУДА
+    departure_list_relevant = []
+    # список (словарей) всех вылетов ТУДА, выданных сайтом
+    departure_list_all = []
+    # список (словарей) релевантных вылетов ОБРАТНО
+    arrival_list_relevant = []
+    # список (словарей) всех вылетов ОБРАТНО, выданных сайтом
+    arrival_list_all = []
+
+    check_site_info(info_dep, price_dep, departure_list_relevant, departure_list_all)
+    show_suitable_flights(departure_list_relevant, departure_list_all)
+    if 'arr_date' in DATA.keys():
+        check_site_info(info_arr, price_arr, arrival_list_relevant, arrival_list_all,
+                        return_flight=True)
+        show_suitable_flights(arrival_list_relevant, arrival_list_all)
+
+    # если нашлись подходящие вылеты и ТУДА, и ОБРАТНО,
+    # то считаем все возможные варианты пар ТУДА-ОБРАТНО,
+    # сортируем по общей стоимости, выводим на экран
+    if departure_list_relevant and arrival_list_relevant:
+        show_round_trip_flights(departure_list_relevant, arrival_list_relevant)
+
+
+if __name__ == '__main__':
+    main()
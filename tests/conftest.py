@@ -0,0 +1,24 @@
+"""Fixtures shared by test modules: local stand-in server and searchers pointed at it."""
+import pytest
+
+from flightscraper.search import FlightSearch
+from flightscraper.stub_server import StubServer
+
+
+@pytest.fixture(scope='session')
+def server():
+    """Return 'StubServer' with 3 flights per page, running for the whole session."""
+    stub = StubServer(rows=3).start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def make_searcher(server):
+    """Return function creating 'FlightSearch' for the stand-in server without rate limits."""
+    def make_searcher(**kwargs):
+        kwargs.setdefault('rate_limits', None)
+        return FlightSearch(base_url=server.base_url, quote_url=server.quote_url, **kwargs)
+
+    return make_searcher
@@ -0,0 +1,106 @@
+"""Time-to-live, invalidation and on-disk copies of TTLCache."""
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from flightscraper.cache import TTLCache
+
+
+class FakeTime:
+    """Clock which moves only when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr('flightscraper.cache.time', fake_time)
+    return fake_time
+
+
+def test_value_expires(clock):
+    cache = TTLCache()
+    cache.set(('GET', 'url', None), ['CPH'], ttl=10)
+    clock.now += 9
+    assert cache.get(('GET', 'url', None)) == ['CPH']
+    clock.now += 2
+    assert cache.get(('GET', 'url', None)) is None
+
+
+def test_get_or_load_reloads_expired_value(clock):
+    cache = TTLCache()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get_or_load('key', load, ttl=10) == 1
+    assert cache.get_or_load('key', load, ttl=10) == 1
+    clock.now += 11
+    assert cache.get_or_load('key', load, ttl=10) == 2
+
+
+def test_invalidate_and_clear(clock, tmp_path):
+    cache = TTLCache(str(tmp_path))
+    cache.set('first', 1)
+    cache.set('second', 2)
+    cache.invalidate('first')
+    assert cache.get('first') is None
+    assert TTLCache(str(tmp_path)).get('first') is None
+    assert TTLCache(str(tmp_path)).get('second') == 2
+    cache.clear()
+    assert cache.get('second') is None
+    assert TTLCache(str(tmp_path)).get('second') is None
+
+
+def test_disk_copy_keeps_expiry(clock, tmp_path):
+    TTLCache(str(tmp_path)).set('key', 'value', ttl=10)
+    assert TTLCache(str(tmp_path)).get('key') == 'value'
+    clock.now += 11
+    assert TTLCache(str(tmp_path)).get('key') is None
+
+
+def test_least_recently_used_are_dropped(clock):
+    cache = TTLCache(max_size=2)
+    cache.set('first', 1)
+    cache.set('second', 2)
+    cache.get('first')
+    cache.set('third', 3)
+    assert cache.get('second') is None
+    assert cache.get('first') == 1
+    assert cache.get('third') == 3
+
+
+def write_key(directory):
+    """Write the same key many times, run in worker process."""
+    cache = TTLCache(directory)
+    for number in range(50):
+        cache.set(('GET', 'url', None), number)
+    return cache.disk_errors
+
+
+def test_processes_share_directory(tmp_path):
+    # рабочие процессы после fork получают одинаковые номера потоков
+    with ProcessPoolExecutor(max_workers=8) as executor:
+        disk_errors = list(executor.map(write_key, [str(tmp_path)] * 8))
+    assert disk_errors == [0] * 8
+    assert TTLCache(str(tmp_path)).get(('GET', 'url', None)) == 49
+    assert [path.suffix for path in tmp_path.iterdir()] == ['.pickle']
+
+
+def test_disk_failure_keeps_value_in_memory(tmp_path, monkeypatch):
+    def replace(*_):
+        raise OSError('disk is full')
+
+    cache = TTLCache(str(tmp_path))
+    monkeypatch.setattr('flightscraper.cache.os.replace', replace)
+    cache.set('key', 'value')
+    assert cache.disk_errors == 1
+    assert cache.get('key') == 'value'
+    assert list(tmp_path.iterdir()) == []
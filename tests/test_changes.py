@@ -0,0 +1,68 @@
+"""New, removed and repriced flights reported by ChangeTracker and search_changes."""
+from datetime import datetime
+import functools
+import json
+
+import pytest
+
+from flightscraper import cli
+from flightscraper.changes import ChangeTracker
+from flightscraper.cli import EXIT_OK
+from flightscraper.search import Currency, Flight, FlightSearch
+
+
+KEY = ('CPH', 'BOJ', datetime(2018, 10, 20), None)
+MORNING = Flight('CPH', 'BOJ', 100.0, Currency('EUR'), datetime(2018, 10, 20, 8),
+                 datetime(2018, 10, 20, 11))
+EVENING = Flight('CPH', 'BOJ', 80.0, Currency('EUR'), datetime(2018, 10, 20, 18),
+                 datetime(2018, 10, 20, 21))
+NIGHT = Flight('CPH', 'BOJ', 60.0, Currency('EUR'), datetime(2018, 10, 20, 23),
+               datetime(2018, 10, 21, 2))
+
+
+def test_update_reports_differences():
+    tracker = ChangeTracker()
+    first = tracker.update(KEY, b'1', {'departure': [MORNING, EVENING]})
+    assert first['new'] == [MORNING, EVENING]
+    assert not first['unchanged']
+    assert tracker.is_unchanged(KEY, b'1')
+    second = tracker.update(KEY, b'2', {'departure': [MORNING._replace(price=90.0), NIGHT]})
+    assert second['new'] == [NIGHT]
+    assert second['removed'] == [EVENING]
+    assert second['repriced'] == [(MORNING, MORNING._replace(price=90.0))]
+    tracker.forget(KEY)
+    assert not tracker.is_unchanged(KEY, b'2')
+
+
+def test_snapshots_survive_in_file(tmp_path):
+    path = str(tmp_path / 'snapshots.pickle')
+    tracker = ChangeTracker(path)
+    tracker.update(KEY, b'1', {'departure': [MORNING]})
+    tracker.save()
+    assert ChangeTracker(path).update(KEY, b'2', {'departure': [MORNING]})['unchanged']
+
+
+def test_search_changes(make_searcher, server):
+    searcher = make_searcher(change_tracker=ChangeTracker())
+    first = searcher.search_changes('CPH', 'BOJ', '20.10.2018')
+    assert len(first['new']) == server.rows
+    second = searcher.search_changes('CPH', 'BOJ', '20.10.2018')
+    assert second == ChangeTracker.get_no_changes(first['key'])
+    with pytest.raises(ValueError):
+        make_searcher().search_changes('CPH', 'BOJ', '20.10.2018')
+
+
+def test_cli_polls_remember_previous_run(monkeypatch, server, tmp_path):
+    monkeypatch.setattr(cli, 'FlightSearch', functools.partial(
+        FlightSearch, base_url=server.base_url, quote_url=server.quote_url, rate_limits=None))
+    output = tmp_path / 'changes.jsonl'
+    argv = ['--from', 'CPH', '--to', 'BOJ', '--date-range', '20.10.2018', '21.10.2018',
+            '--changes', str(tmp_path / 'snapshots.pickle'), '--format', 'jsonl',
+            '--output', str(output)]
+    assert cli.main(argv) == EXIT_OK
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(rows) == 2 * server.rows
+    assert {row['direction'] for row in rows} == {'new'}
+    # второй запуск - другой процесс, сравнивает со снимками из файла
+    assert cli.main(argv) == EXIT_OK
+    assert output.read_text() == ''
@@ -0,0 +1,62 @@
+"""Exit codes of the command line interface against the local stand-in server."""
+import functools
+
+import pytest
+
+from flightscraper import cli
+from flightscraper.cli import EXIT_NOT_FOUND, EXIT_OK, EXIT_SITE_ERROR, EXIT_USAGE
+from flightscraper.search import FlightSearch
+from flightscraper.stub_server import StubServer
+
+
+def use_server(monkeypatch, server):
+    monkeypatch.setattr(cli, 'FlightSearch', functools.partial(
+        FlightSearch, base_url=server.base_url, quote_url=server.quote_url, rate_limits=None))
+
+
+@pytest.mark.parametrize('argv, code', [
+    (['--from', 'CPH', '--to', 'BOJ', '--date', '20.10.2018'], EXIT_OK),
+    (['--from', 'cph', '--to', 'boj', '--date', '20.10.2018', '--return', '23.10.2018'],
+     EXIT_OK),
+    (['--from', 'CPH', '--to', 'BOJ', '--date-range', '20.10.2018', '22.10.2018',
+      '--format', 'jsonl'], EXIT_OK),
+    (['--from', 'CPH', '--to', 'BOJ', '--date', '20.10.2099'], EXIT_NOT_FOUND),
+    (['--from', 'CPH', '--to', 'XXX', '--date', '20.10.2018'], EXIT_NOT_FOUND),
+    (['--from', 'CPH', '--to', 'BOJ', '--date-range', '20.10.2099', '22.10.2099'],
+     EXIT_NOT_FOUND),
+    (['--from', 'CPH', '--return', '21.10.2018'], EXIT_USAGE),
+    (['--from', 'CPH', '--date', '20.10.2018'], EXIT_USAGE),
+    (['--from', 'CPH', '--to', 'BOJ', '--date', '20.10.2018', '--output', 'flights.txt'],
+     EXIT_USAGE),
+])
+def test_exit_codes(monkeypatch, capsys, server, argv, code):
+    use_server(monkeypatch, server)
+    assert cli.main(argv) == code
+    capsys.readouterr()
+
+
+def test_malformed_date_is_usage_error(capsys):
+    with pytest.raises(SystemExit) as error:
+        cli.main(['--from', 'CPH', '--to', 'BOJ', '--date', '2018-10-20'])
+    assert error.value.code == EXIT_USAGE
+    assert 'ДД.ММ.ГГГГ' in capsys.readouterr().err
+
+
+def test_jsonl_output(monkeypatch, server, tmp_path):
+    use_server(monkeypatch, server)
+    output = tmp_path / 'flights.jsonl'
+    assert cli.main(['--from', 'CPH', '--to', 'BOJ', '--date', '20.10.2018',
+                     '--format', 'jsonl', '--output', str(output)]) == EXIT_OK
+    assert len(output.read_text().splitlines()) == 3
+
+
+def test_site_error(monkeypatch, capsys):
+    broken = StubServer(error_rate=1.0).start()
+    try:
+        use_server(monkeypatch, broken)
+        assert cli.main(['--from', 'CPH', '--to', 'BOJ', '--date', '20.10.2018']) == \
+            EXIT_SITE_ERROR
+        assert capsys.readouterr().err
+    finally:
+        broken.shutdown()
+        broken.server_close()
@@ -0,0 +1,115 @@
+"""Answers of SearchDaemon to good and bad requests, against the stand-in server."""
+import asyncio
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from flightscraper.daemon import SearchDaemon
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def daemon(server):
+    """Return 'SearchDaemon' for the stand-in server, listening in a background thread."""
+    search_daemon = SearchDaemon(port=get_free_port(), base_url=server.base_url,
+                                 quote_url=server.quote_url)
+    running = {}
+
+    async def serve():
+        running['loop'] = asyncio.get_running_loop()
+        running['task'] = asyncio.current_task()
+        try:
+            await search_daemon.serve()
+        except asyncio.CancelledError:
+            # asyncio.run отменит обработчики клиентов, и они закроют соединения
+            pass
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),))
+    thread.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', search_daemon.port)).close()
+            break
+        except ConnectionError:
+            time.sleep(0.05)
+    yield search_daemon
+    running['loop'].call_soon_threadsafe(running['task'].cancel)
+    thread.join(10)
+
+
+def request(daemon, method, target):
+    """Return tuple (status, response, decoded json or text body)."""
+    connection = http.client.HTTPConnection('127.0.0.1', daemon.port, timeout=30)
+    try:
+        connection.request(method, target)
+        response = connection.getresponse()
+        body = response.read().decode('utf-8')
+        if response.getheader('Content-Type').startswith('application/json'):
+            body = json.loads(body)
+        return response.status, response, body
+    finally:
+        connection.close()
+
+
+def test_search_is_served_from_memory_second_time(daemon):
+    target = '/search?from=cph&to=BOJ&date=20.10.2018'
+    status, response, body = request(daemon, 'GET', target)
+    assert status == 200
+    assert response.getheader('X-Cache') == 'MISS'
+    assert len(body['departure']) == 3
+    status, response, _ = request(daemon, 'GET', target)
+    assert status == 200
+    assert response.getheader('X-Cache') == 'HIT'
+    assert 'flightsearch_daemon_cache_hits_total 1' in request(daemon, 'GET', '/metrics')[2]
+
+
+@pytest.mark.parametrize('target, message', [
+    ('/search?from=CPH&to=BOJ', "missing parameter 'date'"),
+    ('/search?from=CPH&to=BOJ&date=2018-10-20', 'dates must be dd.mm.yyyy, top must be integer'),
+    ('/search?from=CPH&to=BOJ&date=20.10.2018&top=many',
+     'dates must be dd.mm.yyyy, top must be integer'),
+])
+def test_bad_parameters(daemon, target, message):
+    assert request(daemon, 'GET', target)[::2] == (400, {'error': message})
+
+
+def test_malformed_request_closes_connection(daemon):
+    with socket.create_connection(('127.0.0.1', daemon.port), timeout=30) as sock:
+        sock.sendall(b'GET /health\r\n\r\n')
+        answer = sock.makefile('rb').read()
+    assert answer.startswith(b'HTTP/1.1 400 Bad Request\r\n')
+    assert b'Connection: close' in answer
+
+
+@pytest.mark.parametrize('target', ['/unknown', '/search?from=CPH&to=XXX&date=20.10.2018'])
+def test_not_found(daemon, target):
+    status, _, body = request(daemon, 'GET', target)
+    assert status == 404
+    assert body['error']
+
+
+def test_only_get_is_allowed(daemon):
+    status, response, _ = request(daemon, 'POST', '/search')
+    assert status == 405
+    assert response.getheader('Allow') == 'GET'
+
+
+def test_unexpected_error_is_internal_error(daemon, capsys):
+    def search(key):
+        raise RuntimeError('поломка')
+
+    daemon.search = search
+    status, _, body = request(daemon, 'GET', '/search?from=CPH&to=BOJ&date=20.10.2018')
+    assert (status, body) == (500, {'error': 'internal error'})
+    assert 'RuntimeError: поломка' in capsys.readouterr().err
+    # после ошибки демон продолжает отвечать
+    assert request(daemon, 'GET', '/health')[0] == 200
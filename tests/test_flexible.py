@@ -0,0 +1,58 @@
+"""Flexible dates search of QuoteSweep against the stand-in server."""
+from datetime import timedelta
+
+import pytest
+
+from flightscraper.routes import RouteIndex
+from flightscraper.search import FlightSearchError
+from flightscraper.stub_server import DAYS, START_DATE
+from flightscraper.sweep import QuoteSweep
+
+
+DATES = [START_DATE + timedelta(days=day) for day in range(DAYS)]
+
+
+@pytest.fixture
+def searcher(make_searcher):
+    # у стенда нет обратных маршрутов, поэтому они берутся из индекса
+    return make_searcher(route_index=RouteIndex({'CPH': {'BOJ': DATES},
+                                                 'BOJ': {'CPH': DATES[3:]}}))
+
+
+def test_dates_of_return_leg_come_from_reverse_route(searcher):
+    pairs = QuoteSweep(searcher).get_flexible_dates('cph', 'boj', '20.10.2018', '22.10.2018',
+                                                    2, 3)
+    assert pairs == [(DATES[0], DATES[3]), (DATES[1], DATES[3]), (DATES[1], DATES[4]),
+                     (DATES[2], DATES[4]), (DATES[2], DATES[5])]
+
+
+def test_cheapest_round_trip_for_every_pair(searcher):
+    itineraries = QuoteSweep(searcher, concurrency=4).flexible_search(
+        'CPH', 'BOJ', '20.10.2018', '22.10.2018', 2, 3)
+    assert len(itineraries) == 5
+    for itinerary in itineraries:
+        departure = searcher.search('CPH', 'BOJ', itinerary['dep_date'])['departure']
+        back = searcher.search('BOJ', 'CPH', itinerary['arr_date'])['departure']
+        assert 'error' not in itinerary
+        assert itinerary['round_trip'].price == min(flight.price for flight in departure) + \
+            min(flight.price for flight in back)
+
+
+def test_failed_leg_is_reported(searcher):
+    search = searcher.search
+
+    def failing_search(dep_city, arr_city, dep_date, *args, **kwargs):
+        if dep_city == 'BOJ' and dep_date == DATES[4]:
+            raise FlightSearchError('сайт не ответил')
+        return search(dep_city, arr_city, dep_date, *args, **kwargs)
+
+    searcher.search = failing_search
+    itineraries = QuoteSweep(searcher, concurrency=4).flexible_search(
+        'CPH', 'BOJ', '20.10.2018', '22.10.2018', 2, 3)
+    failed = [itinerary for itinerary in itineraries if 'error' in itinerary]
+    assert [(itinerary['dep_date'], itinerary['arr_date']) for itinerary in failed] == [
+        (DATES[1], DATES[4]), (DATES[2], DATES[4])]
+    assert all(itinerary['round_trip'] is None and itinerary['error'] == 'сайт не ответил'
+               for itinerary in failed)
+    assert all(itinerary['round_trip'] is not None
+               for itinerary in itineraries if 'error' not in itinerary)
@@ -0,0 +1,44 @@
+"""Cheapest prices and price changes kept by QuoteHistory."""
+from datetime import datetime
+
+import pytest
+
+from flightscraper.history import QuoteHistory
+from flightscraper.search import Currency, Flight
+
+
+def make_flight(dep_time, price, currency='EUR'):
+    return Flight('CPH', 'BOJ', price, Currency(currency), dep_time,
+                  dep_time.replace(hour=dep_time.hour + 3))
+
+
+@pytest.fixture
+def history():
+    store = QuoteHistory(':memory:')
+    store.add_flights([make_flight(datetime(2018, 10, 20, 8), 120.0),
+                       make_flight(datetime(2018, 10, 20, 14), 90.0, 'DKK'),
+                       make_flight(datetime(2018, 10, 21, 8), 100.0)],
+                      observed_at=datetime(2018, 10, 1, 12))
+    store.add_flights([make_flight(datetime(2018, 10, 20, 8), 110.0)],
+                      observed_at=datetime(2018, 10, 2, 12))
+    yield store
+    store.close()
+
+
+def test_cheapest_per_day_keeps_currencies_apart(history):
+    assert [(dep_date.day, price, currency) for dep_date, price, currency, _, _
+            in history.get_cheapest_per_day('CPH', 'BOJ')] == [
+                (20, 90.0, 'DKK'), (20, 110.0, 'EUR'), (21, 100.0, 'EUR')]
+
+
+def test_cheapest_per_day_in_one_currency(history):
+    rows = history.get_cheapest_per_day('CPH', 'BOJ', since=datetime(2018, 10, 20),
+                                        until=datetime(2018, 10, 20),
+                                        currency=Currency('EUR'))
+    assert rows == [(datetime(2018, 10, 20), 110.0, 'EUR', datetime(2018, 10, 20, 8),
+                     datetime(2018, 10, 2, 12))]
+
+
+def test_price_history(history):
+    assert history.get_price_history('CPH', 'BOJ', datetime(2018, 10, 20, 8)) == [
+        (datetime(2018, 10, 1, 12), 120.0, 'EUR'), (datetime(2018, 10, 2, 12), 110.0, 'EUR')]
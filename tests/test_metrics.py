@@ -0,0 +1,63 @@
+"""Counters, histograms and exporters of Metrics, and metrics of a real search."""
+import json
+
+import pytest
+
+from flightscraper.metrics import NO_METRICS, Histogram, Metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(1, 5))
+    for value in (0.5, 3, 4, 7):
+        histogram.observe(value)
+    assert histogram.to_dict() == {'count': 4, 'sum': 14.5, 'max': 7, 'mean': 3.625,
+                                   'buckets': {'1': 1, '5': 3, '+Inf': 4}}
+    assert Histogram().to_dict()['mean'] is None
+
+
+def test_span_times_failed_block():
+    metrics = Metrics()
+    with pytest.raises(RuntimeError):
+        with metrics.span('request'):
+            raise RuntimeError
+    assert metrics.histograms['request_seconds'].count == 1
+
+
+def test_exporters(tmp_path):
+    metrics = Metrics()
+    metrics.count('requests')
+    metrics.count('requests', 2)
+    metrics.observe('response_bytes', 300, buckets=(100, 1000))
+    assert metrics.to_prometheus() == '\n'.join([
+        '# TYPE flightsearch_requests_total counter',
+        'flightsearch_requests_total 3',
+        '# TYPE flightsearch_response_bytes histogram',
+        'flightsearch_response_bytes_bucket{le="100"} 0',
+        'flightsearch_response_bytes_bucket{le="1000"} 1',
+        'flightsearch_response_bytes_bucket{le="+Inf"} 1',
+        'flightsearch_response_bytes_sum 300',
+        'flightsearch_response_bytes_count 1']) + '\n'
+    metrics.write_prometheus(str(tmp_path / 'search.prom'))
+    assert (tmp_path / 'search.prom').read_text() == metrics.to_prometheus()
+    metrics.write_json(str(tmp_path / 'search.json'))
+    assert json.loads((tmp_path / 'search.json').read_text()) == metrics.to_dict()
+
+
+def test_no_metrics_measure_nothing():
+    NO_METRICS.count('requests')
+    NO_METRICS.observe('response_bytes', 300)
+    with NO_METRICS.span('request'):
+        pass
+    assert not hasattr(NO_METRICS, 'counters')
+
+
+def test_search_is_measured(make_searcher, server):
+    metrics = Metrics()
+    make_searcher(metrics=metrics).search('CPH', 'BOJ', '20.10.2018', '23.10.2018')
+    counters = metrics.to_dict()['counters']
+    # главная страница, города, даты маршрута, страница цен
+    assert counters['requests'] == 4
+    assert counters['rows_parsed'] == counters['rows_matched'] == 2 * server.rows
+    assert counters['pairs_evaluated'] > 0
+    assert {'request_seconds', 'parse_html_seconds', 'parse_quotes_seconds',
+            'pair_round_trips_seconds'} <= set(metrics.histograms)
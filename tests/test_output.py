@@ -0,0 +1,77 @@
+"""Rows written by every output writer and choice of writer by format."""
+import csv
+from datetime import datetime
+import io
+import json
+
+import pytest
+
+from flightscraper.output import (FIELDS, CsvWriter, FlightWriter, JsonLinesWriter,
+                                  open_writer, write_results)
+from flightscraper.search import Currency, Flight
+
+
+DEPARTURE = Flight('CPH', 'BOJ', 120.0, Currency('EUR'), datetime(2018, 10, 20, 8, 30),
+                   datetime(2018, 10, 20, 11, 45))
+RETURN = Flight('BOJ', 'CPH', 95.5, Currency('EUR'), datetime(2018, 10, 27, 12, 0),
+                datetime(2018, 10, 27, 15, 10))
+RESULT = {'departure': [DEPARTURE], 'departure_other': [], 'return': [RETURN],
+          'return_other': []}
+
+
+def test_base_class_needs_write_rows():
+    with pytest.raises(TypeError):
+        FlightWriter()  # pylint: disable=abstract-class-instantiated
+
+
+def test_json_lines():
+    file = io.StringIO()
+    with JsonLinesWriter(file) as writer:
+        assert writer.write_result(RESULT) == 2
+    rows = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert rows[0] == {'direction': 'departure', 'dep_city': 'CPH', 'arr_city': 'BOJ',
+                       'dep_time': '2018-10-20T08:30:00', 'arr_time': '2018-10-20T11:45:00',
+                       'duration_minutes': 195, 'price': 120.0, 'currency': 'EUR'}
+    assert rows[1]['direction'] == 'return'
+    assert writer.rows == 2
+
+
+def test_csv():
+    file = io.StringIO(newline='')
+    with CsvWriter(file) as writer:
+        writer.write_result(RESULT)
+        writer.write_result({'repriced': [(RETURN, RETURN._replace(price=80.0))],
+                             'new': [], 'removed': [], 'unchanged': []})
+    rows = list(csv.DictReader(io.StringIO(file.getvalue(), newline='')))
+    assert tuple(rows[0]) == FIELDS
+    assert [(row['direction'], row['price']) for row in rows] == [
+        ('departure', '120.0'), ('return', '95.5'), ('repriced', '80.0')]
+
+
+def test_parquet(tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'flights.parquet')
+    with open_writer('parquet', path) as writer:
+        writer.batch_size = 1
+        writer.write_result(RESULT)
+        writer.write_result({'departure': [DEPARTURE]})
+    table = pyarrow_parquet.read_table(path)
+    assert table.column_names == list(FIELDS)
+    assert table.column('direction').to_pylist() == ['departure', 'return', 'departure']
+    assert table.column('dep_time').to_pylist()[0] == DEPARTURE.dep_time
+
+
+def test_open_writer_to_file(tmp_path):
+    path = tmp_path / 'flights.jsonl'
+    writer = open_writer('jsonl', str(path))
+    errors = write_results([RESULT, {'error': 'нет рейсов'}, {'return': [RETURN]}], writer)
+    writer.close()
+    assert errors == 1
+    assert writer.file.closed
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 3
+
+
+@pytest.mark.parametrize('output_format, path', [('parquet', None), ('xml', None)])
+def test_open_writer_errors(output_format, path):
+    with pytest.raises(ValueError):
+        open_writer(output_format, path)
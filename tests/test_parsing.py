@@ -0,0 +1,78 @@
+"""Parsing of quote-pages replayed from synthetic fixtures, compared with the first
+version of the parser: one XPath per kind of row.
+"""
+from datetime import datetime
+
+from lxml import html
+import pytest
+
+from flightscraper.replay import ReplaySession, write_synthetic_fixtures
+from flightscraper.search import QUOTE_URL, FlightSearch, SiteConnectionError
+
+
+def parse_with_xpath(content):
+    """Return dict return_flight -> list of raw flights, parsed like the first version did."""
+    tree = html.fromstring(content)
+    rows = {}
+    for return_flight, prefix in ((False, 'flywiz_r'), (True, 'flywiz_ir')):
+        infos = tree.xpath('//tr[starts-with(@id, "{}inf")]'.format(prefix))
+        prices = tree.xpath('//tr[starts-with(@id, "{}prc")]'.format(prefix))
+        rows[return_flight] = [info.xpath('./td/text()') + price.xpath('./td/text()')
+                               for info, price in zip(infos, prices)]
+    return rows
+
+
+@pytest.fixture
+def replay(tmp_path):
+    """Return (searcher, query) for round trip search answered from fixtures."""
+    # 60 рейсов: часть уходит на следующие дни и попадает в '_other'
+    query = write_synthetic_fixtures(str(tmp_path), rows=60)
+    searcher = FlightSearch(session=ReplaySession(str(tmp_path)), rate_limits=None,
+                            validators=None)
+    return searcher, query
+
+
+def get_quote_page(searcher, query):
+    dep_city, arr_city, dep_date, arr_date = query
+    payload = searcher.get_quote_payload(dep_city, arr_city, dep_date.strftime('%d.%m.%Y'),
+                                         arr_date.strftime('%d.%m.%Y'))
+    return searcher.get_html_from_url('GET', QUOTE_URL, params=payload)
+
+
+def test_streaming_rows_match_xpath(replay):
+    searcher, query = replay
+    response = get_quote_page(searcher, query)
+    expected = parse_with_xpath(response.content)
+    rows = {False: [], True: []}
+    for return_flight, flight in searcher.iter_quote_rows(response):
+        rows[return_flight].append(flight)
+    assert rows == expected
+    assert len(rows[False]) == len(rows[True]) == 60
+
+
+def test_search_matches_xpath(replay):
+    searcher, query = replay
+    dep_city, arr_city, dep_date, arr_date = query
+    expected_rows = parse_with_xpath(get_quote_page(searcher, query).content)
+    expected = {'departure': [], 'departure_other': [], 'return': [], 'return_other': []}
+    for return_flight, rows in expected_rows.items():
+        key, route = ('return', (arr_city, dep_city, arr_date)) if return_flight \
+            else ('departure', (dep_city, arr_city, dep_date))
+        for row in rows:
+            flight = searcher.prepare_finishing_flight_info(row)
+            relevant = (flight.dep_city, flight.arr_city,
+                        datetime.strptime(row[0], '%a, %d %b %y')) == route
+            expected[key if relevant else key + '_other'].append(flight)
+    result = searcher.search(*query)
+    for key, flights in expected.items():
+        assert result[key] == flights
+    assert result['departure'] and result['departure_other']
+    assert result['round_trips'] == searcher.get_round_trip_flights(result['departure'],
+                                                                    result['return'])
+
+
+def test_missing_fixture_is_connection_error(tmp_path):
+    searcher = FlightSearch(session=ReplaySession(str(tmp_path)), rate_limits=None,
+                            validators=None)
+    with pytest.raises(SiteConnectionError):
+        searcher.get_html_from_url('GET', QUOTE_URL, params={'lang': 'en'})
@@ -0,0 +1,23 @@
+"""Profiler over a block which runs work in a pool of threads."""
+from concurrent.futures import ThreadPoolExecutor
+
+from flightscraper.profiling import Profiler
+
+
+def work(count):
+    return sum(number * number for number in range(count))
+
+
+def test_profiles_thread_pool(tmp_path):
+    prefix = str(tmp_path / 'pool')
+    with Profiler(prefix, interval=0.001) as profiler:
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(work, 100000) for _ in range(8)]
+            # зависший или упавший поток пула не должен подвесить тест
+            results = [future.result(timeout=30) for future in futures]
+    assert results == [work(100000)] * 8
+    names = [function[2] for function in profiler.stats.stats]
+    assert 'work' in names
+    assert profiler.samples
+    for suffix in ('.pstats', '.collapsed', '.txt'):
+        assert (tmp_path / ('pool' + suffix)).stat().st_size > 0
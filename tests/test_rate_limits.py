@@ -0,0 +1,132 @@
+"""Adaptive TokenBucket, CircuitBreaker and retries of throttled requests."""
+import pytest
+import requests
+
+from flightscraper.search import (BACKOFF_MULTIPLIER, MAX_RETRY_AFTER, RETRIES, SLOW_RESPONSE,
+                                  CircuitBreaker, CircuitOpenError, FlightSearch, HostRateLimits,
+                                  SiteConnectionError, TokenBucket, get_retry_after)
+
+
+class FakeTime:
+    """Clock which moves only by sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr('flightscraper.search.time', fake_time)
+    return fake_time
+
+
+def make_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b''  # pylint: disable=protected-access
+    return response
+
+
+def test_burst_then_pace(clock):
+    bucket = TokenBucket(max_rate=4, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.25)
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize('status_code, elapsed', [(429, 0.1), (503, 0.1), (None, 0.1),
+                                                  (200, SLOW_RESPONSE + 1)])
+def test_backoff(clock, status_code, elapsed):
+    bucket = TokenBucket(max_rate=10)
+    bucket.record(status_code, elapsed)
+    assert bucket.rate == 10 * BACKOFF_MULTIPLIER
+    assert bucket.backoffs == 1
+
+
+def test_rate_recovers_but_not_above_max_or_below_min(clock):
+    bucket = TokenBucket(max_rate=10, min_rate=2)
+    for _ in range(10):
+        bucket.record(503, 0.1)
+    assert bucket.rate == 2
+    for _ in range(100):
+        bucket.record(200, 0.1)
+    assert bucket.rate == 10
+
+
+def test_retry_after_delays_next_token(clock):
+    bucket = TokenBucket(max_rate=10)
+    bucket.record(429, 0.1, retry_after=2)
+    assert bucket.reserve() >= 2
+
+
+def test_retry_after_is_capped():
+    assert get_retry_after(make_response(429, {'Retry-After': '5'})) == 5
+    assert get_retry_after(make_response(429, {'Retry-After': '86400'})) == MAX_RETRY_AFTER
+    assert get_retry_after(make_response(429)) is None
+
+
+def test_circuit_opens_and_lets_one_trial_after_cooldown(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    for _ in range(3):
+        breaker.check('host')
+        breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check('host')
+    clock.now += 31
+    # пробный запрос проходит, остальные ждут его результата
+    breaker.check('host')
+    with pytest.raises(CircuitOpenError):
+        breaker.check('host')
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check('host')
+    clock.now += 31
+    breaker.check('host')
+    breaker.record_success()
+    breaker.check('host')
+    breaker.check('host')
+
+
+class ScriptedSession:
+    """Session answering with given statuses one after another."""
+
+    def __init__(self, statuses, headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers
+        self.requests = 0
+
+    def request(self, *_, **__):
+        self.requests += 1
+        return make_response(self.statuses.pop(0), self.headers)
+
+
+def test_throttled_answers_are_retried_through_bucket(clock):
+    rate_limits = HostRateLimits(10)
+    session = ScriptedSession([503, 429, 200], {'Retry-After': '1'})
+    searcher = FlightSearch(session=session, rate_limits=rate_limits, validators=None,
+                            base_url='http://throttled.test/')
+    response = searcher.get_html_from_url('GET', 'http://throttled.test/en/')
+    assert response.status_code == 200
+    assert session.requests == 3
+    bucket = rate_limits.get('http://throttled.test/')
+    assert bucket.backoffs == 2
+    # каждая повторная попытка ждала 'Retry-After'
+    assert sum(clock.slept) >= 2
+
+
+def test_throttled_retries_give_up(clock):
+    session = ScriptedSession([503] * (RETRIES + 1))
+    searcher = FlightSearch(session=session, rate_limits=HostRateLimits(10), validators=None)
+    with pytest.raises(SiteConnectionError):
+        searcher.get_html_from_url('GET', 'http://always-busy.test/en/')
+    assert session.requests == RETRIES + 1
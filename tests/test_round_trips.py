@@ -0,0 +1,75 @@
+"""Pairing of departure and return flights compared with checking every pair."""
+from datetime import datetime, timedelta
+from itertools import product
+import random
+
+import pytest
+
+from flightscraper.search import Currency, Flight, FlightSearch, RangeMinimum
+
+
+def make_flights(count, start, seed):
+    generator = random.Random(seed)
+    flights = []
+    for _ in range(count):
+        dep_time = start + timedelta(minutes=generator.randrange(5 * 24 * 60))
+        flights.append(Flight('CPH', 'BOJ', float(generator.randrange(20, 300)),
+                              Currency('EUR'), dep_time,
+                              dep_time + timedelta(minutes=generator.randrange(60, 600))))
+    return flights
+
+
+def get_all_pairs(departure_list, arrival_list, key):
+    """Return values of key for all possible round trips, best first."""
+    return sorted(getattr(dep_flight, key) + getattr(arr_flight, key)
+                  for dep_flight, arr_flight in product(departure_list, arrival_list)
+                  if arr_flight.dep_time >= dep_flight.arr_time)
+
+
+@pytest.mark.parametrize('seed', range(50))
+@pytest.mark.parametrize('key', ['price', 'duration'])
+def test_top_round_trips_match_brute_force(seed, key):
+    generator = random.Random(seed)
+    departure_list = make_flights(generator.randrange(30), datetime(2018, 10, 20), seed)
+    arrival_list = make_flights(generator.randrange(30), datetime(2018, 10, 22), seed + 1000)
+    top_k = generator.randrange(1, 50)
+    round_trips = FlightSearch.get_top_round_trips(departure_list, arrival_list, top_k, key)
+    assert [getattr(round_trip, key) for round_trip in round_trips] == \
+        get_all_pairs(departure_list, arrival_list, key)[:top_k]
+    assert all(round_trip.arrival.dep_time >= round_trip.departure.arr_time
+               for round_trip in round_trips)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_all_round_trips_match_brute_force(seed):
+    departure_list = make_flights(20, datetime(2018, 10, 20), seed)
+    arrival_list = make_flights(20, datetime(2018, 10, 22), seed + 1000)
+    round_trips = FlightSearch.get_round_trip_flights(departure_list, arrival_list)
+    assert [round_trip.price for round_trip in round_trips] == \
+        get_all_pairs(departure_list, arrival_list, 'price')
+    assert len(round_trips) + len(FlightSearch.get_unreachable_round_trips(
+        departure_list, arrival_list)) == len(departure_list) * len(arrival_list)
+
+
+def test_no_possible_return_flight():
+    start = datetime(2018, 10, 20)
+    departure_list = [Flight('CPH', 'BOJ', 50.0, Currency('EUR'), start,
+                             start + timedelta(hours=3))]
+    arrival_list = [Flight('BOJ', 'CPH', 50.0, Currency('EUR'), start,
+                           start + timedelta(hours=3))]
+    assert FlightSearch.get_top_round_trips(departure_list, arrival_list, 5) == []
+    assert FlightSearch.get_round_trip_flights(departure_list, arrival_list) == []
+
+
+def test_range_minimum():
+    generator = random.Random(0)
+    values = [generator.randrange(100) for _ in range(37)]
+    range_minimum = RangeMinimum(values)
+    for start in range(len(values) + 1):
+        for end in range(start, len(values) + 1):
+            position = range_minimum.argmin(start, end)
+            if start == end:
+                assert position == -1
+            else:
+                assert start <= position < end
+                assert values[position] == min(values[start:end])
@@ -0,0 +1,44 @@
+"""RouteIndex crawled from the stand-in server, saved and used instead of the site."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from flightscraper.routes import RouteIndex
+from flightscraper.search import FlightSearch, RouteUnavailableError
+from flightscraper.stub_server import DAYS, ROUTES, START_DATE
+
+
+DATES = [START_DATE + timedelta(days=day) for day in range(DAYS)]
+
+
+def test_crawl_finds_every_route(make_searcher):
+    index = RouteIndex.crawl(make_searcher(), concurrency=4)
+    assert sorted(index.get_dep_cities()) == sorted(ROUTES)
+    for dep_city, arr_cities in ROUTES.items():
+        assert sorted(index.get_arr_cities(dep_city)) == sorted(arr_cities)
+        for arr_city in arr_cities:
+            assert index.get_dates(dep_city, arr_city) == DATES
+    assert len(list(index.iter_queries())) == len(ROUTES) * 4 * DAYS
+
+
+def test_save_and_load(tmp_path):
+    index = RouteIndex({'CPH': {'BOJ': DATES[:2], 'SOF': []}},
+                       crawled_at=datetime(2018, 10, 1, 12, 30, 15))
+    path = str(tmp_path / 'routes.json')
+    index.save(path)
+    loaded = RouteIndex.load(path)
+    assert loaded.routes == index.routes
+    assert loaded.crawled_at == index.crawled_at
+    assert not loaded.has_route('BOJ', 'CPH')
+    assert loaded.get_dates('CPH', 'VAR') == []
+
+
+def test_search_asks_site_only_for_quotes(server):
+    index = RouteIndex({'CPH': {'BOJ': DATES}})
+    # города и даты берутся из индекса, поэтому главный сайт может быть недоступен
+    searcher = FlightSearch(route_index=index, base_url='http://127.0.0.1:9/',
+                            quote_url=server.quote_url, rate_limits=None)
+    result = searcher.search('CPH', 'BOJ', '20.10.2018')
+    assert len(result['departure']) == server.rows
+    with pytest.raises(RouteUnavailableError):
+        searcher.search('CPH', 'SOF', '20.10.2018')
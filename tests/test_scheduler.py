@@ -0,0 +1,64 @@
+"""Planning of chunks and sweeps of SweepScheduler over several processes."""
+from datetime import datetime, timedelta
+
+from flightscraper.routes import RouteIndex
+from flightscraper.scheduler import SweepScheduler, get_query_key
+from flightscraper.stub_server import DAYS, ROUTES, START_DATE
+
+
+def make_route_index():
+    first = datetime(2018, 10, 20)
+    return RouteIndex({'CPH': {'BOJ': [first + timedelta(days=day) for day in range(7)]},
+                       'BLL': {'SOF': [first, first + timedelta(days=3)]},
+                       'AAL': {'VAR': [first]}})
+
+
+def test_fresh_sweep_starts_with_busiest_routes():
+    route_index = make_route_index()
+    scheduler = SweepScheduler(1, chunk_size=4, route_index=route_index)
+    queries = list(route_index.iter_queries())
+    queries.reverse()
+    chunks = scheduler.get_chunks(queries)
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert [query[0] for chunk in chunks for query in chunk] == \
+        ['CPH'] * 7 + ['BLL'] * 2 + ['AAL']
+
+
+def test_dates_are_counted_among_queries_without_index():
+    scheduler = SweepScheduler(1)
+    queries = [('AAL', 'VAR', START_DATE)] + [('CPH', 'BOJ', START_DATE + timedelta(days=day))
+                                              for day in range(3)]
+    assert scheduler.get_route_sizes(queries) == {'AAL|VAR': 1, 'CPH|BOJ': 3}
+
+
+def test_finished_queries_set_the_scale(tmp_path):
+    scheduler = SweepScheduler(1, route_index=make_route_index())
+    # у BLL-SOF две даты и по 40 рейсов на странице: 20 рейсов на дату
+    scheduler.done = {'BLL|SOF|20.10.2018': 40}
+    sizes = scheduler.get_route_sizes()
+    assert sizes == {'BLL|SOF': 40, 'CPH|BOJ': 140, 'AAL|VAR': 20}
+    queries = scheduler.get_chunks([('BLL', 'SOF', datetime(2018, 10, 23)),
+                                    ('AAL', 'VAR', datetime(2018, 10, 20)),
+                                    ('BLL', 'SOF', datetime(2018, 10, 20)),
+                                    ('CPH', 'BOJ', datetime(2018, 10, 21))])[0]
+    assert [query[0] for query in queries] == ['CPH', 'BLL', 'AAL']
+
+
+def test_processes_share_cache_directory(server, tmp_path):
+    checkpoint = str(tmp_path / 'sweep.json')
+    queries = [(dep_city, arr_city, START_DATE + timedelta(days=day))
+               for dep_city, arr_cities in ROUTES.items() for arr_city in arr_cities
+               for day in range(0, DAYS, 7)]
+
+    def make_scheduler():
+        return SweepScheduler(4, chunk_size=4, concurrency=2, rate_limit=1000,
+                              checkpoint_path=checkpoint, cache_dir=str(tmp_path / 'cache'),
+                              base_url=server.base_url, quote_url=server.quote_url)
+
+    results = make_scheduler().run(queries)
+    assert [result['error'] for result in results if 'error' in result] == []
+    assert sorted(get_query_key(query) for query in queries) == \
+        sorted(make_scheduler().done)
+    assert {path.suffix for path in (tmp_path / 'cache').iterdir()} == {'.pickle'}
+    # всё уже сделано: второй запуск ничего не ищет
+    assert make_scheduler().run(queries) == []
@@ -0,0 +1,72 @@
+"""Identical concurrent searches share one request, parsing and record of history."""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+
+import pytest
+
+from flightscraper.history import QuoteHistory
+from flightscraper.metrics import Metrics
+from flightscraper.search import FlightSearch, SingleFlight, make_session
+from flightscraper.stub_server import StubServer
+
+THREADS = 4
+ROWS = 10
+QUERY = ('CPH', 'BOJ', '20.10.2018')
+FIRST_FLIGHT = datetime(2018, 10, 20, 0, 0)
+
+
+@pytest.fixture(scope='module')
+def slow_server():
+    # ответы медленные, чтобы одинаковые поиски наверняка застали друг друга
+    stub = StubServer(rows=ROWS, latency=0.2).start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+def search_together(searchers):
+    """Run search of QUERY by every searcher at the same moment, return results."""
+    barrier = threading.Barrier(len(searchers))
+
+    def search(searcher):
+        barrier.wait()
+        return searcher.search(*QUERY)
+
+    with ThreadPoolExecutor(max_workers=len(searchers)) as executor:
+        return list(executor.map(search, searchers))
+
+
+def count_records(history):
+    return len(history.get_price_history('CPH', 'BOJ', FIRST_FLIGHT))
+
+
+def test_one_searcher_records_every_page_once(slow_server):
+    history = QuoteHistory(':memory:')
+    metrics = Metrics()
+    searcher = FlightSearch(base_url=slow_server.base_url, quote_url=slow_server.quote_url,
+                            rate_limits=None, history=history, metrics=metrics,
+                            single_flight=SingleFlight())
+    results = search_together([searcher] * THREADS)
+    assert all(len(result['departure']) == ROWS for result in results)
+    counters = metrics.counters
+    loads = counters['rows_parsed'] // ROWS
+    assert loads < THREADS
+    assert counters['rows_matched'] == loads * ROWS
+    assert count_records(history) == loads
+
+
+def test_waiters_with_own_history_record_shared_page(slow_server):
+    session = make_session()
+    histories = [QuoteHistory(':memory:') for _ in range(THREADS)]
+    metrics = Metrics()
+    single_flight = SingleFlight()
+    searchers = [FlightSearch(session=session, base_url=slow_server.base_url,
+                              quote_url=slow_server.quote_url, rate_limits=None,
+                              history=history, metrics=metrics, single_flight=single_flight)
+                 for history in histories]
+    search_together(searchers)
+    assert metrics.counters['rows_parsed'] < THREADS * ROWS
+    assert [count_records(history) for history in histories] == [1] * THREADS
+    # метрики общие: разобранное лидером не считается ещё раз
+    assert metrics.counters['rows_matched'] == metrics.counters['rows_parsed']
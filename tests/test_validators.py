@@ -0,0 +1,83 @@
+"""Conditional requests: answers '304 Not Modified', recording and replaying them."""
+import hashlib
+
+import requests
+
+from flightscraper.replay import RecordingSession, ReplaySession, make_dep_page
+from flightscraper.search import FlightSearch, ValidatorStore
+
+BASE_URL = 'http://site.test/'
+PAGES = {BASE_URL + 'en/': make_dep_page(['CPH', 'BOJ']),
+         BASE_URL + 'other/': make_dep_page(['SOF'])}
+
+
+def make_response(status, content, headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response.encoding = 'utf-8'
+    response._content = content  # pylint: disable=protected-access
+    return response
+
+
+class ValidatingSite:
+    """Session answering like a site with ETag: 304 without body to a request
+    with the current ETag.
+    """
+
+    def __init__(self):
+        self.not_modified = 0
+        # вызывается перед ответом 304, например, чтобы вытеснить сохранённый ответ
+        self.before_not_modified = None
+
+    def request(self, method, url, params=None, data=None, headers=None, **_):
+        body = PAGES[url].encode('utf-8')
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if (headers or {}).get('If-None-Match') == etag:
+            self.not_modified += 1
+            if self.before_not_modified is not None:
+                self.before_not_modified()
+            return make_response(304, b'', {'ETag': etag})
+        return make_response(200, body, {'ETag': etag})
+
+
+def make_searcher(session, validators):
+    return FlightSearch(session=session, validators=validators, rate_limits=None,
+                        base_url=BASE_URL)
+
+
+def get_dep_cities(searcher):
+    searcher.get_dep_cities()
+    return searcher.data['cities_for_dep']
+
+
+def test_not_modified_reuses_previous_answer():
+    site = ValidatingSite()
+    validators = ValidatorStore()
+    assert get_dep_cities(make_searcher(site, validators)) == ['CPH', 'BOJ']
+    assert get_dep_cities(make_searcher(site, validators)) == ['CPH', 'BOJ']
+    assert site.not_modified == 1
+    assert validators.stats['not_modified'] == 1
+
+
+def test_forgotten_answer_is_requested_again():
+    site = ValidatingSite()
+    validators = ValidatorStore(max_size=1)
+    assert get_dep_cities(make_searcher(site, validators)) == ['CPH', 'BOJ']
+    other_url = BASE_URL + 'other/'
+    # другой поток успевает вытеснить ответ, пока сайт отвечает 304
+    site.before_not_modified = lambda: validators.process(
+        validators.get_key('GET', other_url), site.request('GET', other_url))
+    assert get_dep_cities(make_searcher(site, validators)) == ['CPH', 'BOJ']
+    assert site.not_modified == 1
+
+
+def test_recorded_repeated_request_replays_with_fresh_store(tmp_path):
+    site = ValidatingSite()
+    validators = ValidatorStore()
+    for _ in range(2):
+        searcher = make_searcher(RecordingSession(str(tmp_path), site), validators)
+        assert get_dep_cities(searcher) == ['CPH', 'BOJ']
+    assert site.not_modified == 0
+    replay = make_searcher(ReplaySession(str(tmp_path)), ValidatorStore())
+    assert get_dep_cities(replay) == ['CPH', 'BOJ']